@@ -10,11 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+import sys
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+TESTING = sys.argv[1:2] == ['test']
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
@@ -42,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'user',
     'rest_framework',
@@ -58,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.routers.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -84,17 +90,78 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Connections are pooled per worker process by core.db, rather than
+# opened for every request: at most DB_POOL_MAX_SIZE, checked out within
+# DB_POOL_TIMEOUT seconds or the request fails. DB_POOL_MIN_SIZE stay
+# open when idle, the others close after DB_POOL_MAX_IDLE seconds; all
+# are replaced after DB_POOL_MAX_LIFETIME seconds, and pinged before
+# reuse when idle for over DB_POOL_PING_AFTER seconds. Under ASGI the
+# read threads share the pool, so keep MAX_SIZE >= ASYNC_READ_THREADS.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 16)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+            'MAX_LIFETIME': float(
+                os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'PING_AFTER': float(os.environ.get('DB_POOL_PING_AFTER', 1)),
+        },
     }
 }
 
 
+# Read replicas, one alias each (replica1, replica2, ...) for the hosts
+# in DB_REPLICA_HOSTS; see core.routers. Safe requests read from one of
+# them, picked by REPLICA_SELECTION ('round-robin' or 'least-latency')
+# among those checked, every REPLICA_CHECK_INTERVAL seconds, to be up
+# and less than REPLICA_MAX_LAG seconds behind; otherwise, and for
+# REPLICA_PIN_SECONDS after a client writes, from the primary.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], HOST=host.strip(), OPTIONS={
+            'connect_timeout': int(
+                os.environ.get('DB_REPLICA_CONNECT_TIMEOUT', 2)),
+        })
+    DATABASE_REPLICAS.append(f'replica{number}')
+if TESTING and not DATABASE_REPLICAS:
+    # its own test database, for the router tests to read from
+    DATABASES['replica'] = dict(
+        DATABASES['default'], TEST={'NAME': 'test_replica'})
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_SELECTION = os.environ.get('REPLICA_SELECTION', 'round-robin')
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 2))
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# Caches: `default` is per process; `shared` is the one every worker and
+# host sees, used by core.cache.SharedCache. By default a table of the
+# primary database, made by `createcachetable` at boot; point
+# SHARED_CACHE_BACKEND and SHARED_CACHE_LOCATION at memcached or redis
+# once their client is installed.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'SHARED_CACHE_BACKEND',
+            'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', 'shared_cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('SHARED_CACHE_ENTRIES', 50000)),
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -135,7 +202,7 @@ STATIC_URL = '/static/static/'
 MEDIA_URL = '/static/media/'
 
 MEDIA_ROOT = '/vol/web/media'
-STATIC_ROOT = '/vol/web/static'
+STATIC_ROOT = os.environ.get('STATIC_ROOT', '/vol/web/static')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -145,8 +212,122 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Keyset pagination for the list endpoints; clients may ask for a
+# smaller or larger page with `?page_size=`, up to the max.
+PAGINATION_PAGE_SIZE = int(os.environ.get('PAGINATION_PAGE_SIZE', 20))
+PAGINATION_MAX_PAGE_SIZE = int(os.environ.get('PAGINATION_MAX_PAGE_SIZE', 100))
+
+# Number of movies nested in each stream; the rest are paged through
+# the stream's `movies_next` link.
+STREAM_MOVIES_LIMIT = int(os.environ.get('STREAM_MOVIES_LIMIT', 10))
+
+# Rows read, serialized and sent per step by the streaming endpoints,
+# which bounds a worker's memory whatever the size of the result.
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 500))
+
+# Movies accepted by one `movies/bulk/` request, and rows per INSERT or
+# UPDATE statement issued to write them.
+MOVIE_BULK_MAX_ITEMS = int(os.environ.get('MOVIE_BULK_MAX_ITEMS', 10000))
+MOVIE_BULK_BATCH_SIZE = int(os.environ.get('MOVIE_BULK_BATCH_SIZE', 500))
+
+# Resized copies made of each uploaded movie image, in every format, by
+# a pool of MOVIE_IMAGE_WORKERS processes per worker; 0 resizes inline,
+# as under `manage.py test`.
+MOVIE_IMAGE_VARIANT_WIDTHS = [
+    int(width) for width in os.environ.get(
+        'MOVIE_IMAGE_VARIANT_WIDTHS', '160,320,640,1280').split(',')
+]
+MOVIE_IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+MOVIE_IMAGE_WORKERS = 0 if TESTING else int(
+    os.environ.get('MOVIE_IMAGE_WORKERS', 2))
+
+# Movie image uploads: the proxy's client_max_body_size, the formats
+# accepted and the most pixels an image may decode to.
+MOVIE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('MOVIE_IMAGE_MAX_UPLOAD_SIZE', 10 * 2 ** 20))
+MOVIE_IMAGE_FORMATS = ['JPEG', 'PNG', 'WEBP', 'GIF']
+MOVIE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('MOVIE_IMAGE_MAX_PIXELS', 40_000_000))
+
+# Movie images resized on request by `movies/<id>/image?w=`: widths up to
+# MOVIE_IMAGE_RESIZE_MAX_WIDTH, cached in MEDIA_ROOT/.resized within
+# MOVIE_IMAGE_RESIZE_CACHE_SIZE bytes and fresh for MOVIE_IMAGE_RESIZE_MAX_AGE
+# seconds. Set MOVIE_IMAGE_RESIZE_ACCEL_REDIRECT to the proxy's internal
+# location of that directory to have nginx send the files.
+MOVIE_IMAGE_RESIZE_MAX_WIDTH = int(
+    os.environ.get('MOVIE_IMAGE_RESIZE_MAX_WIDTH', 2048))
+MOVIE_IMAGE_RESIZE_CACHE_SIZE = int(
+    os.environ.get('MOVIE_IMAGE_RESIZE_CACHE_SIZE', 2 ** 30))
+MOVIE_IMAGE_RESIZE_MAX_AGE = int(
+    os.environ.get('MOVIE_IMAGE_RESIZE_MAX_AGE', 86400))
+MOVIE_IMAGE_RESIZE_ACCEL_REDIRECT = os.environ.get(
+    'MOVIE_IMAGE_RESIZE_ACCEL_REDIRECT', '')
+
+# Cache of read responses, invalidated by model signals. The in-process
+# LRU is per worker, so TIMEOUT bounds how stale another worker can be;
+# point BACKEND at core.cache.SharedCache to share the `shared` cache
+# instead, where max_entries is left to the cache's own MAX_ENTRIES.
+# Off under `manage.py test`, whose rolled back rows signal nothing.
+RESPONSE_CACHE = {
+    'ENABLED': bool(int(os.environ.get('RESPONSE_CACHE_ENABLED', 1)))
+    and not TESTING,
+    'BACKEND': os.environ.get('RESPONSE_CACHE_BACKEND',
+                              'core.cache.LRUCache'),
+    'OPTIONS': {
+        'max_entries': int(os.environ.get('RESPONSE_CACHE_ENTRIES', 2048)),
+        'timeout': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 30)),
+    },
+}
+
+# Users of the tokens CachedTokenAuthentication resolved, kept up to
+# TIMEOUT seconds; saving a user or deleting a token drops its entry.
+# The in-process LRU only drops it in the worker that made the change,
+# so the others may accept a revoked token until TIMEOUT, a few seconds.
+# With BACKEND core.cache.SharedCache every worker reads the `shared`
+# cache, where entries are dropped for all and may live longer.
+TOKEN_AUTH_CACHE_BACKEND = os.environ.get(
+    'TOKEN_AUTH_CACHE_BACKEND', 'core.cache.LRUCache')
+TOKEN_AUTH_CACHE = {
+    'ENABLED': bool(int(os.environ.get('TOKEN_AUTH_CACHE_ENABLED', 1))),
+    'BACKEND': TOKEN_AUTH_CACHE_BACKEND,
+    'OPTIONS': {
+        'max_entries': int(os.environ.get('TOKEN_AUTH_CACHE_ENTRIES', 10000)),
+        'timeout': int(os.environ.get(
+            'TOKEN_AUTH_CACHE_TIMEOUT',
+            300 if TOKEN_AUTH_CACHE_BACKEND == 'core.cache.SharedCache'
+            else 5)),
+    },
+}
+
+# Served over ASGI (app.asgi), GETs of these views run on a pool of
+# ASYNC_READ_THREADS threads per process rather than on the one thread
+# Django gives sync views; see core.asgi. Each thread checks a database
+# connection out of the pool while it serves.
+ASYNC_READ_VIEWS = [
+    'movie:movie-list',
+    'movie:movie-detail',
+    'movie:stream-list',
+    'movie:review-list',
+]
+ASYNC_READ_THREADS = int(os.environ.get('ASYNC_READ_THREADS', 16))
+
+# Password checks of the token endpoint: LOGIN_WORKERS at once across
+# the host's workers, LOGIN_QUEUE more waiting up to LOGIN_QUEUE_TIMEOUT
+# seconds, the rest refused with a 503 asking to retry after
+# LOGIN_RETRY_AFTER seconds. See user.login.
+LOGIN_WORKERS = int(os.environ.get('LOGIN_WORKERS', 1))
+LOGIN_QUEUE = int(os.environ.get('LOGIN_QUEUE', 1))
+LOGIN_QUEUE_TIMEOUT = float(os.environ.get('LOGIN_QUEUE_TIMEOUT', 2))
+LOGIN_RETRY_AFTER = int(os.environ.get('LOGIN_RETRY_AFTER', 1))
+LOGIN_SLOTS_DIR = os.environ.get(
+    'LOGIN_SLOTS_DIR', os.path.join(tempfile.gettempdir(), 'movie-app-login'))
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True
 }
@@ -0,0 +1,9 @@
+"""Benchmarks for the movie api
+
+Each module is runnable from the `app` directory, e.g.
+
+    python -m benchmarks.bench_pagination --rows 200000
+
+and seeds its own throwaway test database, so it never touches the
+configured database's data.
+"""
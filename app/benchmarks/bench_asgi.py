@@ -0,0 +1,166 @@
+"""Benchmark concurrent reads over WSGI workers against the ASGI read pool
+
+    python -m benchmarks.bench_asgi --clients 64 --latency 20
+
+Every query is delayed by `--latency` ms, standing in for a slow or
+distant Postgres. `--clients` clients then request the movie list and
+detail back to back for `--seconds`:
+
+- WSGI: through `--wsgi-workers` workers, one request each at a time,
+  as uWSGI's processes serve them. Workers are threads here; they
+  spend their time sleeping in the injected latency, which releases
+  the GIL as a process would.
+- ASGI: through app.asgi's handler on one event loop, reads running in
+  ASYNC_READ_THREADS pool threads.
+
+Reports requests per second and client-side latency.
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from benchmarks import utils
+
+
+def summary(name, latencies, elapsed):
+    latencies.sort()
+    return [
+        name, len(latencies), f'{len(latencies) / elapsed:.0f}',
+        f'{statistics.median(latencies):.0f}',
+        f'{latencies[int(len(latencies) * 0.95)]:.0f}',
+    ]
+
+
+def run_wsgi(args, paths, token):
+    from django.db import connection
+    from django.test import Client
+
+    local = threading.local()
+
+    def serve(path):
+        if not hasattr(local, 'client'):
+            local.client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+        response = local.client.get(path)
+        assert response.status_code == 200, response.status_code
+        connection.close()
+
+    workers = ThreadPoolExecutor(max_workers=args.wsgi_workers)
+    latencies = []
+    deadline = time.monotonic() + args.seconds
+
+    def client(i):
+        n = i
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            workers.submit(serve, paths[n % len(paths)]).result()
+            latencies.append((time.monotonic() - start) * 1000)
+            n += 1
+
+    start = time.monotonic()
+    clients = [threading.Thread(target=client, args=(i,))
+               for i in range(args.clients)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.monotonic() - start
+    workers.shutdown()
+    return summary(f'WSGI, {args.wsgi_workers} workers', latencies, elapsed)
+
+
+async def asgi_get(application, path, token):
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await application({
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path,
+        'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'),
+                    (b'authorization', f'Token {token}'.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }, receive, send)
+    assert sent[0]['status'] == 200, sent[0]['status']
+
+
+def run_asgi(args, paths, token):
+    from django.conf import settings
+
+    from app.asgi import application
+
+    latencies = []
+
+    async def client(i):
+        n = i
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            await asgi_get(application, paths[n % len(paths)], token)
+            latencies.append((time.monotonic() - start) * 1000)
+            n += 1
+
+    async def main():
+        await asyncio.gather(*(client(i) for i in range(args.clients)))
+
+    deadline = time.monotonic() + args.seconds
+    start = time.monotonic()
+    asyncio.run(main())
+    elapsed = time.monotonic() - start
+    return summary(f'ASGI, {settings.ASYNC_READ_THREADS} read threads',
+                   latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=20)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--wsgi-workers', type=int, default=4)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db.backends.utils import CursorWrapper
+    from django.urls import reverse
+    from rest_framework.authtoken.models import Token
+
+    # off, so every request reaches the database
+    settings.RESPONSE_CACHE = dict(settings.RESPONSE_CACHE, ENABLED=False)
+    execute = CursorWrapper.execute
+
+    def slow_execute(self, sql, params=None):
+        time.sleep(args.latency / 1000)
+        return execute(self, sql, params)
+
+    results = []
+    with utils.test_database():
+        movies = utils.seed_movies(100)
+        token = Token.objects.create(user=get_user_model().objects.create_user(
+            email='bench@example.com', password='bench')).key
+        paths = [reverse('movie:movie-list')] + [
+            reverse('movie:movie-detail', args=[pk]) for pk in movies[:10]]
+
+        with patch.object(CursorWrapper, 'execute', slow_execute):
+            results.append(run_wsgi(args, paths, token))
+            results.append(run_asgi(args, paths, token))
+
+    utils.report(
+        f'{args.clients} clients, {args.latency:g} ms per query: '
+        'throughput and latency in ms',
+        ('server', 'requests', 'req/s', 'p50', 'p95'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark token authenticated requests with and without the token cache
+
+    python -m benchmarks.bench_auth --movies 100
+
+Reports queries per request and the median latency of a few cheap
+endpoints, authenticated by a token header, looking the token up on
+every request and through CachedTokenAuthentication's cache.
+"""
+import argparse
+
+from benchmarks import utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--movies', type=int, default=100)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext, override_settings
+    from django.urls import reverse
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIClient
+
+    results = []
+    with utils.test_database():
+        movie = utils.seed_movies(args.movies)[0]
+        user = get_user_model().objects.create_user(
+            email='bench@example.com', password='bench')
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+        urls = {
+            'user/me': reverse('user:me'),
+            'movie detail': reverse('movie:movie-detail', args=[movie]),
+            'movie list': reverse('movie:movie-list'),
+        }
+
+        for name, url in urls.items():
+            row = [name]
+            for enabled in (False, True):
+                config = dict(settings.TOKEN_AUTH_CACHE, ENABLED=enabled)
+                with override_settings(TOKEN_AUTH_CACHE=config):
+                    # warm the token and response caches
+                    client.get(url)
+                    with CaptureQueriesContext(connection) as queries:
+                        client.get(url)
+                    row += [len(queries),
+                            f'{utils.timeit(lambda: client.get(url)):.2f}']
+            results.append(row)
+
+    utils.report(
+        'token authenticated GETs: queries and median ms per request',
+        ('endpoint', 'queries', 'ms', 'cached queries', 'cached ms'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
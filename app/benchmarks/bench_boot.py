@@ -0,0 +1,81 @@
+"""Benchmark the container start steps of scripts/run.sh
+
+    python -m benchmarks.bench_boot --repeat 3
+
+Runs each start step as its own `manage.py` process, as run.sh does,
+against a migrated test database and an already collected STATIC_ROOT:
+a restart or scale out where nothing changed. Compares the previous
+steps, collectstatic and migrate, with sync_static and migrate_pending
+run separately, then together in the one `boot` process run.sh now
+starts. Reports the median seconds of each step and of the whole start.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import utils
+
+BEFORE = [['wait_for_db'], ['collectstatic', '--noinput'], ['migrate']]
+AFTER = [['wait_for_db'], ['sync_static'], ['migrate_pending']]
+BOOT = [['boot']]
+
+
+def step(command, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, 'manage.py', *command], env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def run(name, steps, env, repeat):
+    times = [[step(command, env) for command in steps]
+             for _ in range(repeat)]
+    medians = [statistics.median(column) for column in zip(*times)]
+    return [
+        name,
+        ', '.join(f'{command[0]} {seconds:.2f}'
+                  for command, seconds in zip(steps, medians)),
+        f'{statistics.median(sum(row) for row in times):.2f}',
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.db import connections
+
+    static_root = tempfile.mkdtemp()
+    results = []
+    try:
+        with utils.test_database() as connection:
+            env = dict(os.environ, DB_NAME=connection.settings_dict['NAME'],
+                       STATIC_ROOT=static_root)
+            connections.close_all()
+            # the first start of a fresh volume, for both
+            for command in BEFORE[1:] + AFTER[1:]:
+                step(command, env)
+
+            results.append(run('before', BEFORE, env, args.repeat))
+            results.append(run('separate', AFTER, env, args.repeat))
+            results.append(run('after', BOOT, env, args.repeat))
+    finally:
+        shutil.rmtree(static_root)
+
+    utils.report(
+        'container start, nothing changed: median seconds',
+        ('run.sh', 'steps', 'total'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark writing movies one POST at a time against the bulk endpoint
+
+    python -m benchmarks.bench_bulk --rows 100 1000 5000
+
+Reports movies written per second through the api, creating then
+updating `rows` movies with single requests and with one bulk request.
+"""
+import argparse
+import time
+
+from benchmarks import utils
+
+
+def rate(func, count):
+    start = time.perf_counter()
+    func()
+    return f'{count / (time.perf_counter() - start):.0f}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000])
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from core.models import Movie
+
+    list_url = reverse('movie:movie-list')
+    bulk_url = reverse('movie:movie-bulk')
+
+    results = []
+    with utils.test_database():
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_superuser(
+            email='bench@example.com', password='bench'))
+
+        for count in args.rows:
+            payload = [
+                {'title': f'movie {i}', 'storyLine': f'story {i}'}
+                for i in range(count)
+            ]
+
+            def single_creates():
+                for item in payload:
+                    client.post(list_url, item, format='json')
+
+            def single_updates():
+                for pk in Movie.objects.values_list('pk', flat=True):
+                    client.put(
+                        reverse('movie:movie-detail', args=[pk]),
+                        {'title': 'renamed', 'storyLine': 'story'},
+                        format='json')
+
+            def bulk_creates():
+                client.post(bulk_url, payload, format='json')
+
+            def bulk_updates():
+                client.post(bulk_url, [
+                    {'id': pk, 'title': 'renamed', 'storyLine': 'story'}
+                    for pk in Movie.objects.values_list('pk', flat=True)
+                ], format='json')
+
+            row = [count, rate(single_creates, count),
+                   rate(single_updates, count)]
+            Movie.objects.all().delete()
+            row += [rate(bulk_creates, count), rate(bulk_updates, count)]
+            Movie.objects.all().delete()
+            results.append(row)
+
+    utils.report(
+        'movies written per second',
+        ('rows', 'POST', 'PUT', 'bulk create', 'bulk update'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
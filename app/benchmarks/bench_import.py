@@ -0,0 +1,83 @@
+"""Benchmark bulk loading reviews with the import_reviews command
+
+    python -m benchmarks.bench_import --rows 1000000
+
+Writes an NDJSON file of reviews, a few percent of them repeated, and
+reports rows per second and peak python memory of the COPY path and of
+the portable executemany path.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+from unittest.mock import patch
+
+from benchmarks import utils
+
+VENDOR = 'core.management.commands.import_reviews.connection.vendor'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--movies', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    from core.models import Review
+
+    users_per_movie = -(-args.rows // args.movies)
+    results = []
+    with utils.test_database(), tempfile.TemporaryDirectory() as tmp:
+        movies = utils.seed_movies(args.movies)
+        User = get_user_model()
+        User.objects.bulk_create(
+            (User(email=f'user{i}@example.com')
+             for i in range(users_per_movie)),
+            batch_size=10000,
+        )
+        users = list(User.objects.values_list('id', flat=True))
+
+        path = os.path.join(tmp, 'reviews.ndjson')
+        with open(path, 'w') as file:
+            for i in range(args.rows):
+                # every 50th row repeats the previous pair
+                j = i - 1 if i % 50 == 49 else i
+                file.write(json.dumps({
+                    'movie': movies[j % args.movies],
+                    'user': users[j // args.movies],
+                    'rating': j % 5 + 1,
+                    'description': f'review {j}',
+                }) + '\n')
+
+        for name, vendor in (('copy', 'postgresql'), ('executemany', 'other')):
+            Review.objects.all().delete()
+            with patch(VENDOR, vendor):
+                tracemalloc.start()
+                start = time.perf_counter()
+                call_command('import_reviews', path,
+                             batch_size=args.batch_size, stdout=StringIO())
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1] // 1024
+                tracemalloc.stop()
+            results.append((
+                name, args.rows, Review.objects.count(),
+                f'{args.rows / elapsed:.0f}', peak))
+
+    utils.report(
+        'import_reviews: throughput and peak python memory',
+        ('path', 'rows', 'imported', 'rows/s', 'peak KiB'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Load test catalog reads during a burst of logins
+
+    python -m benchmarks.bench_login --workers 4 --logins 24
+
+Forks `--workers` processes taking requests from one queue, as uWSGI's
+workers share one listen socket, and feeds them a steady stream of
+token authenticated movie list reads. Halfway through, `--logins`
+password logins arrive at once. Reports read latency, queueing
+included, without logins, with unbounded password checks and with the
+login slots of user.login.
+"""
+import argparse
+import multiprocessing
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks import utils
+
+
+def serve(requests, results, token):
+    from django.db import connection
+    from django.test import Client
+    from django.urls import reverse
+
+    client = Client()
+    read_url, token_url = reverse('movie:movie-list'), reverse('user:token')
+    # connect and warm up before the clock starts
+    client.get(read_url, HTTP_AUTHORIZATION=f'Token {token}')
+    results.put(('ready', None, None))
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        kind, queued = request
+        if kind == 'read':
+            response = client.get(
+                read_url, HTTP_AUTHORIZATION=f'Token {token}')
+        else:
+            response = client.post(token_url, {
+                'email': 'bench@example.com', 'password': 'bench-password'})
+        results.put((kind, response.status_code, time.monotonic() - queued))
+    connection.close()
+
+
+def run(args, token, logins):
+    from django.db import connections
+
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    requests, results = context.Queue(), context.Queue()
+    workers = [context.Process(target=serve, args=(requests, results, token))
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        results.get()
+
+    reads = int(args.seconds * args.read_rate)
+    start = time.monotonic()
+    for i in range(reads):
+        time.sleep(max(0, start + i / args.read_rate - time.monotonic()))
+        if logins and i == reads // 2:
+            for _ in range(logins):
+                requests.put(('login', time.monotonic()))
+        requests.put(('read', time.monotonic()))
+    for _ in workers:
+        requests.put(None)
+
+    latencies, statuses = [], []
+    for _ in range(reads + (logins or 0)):
+        kind, status, latency = results.get()
+        if kind == 'read':
+            latencies.append(latency * 1000)
+        else:
+            statuses.append(status)
+    for worker in workers:
+        worker.join()
+
+    latencies.sort()
+    return [
+        f'{statistics.median(latencies):.0f}',
+        f'{latencies[int(len(latencies) * 0.95)]:.0f}',
+        f'{latencies[-1]:.0f}',
+        statuses.count(200), statuses.count(503),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--logins', type=int, default=24)
+    parser.add_argument('--read-rate', type=float, default=20)
+    parser.add_argument('--seconds', type=float, default=4)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+
+    # the production hasher, not the test runner's
+    settings.PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher']
+    settings.LOGIN_SLOTS_DIR = slots = tempfile.mkdtemp()
+    results = []
+    try:
+        with utils.test_database():
+            utils.seed_movies(100)
+            user = get_user_model().objects.create_user(
+                email='bench@example.com', password='bench-password')
+            token = Token.objects.create(user=user).key
+
+            unbounded = args.workers + args.logins
+            for name, logins, workers in (
+                    ('reads only', 0, settings.LOGIN_WORKERS),
+                    ('unbounded logins', args.logins, unbounded),
+                    ('login slots', args.logins, settings.LOGIN_WORKERS)):
+                settings.LOGIN_WORKERS = workers
+                results.append([name] + run(args, token, logins))
+    finally:
+        shutil.rmtree(slots)
+
+    utils.report(
+        f'{args.read_rate:g} reads/s on {args.workers} workers, '
+        f'{args.logins} logins at once: read latency in ms',
+        ('scenario', 'p50', 'p95', 'max', 'logins ok', 'logins 503'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
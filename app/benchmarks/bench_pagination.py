@@ -0,0 +1,81 @@
+"""Benchmark keyset pagination against OFFSET pagination at deep pages
+
+    python -m benchmarks.bench_pagination --rows 200000
+"""
+import argparse
+
+from benchmarks import utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.db import connection as db
+    from rest_framework.pagination import Cursor, LimitOffsetPagination
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from core.models import Movie
+    from movie.pagination import MoviePagination
+    from movie.serializers import MovieSerializer
+
+    factory = APIRequestFactory()
+
+    def keyset_page(movie_id):
+        paginator = MoviePagination()
+        paginator.base_url = 'http://testserver/api/movie/movies/'
+        paginator.ordering = ('-id',)
+        url = paginator.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=paginator._get_position_from_instance(
+                {'id': movie_id}, paginator.ordering)))
+        request = Request(factory.get(url, {'page_size': args.page_size}))
+
+        def run():
+            page = MoviePagination().paginate_queryset(
+                Movie.objects.all(), request)
+            return MovieSerializer(page, many=True).data
+        return run
+
+    def offset_page(offset):
+        request = Request(factory.get(
+            '/api/movie/movies/',
+            {'limit': args.page_size, 'offset': offset}))
+
+        def run():
+            page = LimitOffsetPagination().paginate_queryset(
+                Movie.objects.order_by('-id'), request)
+            return MovieSerializer(page, many=True).data
+        return run
+
+    with utils.test_database():
+        print(f'seeding {args.rows} movies...')
+        ids = utils.seed_movies(args.rows)
+        with db.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        rows = []
+        for fraction in (0, 0.01, 0.1, 0.5, 0.99):
+            depth = int((len(ids) - 1) * fraction)
+            rows.append((
+                f'{fraction:.0%}',
+                depth,
+                f'{utils.timeit(keyset_page(ids[depth]), args.repeat):.2f}',
+                f'{utils.timeit(offset_page(depth), args.repeat):.2f}',
+            ))
+
+    utils.report(
+        f'median ms per page of {args.page_size} ({args.rows} movies)',
+        ('depth', 'row', 'keyset', 'offset'),
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
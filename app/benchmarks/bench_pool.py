@@ -0,0 +1,86 @@
+"""Benchmark request latency with and without the connection pool
+
+    python -m benchmarks.bench_pool --requests 500
+
+Sends `--requests` token authenticated movie detail reads through the
+test client, closing the database connection after each one as a WSGI
+worker does: first over postgresql's own backend, which then opens a
+connection per request, then over core.db's pooled one. Reports the
+latency distribution and the connections opened.
+"""
+import argparse
+import statistics
+import time
+from unittest.mock import patch
+
+import psycopg2
+
+from benchmarks import utils
+
+
+def run(engine, paths, token):
+    from django.db import connections
+    from django.db.utils import load_backend
+    from django.test import Client
+
+    connections['default'].close()
+    wrapper = load_backend(engine).DatabaseWrapper(
+        connections['default'].settings_dict, 'default')
+    connections['default'] = wrapper
+
+    client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+    latencies = []
+    with patch('psycopg2.connect', wraps=psycopg2.connect) as connect:
+        for path in paths:
+            start = time.perf_counter()
+            response = client.get(path)
+            # what the request_finished signal does outside the test client
+            wrapper.close()
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.status_code
+
+    latencies.sort()
+    return [
+        engine, f'{statistics.median(latencies):.2f}',
+        f'{latencies[int(len(latencies) * 0.99)]:.2f}',
+        f'{latencies[-1]:.2f}', connect.call_count,
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.urls import reverse
+    from rest_framework.authtoken.models import Token
+
+    # off, so every request reaches the database
+    settings.RESPONSE_CACHE = dict(settings.RESPONSE_CACHE, ENABLED=False)
+    settings.TOKEN_AUTH_CACHE = dict(
+        settings.TOKEN_AUTH_CACHE, ENABLED=False)
+    results = []
+    with utils.test_database():
+        movies = utils.seed_movies(100)
+        token = Token.objects.create(user=get_user_model().objects.create_user(
+            email='bench@example.com', password='bench')).key
+        paths = [reverse('movie:movie-detail', args=[movies[i % 100]])
+                 for i in range(args.requests)]
+
+        for engine in ('django.db.backends.postgresql', 'core.db'):
+            run(engine, paths[:20], token)
+            results.append(run(engine, paths, token))
+
+    utils.report(
+        f'{args.requests} movie detail reads: latency in ms',
+        ('engine', 'p50', 'p99', 'max', 'connections opened'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
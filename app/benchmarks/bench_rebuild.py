@@ -0,0 +1,70 @@
+"""Benchmark recomputing rating aggregates with rebuild_ratings
+
+    python -m benchmarks.bench_rebuild --reviews 10000000 --workers 1 4 8
+
+Seeds movies and reviews with generate_series (postgres only), drifts
+every tenth movie and reports the time of each worker count.
+"""
+import argparse
+import time
+from io import StringIO
+
+from benchmarks import utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--movies', type=int, default=100000)
+    parser.add_argument('--reviews', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--range-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+
+    users = -(-args.reviews // args.movies)
+    results = []
+    with utils.test_database():
+        movies = utils.seed_movies(args.movies)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO core_user (email, password, name, is_active, '
+                'is_staff, is_superuser) SELECT \'user\' || i || '
+                '\'@example.com\', \'\', \'\', true, false, false '
+                'FROM generate_series(1, %s) i', [users])
+            cursor.execute(
+                'INSERT INTO core_review (movie_id, user_id, rating, '
+                'active, created, update) '
+                'SELECT m.id, u.id, 1 + (m.id + u.id) %% 5, true, '
+                'now(), now() FROM (SELECT id FROM core_movie) m '
+                'CROSS JOIN (SELECT id FROM core_user) u '
+                'LIMIT %s', [args.reviews])
+            cursor.execute('ANALYZE')
+
+        for workers in args.workers:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'UPDATE core_movie SET number_rating = 0 '
+                    'WHERE id % 10 = 0')
+            start = time.perf_counter()
+            out = StringIO()
+            call_command('rebuild_ratings', workers=workers,
+                         range_size=args.range_size, verbosity=0, stdout=out)
+            results.append((
+                workers, len(movies), args.reviews,
+                f'{time.perf_counter() - start:.1f}',
+                out.getvalue().split(',')[1].strip(),
+            ))
+
+    utils.report(
+        'rebuild_ratings: seconds per run',
+        ('workers', 'movies', 'reviews', 'seconds', 'result'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark rendering a movie's reviews in full and streamed
+
+    python -m benchmarks.bench_renderers
+
+Reports time and peak python memory of JSONRenderer on the whole list,
+FastJSONRenderer on the whole list and the chunked streaming response.
+"""
+import argparse
+import tracemalloc
+
+from benchmarks import utils
+
+
+def peak_kib(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.contrib.auth import get_user_model
+    from rest_framework.renderers import JSONRenderer
+
+    from core.models import Movie, Review
+    from core.renderers import FastJSONRenderer, streaming_list_response
+    from movie.serializers import ReviewDetailSerializer
+
+    results = []
+    with utils.test_database():
+        # one review per user and movie: a user per review
+        users = get_user_model().objects.bulk_create(
+            (get_user_model()(email=f'bench{i}@example.com')
+             for i in range(max(args.rows))),
+            batch_size=10000,
+        )
+        for count in args.rows:
+            movie = Movie.objects.create(title='movie', storyLine='story')
+            Review.objects.bulk_create(
+                (Review(user=user, movie=movie, rating=i % 5 + 1,
+                        description=f'review {i}')
+                 for i, user in enumerate(users[:count])),
+                batch_size=10000,
+            )
+            queryset = Review.objects.filter(movie=movie).select_related(
+                'user').order_by('-created', '-id')
+
+            def render(renderer):
+                data = ReviewDetailSerializer(queryset, many=True).data
+                return lambda: renderer.render(data)
+
+            def serialize_and_render(renderer):
+                return lambda: renderer.render(
+                    ReviewDetailSerializer(queryset, many=True).data)
+
+            def streamed():
+                response = streaming_list_response(
+                    queryset, ReviewDetailSerializer,
+                    chunk_size=args.chunk_size)
+                for _ in response.streaming_content:
+                    pass
+
+            results.append((
+                count,
+                f'{utils.timeit(render(JSONRenderer()), args.repeat):.1f}',
+                f'{utils.timeit(render(FastJSONRenderer()), args.repeat):.1f}',
+                peak_kib(serialize_and_render(JSONRenderer())),
+                peak_kib(streamed),
+            ))
+
+    utils.report(
+        'reviews of one movie: render ms and peak KiB per request',
+        ('rows', 'json ms', 'orjson ms', 'full KiB', 'streamed KiB'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark how much of the read traffic the replica router takes off
+the primary
+
+    python -m benchmarks.bench_replicas --requests 1000 --write-every 20
+
+A second test database stands in for a replica, seeded with copies of
+the primary's rows. `--clients` clients read movie details, while one
+in `--write-every` requests is a review posted by another client, which
+then reads the movie back and stays pinned to the primary. Runs first
+with no replicas configured, then with the replica. Reports the queries
+each database ran and read latency.
+"""
+import argparse
+import statistics
+import time
+from contextlib import ExitStack
+
+from benchmarks import utils
+
+
+def run(args, replicas, movies, tokens):
+    from django.db import connections
+    from django.test import Client, override_settings
+    from django.urls import reverse
+
+    from core.models import Review
+
+    Review.objects.all().delete()
+    queries = {'default': 0, 'replica': 0}
+
+    def counter(alias):
+        def count(execute, sql, params, many, context):
+            queries[alias] += 1
+            return execute(sql, params, many, context)
+        return count
+
+    latencies = []
+    with ExitStack() as stack:
+        stack.enter_context(override_settings(DATABASE_REPLICAS=replicas))
+        for alias in queries:
+            stack.enter_context(
+                connections[alias].execute_wrapper(counter(alias)))
+        writer, *readers = [Client(HTTP_AUTHORIZATION=f'Token {token}')
+                            for token in tokens]
+        for i in range(args.requests):
+            movie = movies[i % len(movies)]
+            client = readers[i % len(readers)]
+            if i % args.write_every == 0:
+                movie = movies[i // args.write_every % len(movies)]
+                response = writer.post(
+                    reverse('movie:review-create', args=[movie]),
+                    {'rating': 5, 'description': 'bench'})
+                assert response.status_code == 201, response.content
+                client = writer
+            start = time.perf_counter()
+            response = client.get(reverse('movie:movie-detail', args=[movie]))
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.status_code
+
+    total = sum(queries.values())
+    return [
+        ', '.join(replicas) or 'none', queries['default'],
+        queries['replica'], f'{queries["replica"] / total:.0%}',
+        f'{statistics.median(latencies):.2f}',
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--write-every', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=10)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db import connections
+    from rest_framework.authtoken.models import Token
+
+    from core.models import Movie
+
+    # off, so every request reaches a database
+    settings.RESPONSE_CACHE = dict(settings.RESPONSE_CACHE, ENABLED=False)
+    settings.TOKEN_AUTH_CACHE = dict(
+        settings.TOKEN_AUTH_CACHE, ENABLED=False)
+    default = connections['default'].settings_dict
+    connections.settings['replica'] = dict(
+        default, TEST=dict(default['TEST'], NAME='test_replica'))
+    replica = connections['replica']
+
+    results = []
+    with utils.test_database():
+        replica.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            movies = utils.seed_movies(100)
+            tokens = []
+            for number in range(args.clients + 1):
+                user = get_user_model().objects.create_user(
+                    email=f'bench{number}@example.com', password='bench')
+                tokens.append(Token.objects.create(user=user).key)
+            for model in (get_user_model(), Token, Movie):
+                model.objects.using('replica').bulk_create(
+                    model.objects.all())
+
+            for replicas in ([], ['replica']):
+                results.append(run(args, replicas, movies, tokens))
+        finally:
+            replica.creation.destroy_test_db('postgres', verbosity=0)
+
+    utils.report(
+        f'{args.requests} requests, one in {args.write_every} a write: '
+        'queries per database, read latency in ms',
+        ('replicas', 'primary', 'replica', 'offloaded', 'read p50'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark the resized movie image endpoint, hits against misses
+
+    python -m benchmarks.bench_resize --size 3000 2000 --burst 16
+
+Reports the median latency of a miss, which resizes, and of a hit,
+served from the disk cache, for a few widths, then how many resizes a
+burst of concurrent requests for one uncached width costs.
+"""
+import argparse
+import io
+import shutil
+import tempfile
+import threading
+from unittest.mock import patch
+
+from benchmarks import utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, nargs=2, default=[3000, 2000])
+    parser.add_argument('--widths', type=int, nargs='+',
+                        default=[160, 640, 1280])
+    parser.add_argument('--burst', type=int, default=16)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from PIL import Image
+    from django.conf import settings
+    from django.core.files.base import ContentFile
+    from django.db import connection
+    from django.test import Client
+    from django.urls import reverse
+
+    from core.models import Movie
+    from movie import images
+
+    media_root = tempfile.mkdtemp()
+    settings.MEDIA_ROOT = media_root
+    results = []
+    try:
+        with utils.test_database():
+            movie = Movie.objects.create(title='bench', storyLine='bench')
+            buffer = io.BytesIO()
+            Image.effect_noise(tuple(args.size), 64).convert('RGB').save(
+                buffer, format='JPEG', quality=90)
+            movie.image.save('bench.jpg', ContentFile(buffer.getvalue()))
+            url = reverse('movie:movie-image', args=[movie.pk])
+            client = Client()
+
+            def get(width, fmt):
+                response = client.get(url, {'w': width, 'fmt': fmt})
+                assert response.status_code == 200, response.status_code
+                b''.join(response.streaming_content)
+
+            for width in args.widths:
+                for fmt in ('webp', 'jpeg'):
+                    misses = iter(range(10 ** 6))
+                    # a fresh width per call, so each one resizes
+                    miss = utils.timeit(
+                        lambda: get(width - next(misses) % 8, fmt), repeat=5)
+                    hit = utils.timeit(lambda: get(width, fmt))
+                    results.append((width, fmt, f'{miss:.1f}', f'{hit:.2f}',
+                                    f'{miss / hit:.0f}x'))
+
+            def get_in_thread(width, fmt):
+                try:
+                    get(width, fmt)
+                finally:
+                    connection.close()
+
+            with patch('movie.resize.render_resized',
+                       wraps=images.render_resized) as render:
+                threads = [
+                    threading.Thread(target=get_in_thread, args=(777, 'webp'))
+                    for _ in range(args.burst)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            burst = render.call_count
+    finally:
+        shutil.rmtree(media_root)
+
+    utils.report(
+        f'movies/<id>/image: {args.size[0]}x{args.size[1]} jpeg original, '
+        'median ms',
+        ('width', 'format', 'miss', 'hit', 'speedup'),
+        results,
+    )
+    print(f'\n{args.burst} concurrent requests for one width: '
+          f'{burst} resize(s)')
+
+
+if __name__ == '__main__':
+    main()
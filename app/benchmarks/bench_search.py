@@ -0,0 +1,86 @@
+"""Benchmark movie search latency on a seeded catalog
+
+    python -m benchmarks.bench_search --rows 1000000
+
+Compares the indexed search against a sequential `icontains` scan of
+title and storyLine, for a common word, a rare word and a typo.
+"""
+import argparse
+import random
+
+from benchmarks import utils
+
+WORDS = """
+    love war night city dark king last lost blood star fire road dead
+    girl house man river secret world shadow home game heart gold iron
+    summer winter storm ghost dream family friend hunter island crime
+    ocean empire queen stone wolf fall rise return escape journey voyage
+""".split()
+QUERIES = [
+    ('common word', 'love'),
+    ('two words', 'dark river'),
+    ('rare word', 'zanzibar'),
+    ('title typo', 'shadw empir'),
+]
+
+
+def seed(count, batch_size=10000):
+    from core.models import Movie
+
+    rng = random.Random(42)
+    for start in range(0, count, batch_size):
+        movies = []
+        for i in range(start, min(start + batch_size, count)):
+            title = ' '.join(rng.sample(WORDS, 3)).title()
+            story = ' '.join(rng.choice(WORDS) for _ in range(12))
+            if i % 10000 == 0:
+                story += ' zanzibar'
+            movies.append(Movie(title=title, storyLine=story))
+        Movie.objects.bulk_create(movies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.db.models import Q
+
+    from core.models import Movie
+    from movie.search import search_movies
+
+    results = []
+    with utils.test_database() as connection:
+        seed(args.rows)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_movie')
+
+        queryset = Movie.objects.order_by('-id')
+        for label, text in QUERIES:
+            def indexed():
+                return search_movies(queryset, text, args.limit)
+
+            def scan():
+                return list(queryset.filter(
+                    Q(title__icontains=text) | Q(storyLine__icontains=text)
+                )[:args.limit])
+
+            results.append((
+                label, repr(text), len(indexed()),
+                f'{utils.timeit(indexed, args.repeat):.1f}',
+                f'{utils.timeit(scan, args.repeat):.1f}',
+            ))
+
+    utils.report(
+        f'median ms per search over {args.rows} movies',
+        ('query', 'q', 'hits', 'search', 'icontains'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark MovieSerializer against the `.values()` fast path
+
+    python -m benchmarks.bench_serializers
+
+Runs on in-memory rows, so it measures serialization only.
+"""
+import argparse
+from decimal import Decimal
+
+from benchmarks import utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    utils.setup()
+
+    from django.utils import timezone
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from core.models import Movie, RATINGS, rating_count_field
+    from movie.fastpath import FastReader
+    from movie.serializers import MovieSerializer
+
+    request = Request(APIRequestFactory().get('/api/movie/movies/'))
+    context = {'request': request}
+    now = timezone.now()
+
+    results = []
+    for count in args.rows:
+        rows = [
+            {
+                'id': i,
+                'title': f'movie {i}',
+                'image': f'uploads/movie/{i}.jpg' if i % 2 else None,
+                'image_variants': [
+                    {'width': width, 'format': 'webp',
+                     'name': f'uploads/movie/{i}-{width}.webp'}
+                    for width in (640, 320)
+                ] if i % 2 else [],
+                'platform': i % 7 or None,
+                'active': bool(i % 3),
+                'avg_rating': Decimal(i % 500) / 100,
+                'number_rating': i % 40,
+                'created': now,
+                **{rating_count_field(r): (i + r) % 9 for r in RATINGS},
+            }
+            for i in range(count)
+        ]
+        movies = [
+            Movie(**{k: v for k, v in row.items() if k != 'platform'},
+                  platform_id=row['platform'])
+            for row in rows
+        ]
+
+        def slow():
+            return MovieSerializer(movies, many=True, context=context).data
+
+        def fast():
+            return FastReader(MovieSerializer, context).to_representation(
+                rows)
+
+        slow_ms = utils.timeit(slow, args.repeat)
+        fast_ms = utils.timeit(fast, args.repeat)
+        results.append((
+            count, f'{slow_ms:.1f}', f'{fast_ms:.1f}',
+            f'{slow_ms / fast_ms:.1f}x'))
+
+    utils.report(
+        'median ms to serialize the movie list',
+        ('rows', 'serializer', 'fast path', 'speedup'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
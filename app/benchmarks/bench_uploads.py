@@ -0,0 +1,150 @@
+"""Benchmark peak memory of receiving and validating an image upload
+
+    python -m benchmarks.bench_uploads
+
+Each upload is parsed and validated in a fresh process, reading a
+pre-encoded multipart body from disk, and the growth of its peak RSS is
+reported, next to the memory decoding the image would take, for:
+
+* imagefield: django's default upload handlers and DRF's ImageField,
+  as the upload endpoint used to;
+* streaming: movie.uploads' ImageUploadHandler and HeaderImageField.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import utils
+
+BOUNDARY = 'BoUnDaRy'
+
+
+def payloads(directory):
+    """write multipart bodies of each test image, return their paths"""
+    from django.test.client import encode_multipart
+    from PIL import Image
+
+    from movie.tests.test_uploads import png_header
+
+    def noise(width, height):
+        buffer = io.BytesIO()
+        Image.frombytes(
+            'RGB', (width, height), os.urandom(width * height * 3),
+        ).save(buffer, 'JPEG', quality=90)
+        return buffer.getvalue()
+
+    images = {}
+    images['noisy 1MP jpeg'] = ('small.jpg', noise(1200, 800), 1200 * 800)
+    images['noisy 5MP jpeg'] = ('photo.jpg', noise(2600, 2000), 2600 * 2000)
+    buffer = io.BytesIO()
+    Image.new('RGB', (8000, 8000), 'white').save(buffer, 'PNG')
+    images['flat 64MP png'] = ('flat.png', buffer.getvalue(), 8000 * 8000)
+    images['10GP png header'] = (
+        'bomb.png', png_header(100000, 100000), 100000 * 100000)
+
+    paths = {}
+    for label, (name, content, pixels) in images.items():
+        file = io.BytesIO(content)
+        file.name = name
+        path = os.path.join(directory, name + '.body')
+        with open(path, 'wb') as body:
+            body.write(encode_multipart(BOUNDARY, {'image': file}))
+        paths[label] = (path, len(content), pixels)
+    return paths
+
+
+def peak_kib(reset=False):
+    """the process' peak RSS, optionally reset to the current RSS first"""
+    try:
+        if reset:
+            # linux: writing 5 resets VmHWM
+            with open('/proc/self/clear_refs', 'w') as file:
+                file.write('5')
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(mode, path):
+    """parse and validate one upload, print the peak RSS growth"""
+    utils.setup()
+
+    from django.conf import settings
+    from django.core.exceptions import ValidationError
+    from django.core.handlers.wsgi import WSGIRequest
+    from PIL import Image
+    from rest_framework import serializers
+    from rest_framework.parsers import MultiPartParser
+    from rest_framework.request import Request
+
+    from movie.uploads import HeaderImageField, ImageUploadHandler
+
+    settings.MEDIA_ROOT = os.path.dirname(path)
+    with open(path, 'rb') as body:
+        django_request = WSGIRequest({
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}',
+            'CONTENT_LENGTH': str(os.path.getsize(path)),
+            'wsgi.input': body,
+        })
+        request = Request(django_request, parsers=[MultiPartParser()])
+        if mode == 'streaming':
+            request.upload_handlers = [ImageUploadHandler(request)]
+            field = HeaderImageField()
+        else:
+            field = serializers.ImageField()
+
+        # import every Pillow plugin now rather than during the upload
+        Image.init()
+        before = peak_kib(reset=True)
+        try:
+            field.run_validation(request.data['image'])
+            result = 'accepted'
+        except serializers.ValidationError as exc:
+            result = str(exc.detail[0])[:40]
+        except ValidationError as exc:
+            result = exc.messages[0][:40]
+        print(json.dumps([peak_kib() - before, result]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    utils.setup()
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for label, (path, size, pixels) in payloads(directory).items():
+            for mode in ('imagefield', 'streaming'):
+                output = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.bench_uploads',
+                     '--child', mode, path],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                growth, result = json.loads(output.splitlines()[-1])
+                results.append((
+                    label, size // 1024, pixels * 3 // 2 ** 20, mode,
+                    growth, result))
+
+    utils.report(
+        'peak RSS growth receiving one upload; RGB MiB is what decoding '
+        'an accepted image takes later',
+        ('image', 'file KiB', 'RGB MiB', 'mode', 'peak KiB', 'result'),
+        results,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""shared helpers for the benchmark scripts"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    """configure django for a standalone script, as the test runner does"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup()
+
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+
+@contextmanager
+def test_database():
+    """create a throwaway test database and drop it afterwards"""
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def timeit(func, repeat=20):
+    """call `func` `repeat` times and return the median in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def seed_movies(count, batch_size=10000, **fields):
+    """bulk insert `count` movies and return their ids, newest first"""
+    from core.models import Movie
+
+    for start in range(0, count, batch_size):
+        Movie.objects.bulk_create(
+            Movie(
+                title=f'movie {i}',
+                storyLine=f'storyline of movie {i}',
+                **fields,
+            )
+            for i in range(start, min(start + batch_size, count))
+        )
+    return list(
+        Movie.objects.order_by('-id').values_list('id', flat=True))
+
+
+def report(title, header, rows):
+    """print a small aligned table"""
+    print(f'\n{title}')
+    widths = [
+        max(len(str(value)) for value in column)
+        for column in zip(header, *rows)
+    ]
+    for row in [header, *rows]:
+        print('  '.join(
+            str(value).rjust(width) for value, width in zip(row, widths)))
@@ -0,0 +1,108 @@
+"""ASGI handler serving the read endpoints from a thread pool
+
+Django 3.2's ORM is synchronous, and its ASGI handler runs every sync
+view on one shared thread, so a single slow query would hold up every
+request of the process. GET and HEAD requests of the views named in
+ASYNC_READ_VIEWS are served by coroutines instead, which hand the view
+to a pool of ASYNC_READ_THREADS threads and await it: authentication,
+queries, serialization and rendering all happen there, each thread
+with its own database connection, while the event loop only waits.
+The views are the ones WSGI serves, so both paths answer alike.
+
+Django's handler iterates streaming responses on the event loop, where
+a lazy queryset read as the body goes out may not query. Each part of
+such a response is produced on the thread sync views run on instead.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+
+_executor = None
+
+
+def get_read_executor():
+    """return the process wide pool running read views"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_READ_THREADS,
+            thread_name_prefix='async-read',
+        )
+    return _executor
+
+
+def _render_view(view, request, *args, **kwargs):
+    # connections are per thread; manage them as a request would
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            # rendered here, the handler's own render has nothing to do
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+@functools.lru_cache(maxsize=None)
+def async_read_view(view):
+    """return a coroutine view running sync `view` in the read pool"""
+    @functools.wraps(view)
+    async def read_view(request, *args, **kwargs):
+        call = functools.partial(_render_view, view, request, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(
+            get_read_executor(), contextvars.copy_context().run, call)
+    return read_view
+
+
+class ReadPoolASGIHandler(ASGIHandler):
+    """ASGIHandler running the reads of ASYNC_READ_VIEWS in a thread pool"""
+
+    def resolve_request(self, request):
+        match = super().resolve_request(request)
+        if request.method in ('GET', 'HEAD') and \
+                match.view_name in settings.ASYNC_READ_VIEWS:
+            match.func = async_read_view(match.func)
+        return match
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip()))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        # on the thread sync views share, as the view that made it ran
+        next_part = sync_to_async(next, thread_sensitive=True)
+        parts = iter(response)
+        while True:
+            part = await next_part(parts, None)
+            if part is None:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
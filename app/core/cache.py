@@ -0,0 +1,137 @@
+"""Cache backends shared by the api caches"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+class LRUCache:
+    """bounded in-process cache with least recently used eviction"""
+
+    def __init__(self, max_entries=1024, timeout=None):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def add(self, key, value, timeout=None):
+        """set `key` unless it is already cached; return whether it was set"""
+        with self._lock:
+            if key in self._data:
+                return False
+        self.set(key, value, timeout)
+        return True
+
+    def incr(self, key, delta=1):
+        with self._lock:
+            expires, value = self._data[key]
+            self._data[key] = (expires, value + delta)
+            self._data.move_to_end(key)
+            return value + delta
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            'backend': 'lru',
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class SharedCache:
+    """cache stored in one of the django `CACHES`, shared between workers
+
+    Tests can point the alias at a locmem cache to stand in for
+    memcached or redis.
+    """
+    _missing = object()
+
+    def __init__(self, alias='shared', timeout=None, max_entries=None):
+        # max_entries, as LRUCache takes it: the django cache is bounded
+        # by its own MAX_ENTRIES, or by the server's memory
+        self.alias = alias
+        self.timeout = timeout
+        self.hits = self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key, default=None):
+        value = self.cache.get(key, self._missing)
+        if value is self._missing:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        self.cache.set(key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        return self.cache.add(key, value, timeout)
+
+    def incr(self, key, delta=1):
+        return self.cache.incr(key, delta)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        # evictions happen inside memcached / redis and are not visible
+        # to the client; read them from the server's own metrics.
+        return {
+            'backend': f'shared:{self.alias}',
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': None,
+        }
+
+
+def create_cache(config):
+    """build a cache backend from a `{'BACKEND': ..., 'OPTIONS': ...}` dict"""
+    backend = import_string(config['BACKEND'])
+    return backend(**config.get('OPTIONS', {}))
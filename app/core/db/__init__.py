@@ -0,0 +1,5 @@
+"""Postgres backend keeping connections in a per process pool
+
+Set as the ENGINE of a database; its POOL dict configures the pool,
+see core.db.pool.ConnectionPool.
+"""
@@ -0,0 +1,47 @@
+"""Postgres database wrapper checking connections out of a pool"""
+import psycopg2
+import psycopg2.extras
+from django.db.backends.postgresql import base, creation
+
+from core.db.pool import close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # idle pooled connections would keep the database from dropping
+        close_pools(database=test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """postgresql's wrapper, with connections lent by a pool"""
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(
+            self.alias, conn_params, self.settings_dict.get('POOL', {}),
+            lambda: psycopg2.connect(**conn_params))
+        connection = self.pool.getconn()
+        # as postgresql's wrapper sets up the connections it opens
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # the wrapper holds on to it until the block exits: it
+                # must not be lent out meanwhile
+                self.connection.close()
+            self.pool.putconn(self.connection)
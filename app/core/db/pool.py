@@ -0,0 +1,267 @@
+"""Per process pool of database connections"""
+import os
+import random
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """no connection could be checked out within the pool's timeout"""
+
+
+class PooledConnection:
+    """an open connection and the times the pool decides its fate by"""
+
+    def __init__(self, connection, lifetime):
+        self.connection = connection
+        self.opened = self.returned = time.monotonic()
+        # spread recycling so connections opened together are not all
+        # replaced together
+        self.expires = self.opened + lifetime * (1 - random.random() / 10)
+
+
+class ConnectionPool:
+    """thread safe pool of at most `max_size` connections made by `connect`
+
+    Connections go back to the pool instead of closing. Up to `min_size`
+    idle ones stay open indefinitely, the rest close after `max_idle`
+    seconds unused, and any is replaced once older than `max_lifetime`.
+    A connection idle for over `ping_after` seconds is checked with a
+    `SELECT 1` before reuse. Checkouts with every connection in use wait
+    up to `timeout` seconds, then raise PoolTimeout.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5,
+                 max_lifetime=3600, max_idle=300, ping_after=1):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+        self._idle = []
+        self._in_use = {}
+        self._pending = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self.checkouts = self.waits = self.timeouts = 0
+        self.wait_time = self.max_wait_time = 0.0
+        self.opened = self.closed = self.recycled = self.ping_failures = 0
+
+    @property
+    def size(self):
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    def getconn(self):
+        """check out a healthy connection, opening one if there is room"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        stale = []
+        with self._condition:
+            while True:
+                pooled = self._take_idle(stale)
+                if pooled is not None or self.size < self.max_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f'no database connection free within '
+                        f'{self.timeout:g}s ({self.max_size} in use)')
+                waited = True
+                self._waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            # holds the slot while the connection is checked or opened
+            self._pending += 1
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+                wait = time.monotonic() - start
+                self.wait_time += wait
+                self.max_wait_time = max(self.max_wait_time, wait)
+        for expired in stale:
+            self._close(expired)
+
+        try:
+            if pooled is not None and not self._healthy(pooled):
+                self._close(pooled)
+                with self._condition:
+                    self.ping_failures += 1
+                pooled = None
+            if pooled is None:
+                pooled = PooledConnection(self.connect(), self.max_lifetime)
+                with self._condition:
+                    self.opened += 1
+        except BaseException:
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._pending -= 1
+            self._in_use[id(pooled.connection)] = pooled
+        return pooled.connection
+
+    def putconn(self, connection):
+        """take `connection` back, closing it if it is unfit for reuse"""
+        with self._condition:
+            pooled = self._in_use.pop(id(connection), None)
+        if pooled is None:
+            # not ours, e.g. the pool was closed meanwhile
+            connection.close()
+            return
+        try:
+            if not connection.closed and \
+                    connection.info.transaction_status != \
+                    TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            reusable = not connection.closed and \
+                connection.info.transaction_status == TRANSACTION_STATUS_IDLE
+        except psycopg2.Error:
+            reusable = False
+        now = time.monotonic()
+        if reusable and pooled.expires <= now:
+            reusable = False
+            with self._condition:
+                self.recycled += 1
+        stale = []
+        with self._condition:
+            if reusable:
+                pooled.returned = now
+                self._idle.append(pooled)
+                self._trim_idle(now, stale)
+            else:
+                stale.append(pooled)
+            self._condition.notify()
+        for pooled in stale:
+            self._close(pooled)
+
+    def close(self):
+        """close the idle connections; those in use close when returned"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._in_use.clear()
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'waiting': self._waiting,
+                'saturation': round(len(self._in_use) / self.max_size, 3),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_ms_total': round(self.wait_time * 1000, 1),
+                'wait_ms_max': round(self.max_wait_time * 1000, 1),
+                'timeouts': self.timeouts,
+                'opened': self.opened,
+                'closed': self.closed,
+                'recycled': self.recycled,
+                'ping_failures': self.ping_failures,
+            }
+
+    def _take_idle(self, stale):
+        # most recently returned first: the least likely to have gone
+        # stale, and it leaves the surplus idle long enough to be trimmed
+        now = time.monotonic()
+        while self._idle:
+            pooled = self._idle.pop()
+            if pooled.expires > now:
+                return pooled
+            self.recycled += 1
+            stale.append(pooled)
+        return None
+
+    def _trim_idle(self, now, stale):
+        # `_idle` is ordered by return time, oldest first
+        while len(self._idle) > self.min_size and \
+                now - self._idle[0].returned > self.max_idle:
+            stale.append(self._idle.pop(0))
+
+    def _healthy(self, pooled):
+        connection = pooled.connection
+        if connection.closed:
+            return False
+        if time.monotonic() - pooled.returned <= self.ping_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _close(self, pooled):
+        try:
+            pooled.connection.close()
+        except psycopg2.Error:
+            pass
+        with self._condition:
+            self.closed += 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+# connections inherited over a fork, kept referenced: closing them, even
+# by garbage collection, would end the parent's sessions on the server
+_inherited = []
+
+
+def get_pool(alias, conn_params, options, connect):
+    """return this process' pool for `conn_params`, made on first use"""
+    key = (alias, repr(sorted(conn_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect, **{
+                name.lower(): value for name, value in options.items()})
+            pool.alias = alias
+            pool.database = conn_params.get('database')
+        return pool
+
+
+def close_pools(database=None):
+    """close the idle connections of every pool, or those to `database`"""
+    with _pools_lock:
+        pools = [key for key, pool in _pools.items()
+                 if database is None or pool.database == database]
+        pools = [_pools.pop(key) for key in pools]
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """counters of this process' pools, by database alias"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [dict(alias=pool.alias, database=pool.database, **pool.stats())
+            for pool in pools]
+
+
+def _forget_pools():
+    global _pools_lock
+    # another thread may have held it at the fork
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        _inherited.extend(pooled.connection for pooled in pool._idle)
+        _inherited.extend(pooled.connection
+                          for pooled in pool._in_use.values())
+    _pools.clear()
+
+
+os.register_at_fork(after_in_child=_forget_pools)
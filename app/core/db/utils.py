@@ -0,0 +1,12 @@
+"""Helpers for the database connections of forked worker processes"""
+from django.db import connections
+
+
+def drop_inherited_connections():
+    """forget the connections inherited from the parent, unused
+
+    For the initializer of forked process pools: the child opens its
+    own connections when first needed.
+    """
+    for conn in connections.all():
+        conn.connection = None
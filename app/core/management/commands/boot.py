@@ -0,0 +1,20 @@
+"""Django command running the start steps of a container in one process
+
+wait_for_db, sync_static, migrate_pending and createcachetable, as
+scripts/run.sh would otherwise run them one `manage.py` at a time, each
+paying for a fresh interpreter and django setup.
+"""
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Django command to wait for the database, sync static, migrate"""
+    # wait_for_db runs them, once the database is up
+    requires_system_checks = []
+
+    def handle(self, **options):
+        for name in ('wait_for_db', 'sync_static', 'migrate_pending',
+                     'createcachetable'):
+            call_command(name, stdout=self.stdout, stderr=self.stderr,
+                         verbosity=options['verbosity'])
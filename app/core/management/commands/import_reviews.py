@@ -0,0 +1,222 @@
+"""Django command to bulk load reviews from an NDJSON or CSV file"""
+import csv
+import io
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Movie, Review, User, RATINGS
+from movie.cache import invalidate
+
+try:
+    from orjson import loads
+except ImportError:  # pragma: no cover - pure python fallback
+    from json import loads
+
+STAGING_TABLE = 'review_import'
+COLUMNS = ['line', 'movie_id', 'user_id', 'rating', 'description', 'active']
+
+
+class Command(BaseCommand):
+    """load reviews in batches through a staging table
+
+    Each batch is copied into a temporary table (COPY on postgres,
+    executemany elsewhere), then in one transaction:
+
+    * the first review of each user and movie in the batch is inserted,
+      unless the movie or user is missing or the user already reviewed
+      the movie, so earlier batches and existing reviews win;
+    * the ratings of the inserted reviews are added to their movies with
+      a single UPDATE ... FROM over their per-movie aggregate.
+
+    Only one batch of rows is held in memory.
+    """
+    help = 'Import reviews from an NDJSON or CSV file ("-" for stdin).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=['ndjson', 'csv'],
+            help='file format, by default guessed from the extension')
+        parser.add_argument('--batch-size', type=int, default=50000)
+
+    def handle(self, path, format, batch_size, **options):
+        self.verbosity = options['verbosity']
+        format = format or ('csv' if path.endswith('.csv') else 'ndjson')
+        stream = sys.stdin if path == '-' else open(path, newline='')
+        try:
+            self.import_reviews(stream, format, batch_size)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def import_reviews(self, stream, format, batch_size):
+        self.invalid = 0
+        read = inserted = 0
+        start = time.monotonic()
+
+        with connection.cursor() as cursor:
+            self.create_staging_table(cursor)
+            try:
+                rows = self.parse(stream, format)
+                while True:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    with transaction.atomic():
+                        cursor.execute(f'DELETE FROM {STAGING_TABLE}')
+                        self.load(cursor, batch)
+                        inserted += self.insert_reviews(cursor)
+                        cursor.execute(
+                            f'SELECT DISTINCT movie_id FROM {STAGING_TABLE}')
+                        invalidate('movies', *(
+                            f'movie:{pk}' for pk, in cursor.fetchall()))
+                    read += len(batch)
+                    if self.verbosity > 1:
+                        self.report(read, inserted, start)
+            finally:
+                cursor.execute(f'DROP TABLE IF EXISTS {STAGING_TABLE}')
+
+        self.report(read, inserted, start, style=self.style.SUCCESS)
+
+    def report(self, read, inserted, start, style=str):
+        elapsed = max(time.monotonic() - start, 1e-6)
+        self.stdout.write(style(
+            f'read {read + self.invalid} rows, imported {inserted}, '
+            f'skipped {read - inserted} duplicate or orphan, '
+            f'{self.invalid} invalid in {elapsed:.1f}s '
+            f'({(read + self.invalid) / elapsed:.0f} rows/s)'))
+
+    def parse(self, stream, format):
+        """yield staging rows, reporting and skipping invalid records"""
+        if format == 'csv':
+            records = csv.DictReader(stream)
+            numbered = enumerate(records, start=2)
+        else:
+            numbered = (
+                (number, line) for number, line in enumerate(stream, start=1)
+                if line.strip()
+            )
+
+        for number, record in numbered:
+            try:
+                if format != 'csv':
+                    record = loads(record)
+                yield self.clean(number, record)
+            except (ValueError, TypeError, KeyError, AttributeError) as exc:
+                self.invalid += 1
+                self.stderr.write(f'line {number}: {exc!r}')
+
+    def clean(self, number, record):
+        rating = int(record['rating'])
+        if rating not in RATINGS:
+            raise ValueError(f'rating {rating} is not in 1-5')
+        description = record.get('description') or None
+        if description is not None and len(description) > 250:
+            raise ValueError('description is longer than 250 characters')
+        active = record.get('active', True)
+        if isinstance(active, str):
+            active = active.strip().lower() not in ('0', 'false', 'f', '')
+        return (number, int(record['movie']), int(record['user']), rating,
+                description, bool(active))
+
+    def use_copy(self):
+        return connection.vendor == 'postgresql'
+
+    def create_staging_table(self, cursor):
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {STAGING_TABLE} ('
+            'line bigint, movie_id integer, user_id integer, '
+            'rating integer, description varchar(250), active boolean)')
+
+    def load(self, cursor, batch):
+        if not self.use_copy():
+            placeholders = ', '.join(['%s'] * len(COLUMNS))
+            cursor.executemany(
+                f'INSERT INTO {STAGING_TABLE} VALUES ({placeholders})', batch)
+            return
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f'COPY {STAGING_TABLE} ({", ".join(COLUMNS)}) '
+            'FROM STDIN WITH (FORMAT csv)', buffer)
+        # temporary tables are never auto analyzed
+        cursor.execute(f'ANALYZE {STAGING_TABLE}')
+
+    def insert_reviews(self, cursor):
+        """move the batch's new reviews in, return how many"""
+        qn = connection.ops.quote_name
+        review, movie = qn(Review._meta.db_table), qn(Movie._meta.db_table)
+        now = timezone.now()
+        new_reviews = f"""
+            SELECT s.movie_id, s.user_id, s.rating, s.description, s.active
+            FROM {STAGING_TABLE} s
+            WHERE s.line IN (
+                SELECT MIN(line) FROM {STAGING_TABLE}
+                GROUP BY movie_id, user_id)
+            AND EXISTS (
+                SELECT 1 FROM {movie} m WHERE m.id = s.movie_id)
+            AND EXISTS (
+                SELECT 1 FROM {qn(User._meta.db_table)} u
+                WHERE u.id = s.user_id)
+            AND NOT EXISTS (
+                SELECT 1 FROM {review} r
+                WHERE r.movie_id = s.movie_id AND r.user_id = s.user_id)
+        """
+        insert = (
+            f'INSERT INTO {review} (movie_id, user_id, rating, description, '
+            f'active, created, {qn("update")}) '
+            'SELECT n.*, %s, %s FROM ({source}) n'
+        )
+        counts = ', '.join(
+            f'COUNT(*) FILTER (WHERE rating = {rating}) AS count_{rating}'
+            for rating in RATINGS)
+        histogram = ', '.join(
+            f'rating_count_{r} = m.rating_count_{r} + a.count_{r}'
+            for r in RATINGS)
+        update = f"""
+            UPDATE {movie} AS m SET
+                number_rating = m.number_rating + a.number,
+                rating_sum = m.rating_sum + a.total,
+                avg_rating = COALESCE(
+                    (m.rating_sum + a.total) * 1.0 /
+                    NULLIF(m.number_rating + a.number, 0), 0),
+                version = m.version + 1,
+                {histogram}
+            FROM (
+                SELECT movie_id, COUNT(*) AS number, SUM(rating) AS total,
+                    {counts}
+                FROM {{inserted}} GROUP BY movie_id
+            ) a
+            WHERE m.id = a.movie_id
+        """
+
+        if connection.vendor == 'postgresql':
+            # one statement: concurrent api writes to the same pair are
+            # skipped by the constraint, and only what went in is counted
+            cursor.execute(
+                f'WITH inserted AS ({insert.format(source=new_reviews)} '
+                'ON CONFLICT DO NOTHING '
+                'RETURNING movie_id, rating), '
+                'counted AS (SELECT COUNT(*) FROM inserted), '
+                f'updated AS ({update.format(inserted="inserted")}) '
+                'SELECT * FROM counted', [now, now])
+            return cursor.fetchone()[0]
+
+        cursor.execute(f'CREATE TEMPORARY TABLE review_import_new AS '
+                       f'{new_reviews}')
+        try:
+            cursor.execute(
+                insert.format(source='SELECT * FROM review_import_new'),
+                [now, now])
+            cursor.execute(update.format(inserted='review_import_new'))
+            cursor.execute('SELECT COUNT(*) FROM review_import_new')
+            return cursor.fetchone()[0]
+        finally:
+            cursor.execute('DROP TABLE review_import_new')
@@ -0,0 +1,44 @@
+"""Django command to migrate only when migrations are pending
+
+Compares the migration graph's leaves with the `django_migrations`
+table and runs `migrate` only if a migration is unapplied, which spares
+an unchanged start migrate's checks and post_migrate handlers. Hosts
+starting together take a Postgres advisory lock, so one migrates while
+the others wait and then find nothing left to do.
+"""
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+# an arbitrary key, the same for every host
+LOCK_KEY = 724501
+
+
+class Command(BaseCommand):
+    """Django command to apply pending migrations, if any"""
+    # as migrate, which runs them itself when there is work to do
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='database to migrate')
+
+    def handle(self, **options):
+        connection = connections[options['database']]
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [LOCK_KEY])
+        try:
+            executor = MigrationExecutor(connection)
+            plan = executor.migration_plan(
+                executor.loader.graph.leaf_nodes())
+            if not plan:
+                self.stdout.write('no migrations to apply, skipped migrate')
+                return
+            self.stdout.write(f'{len(plan)} migrations to apply')
+            call_command('migrate', database=options['database'],
+                         interactive=False, verbosity=options['verbosity'])
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [LOCK_KEY])
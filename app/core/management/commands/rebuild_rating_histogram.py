@@ -0,0 +1,39 @@
+"""Django command to recompute the star rating counters of movies"""
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from core.management.commands.rebuild_ratings import rebuild_range
+from core.models import Movie, RATINGS, rating_count_field
+from movie.cache import invalidate
+
+
+class Command(BaseCommand):
+    """recount every movie's reviews per star rating
+
+    Only the counters are fixed, through `rebuild_ratings`' range
+    recount: each range of `--batch-size` ids is locked, costs one
+    GROUP BY over its reviews and one UPDATE of the movies whose
+    counters were wrong.
+    """
+    help = 'Recompute the rating_count_<n> counters of every movie.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, batch_size, **options):
+        fields = [rating_count_field(rating) for rating in RATINGS]
+        bounds = Movie.objects.aggregate(low=Min('id'), high=Max('id'))
+        checked, fixed = 0, 0
+        if bounds['low'] is not None:
+            for start in range(bounds['low'], bounds['high'] + 1,
+                               batch_size):
+                count, diffs = rebuild_range(
+                    start, start + batch_size, fields=fields)
+                changed = {movie_id for movie_id, *_ in diffs}
+                if changed:
+                    invalidate('movies', *(f'movie:{pk}' for pk in changed))
+                checked += count
+                fixed += len(changed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'checked {checked} movies, fixed {fixed}'))
@@ -0,0 +1,204 @@
+"""Django command to recompute the rating aggregates of every movie"""
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from core.db.utils import drop_inherited_connections
+from core.models import Movie, Review, RATINGS
+from movie.cache import invalidate
+
+FIELDS = ['number_rating', 'rating_sum', 'avg_rating'] + [
+    f'rating_count_{rating}' for rating in RATINGS]
+
+
+def actual_sql():
+    """select the stored and recounted aggregates of movies in a range"""
+    qn = connection.ops.quote_name
+    counts = ''.join(
+        f', COUNT(*) FILTER (WHERE rating = {r}) AS rating_count_{r}'
+        for r in RATINGS)
+    recounted = ''.join(
+        f', COALESCE(a.rating_count_{r}, 0) AS rating_count_{r}'
+        for r in RATINGS)
+    return f"""
+        SELECT m.id,
+            COALESCE(a.number_rating, 0) AS number_rating,
+            COALESCE(a.rating_sum, 0) AS rating_sum,
+            COALESCE(ROUND(a.rating_sum * 1.0 / a.number_rating, 2), 0)
+                AS avg_rating
+            {recounted}
+        FROM {qn(Movie._meta.db_table)} m
+        LEFT JOIN (
+            SELECT movie_id, COUNT(*) AS number_rating,
+                SUM(rating) AS rating_sum {counts}
+            FROM {qn(Review._meta.db_table)}
+            WHERE movie_id >= %s AND movie_id < %s
+            GROUP BY movie_id
+        ) a ON a.movie_id = m.id
+        WHERE m.id >= %s AND m.id < %s
+    """
+
+
+def rebuild_range(start, stop, dry_run=False, fields=FIELDS):
+    """fix the aggregates of movies with `start <= id < stop`
+
+    Only `fields`, a subset of `FIELDS`, are compared and fixed. Returns
+    the number of movies checked and the `(id, field, stored, actual)`
+    differences found. The range's movies are locked before counting,
+    so review writes wait and then apply on top of the fix.
+    """
+    qn = connection.ops.quote_name
+    movie = qn(Movie._meta.db_table)
+    drifted = ' OR '.join(f'm.{field} <> n.{field}' for field in fields)
+    params = [start, stop, start, stop]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(*) FROM (SELECT id FROM {movie} '
+            'WHERE id >= %s AND id < %s ORDER BY id FOR UPDATE) locked'
+            if connection.features.has_select_for_update else
+            f'SELECT COUNT(*) FROM {movie} WHERE id >= %s AND id < %s',
+            [start, stop])
+        checked = cursor.fetchone()[0]
+
+        columns = ', '.join(
+            f'm.{field}, n.{field}' for field in fields)
+        cursor.execute(
+            f'SELECT m.id, {columns} FROM {movie} m '
+            f'JOIN ({actual_sql()}) n ON n.id = m.id WHERE {drifted} '
+            'ORDER BY m.id', params)
+        diffs = []
+        for row in cursor.fetchall():
+            for i, field in enumerate(fields):
+                stored, actual = row[1 + 2 * i], row[2 + 2 * i]
+                if stored != actual:
+                    diffs.append((row[0], field, stored, actual))
+
+        if diffs and not dry_run:
+            assignments = ', '.join(
+                f'{field} = n.{field}' for field in fields)
+            cursor.execute(
+                f'UPDATE {movie} AS m SET {assignments}, '
+                f'version = m.version + 1 FROM ({actual_sql()}) n '
+                f'WHERE n.id = m.id AND ({drifted})', params)
+    return checked, diffs
+
+
+class Command(BaseCommand):
+    """recount every movie's rating aggregates from its reviews
+
+    The movie id space is split into ranges of `--range-size` ids, fixed
+    concurrently by `--workers` processes with their own connection. Each
+    range takes one GROUP BY over its reviews and one UPDATE of the
+    movies that drifted. Finished ranges are recorded in `--checkpoint`,
+    so an interrupted run picks up where it stopped.
+    """
+    help = 'Recompute avg_rating, number_rating and the star counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--range-size', type=int, default=10000)
+        parser.add_argument(
+            '--checkpoint',
+            help='file recording finished ranges, read to resume a run')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='print the differences without fixing them')
+
+    def handle(self, workers, range_size, checkpoint, dry_run, **options):
+        if workers < 1 or range_size < 1:
+            raise CommandError('--workers and --range-size must be >= 1')
+        self.verbosity = options['verbosity']
+
+        done = self.load_checkpoint(checkpoint, range_size)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT MIN(id), MAX(id) FROM '
+                f'{connection.ops.quote_name(Movie._meta.db_table)}')
+            low, high = cursor.fetchone()
+        ranges = [] if low is None else [
+            (start, start + range_size)
+            for start in range(low - low % range_size, high + 1, range_size)
+            if start not in done
+        ]
+
+        self.started = time.monotonic()
+        self.checked = self.fixed = self.finished = 0
+        self.total = len(ranges)
+
+        if workers == 1 or len(ranges) < 2:
+            for start, stop in ranges:
+                result = rebuild_range(start, stop, dry_run)
+                self.range_done(start, result, done, checkpoint, dry_run)
+        else:
+            # each forked worker opens its own connection
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=drop_inherited_connections,
+            )
+            with pool:
+                futures = {
+                    pool.submit(rebuild_range, start, stop, dry_run): start
+                    for start, stop in ranges
+                }
+                for future in as_completed(futures):
+                    self.range_done(futures[future], future.result(), done,
+                                    checkpoint, dry_run)
+
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'checked {self.checked} movies, '
+            f'{"would fix" if dry_run else "fixed"} {self.fixed} '
+            f'in {elapsed:.1f}s ({self.checked / elapsed:.0f} movies/s)'))
+
+    def range_done(self, start, result, done, checkpoint, dry_run):
+        checked, diffs = result
+        self.checked += checked
+        self.fixed += len({movie_id for movie_id, *_ in diffs})
+        self.finished += 1
+        if dry_run or self.verbosity > 1:
+            for movie_id, field, stored, actual in diffs:
+                self.stdout.write(
+                    f'movie {movie_id}: {field} {stored} -> {actual}')
+        if not dry_run:
+            if diffs:
+                # the range committed, in this process or a worker
+                invalidate('movies', *{
+                    f'movie:{movie_id}' for movie_id, *_ in diffs})
+            done.add(start)
+            self.save_checkpoint(checkpoint, done)
+        if self.verbosity > 0:
+            elapsed = max(time.monotonic() - self.started, 1e-6)
+            self.stdout.write(
+                f'[{self.finished}/{self.total}] {self.checked} movies '
+                f'checked, {self.fixed} drifted, '
+                f'{self.checked / elapsed:.0f} movies/s')
+
+    def load_checkpoint(self, path, range_size):
+        if not path or not os.path.exists(path):
+            self.range_size = range_size
+            return set()
+        with open(path) as file:
+            state = json.load(file)
+        if state['range_size'] != range_size:
+            raise CommandError(
+                f'{path} was written with --range-size '
+                f'{state["range_size"]}')
+        self.range_size = range_size
+        return set(state['done'])
+
+    def save_checkpoint(self, path, done):
+        if not path:
+            return
+        # replace the file whole so a crash never leaves it half written
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump({'range_size': self.range_size,
+                       'done': sorted(done)}, file)
+        os.replace(f'{path}.tmp', path)
@@ -0,0 +1,105 @@
+"""Django command to move movie images to content addressed names"""
+import os
+import re
+import shutil
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F
+
+from core.models import Movie, StoredFile, movie_image_variant_path
+from core.storage import content_hash
+from movie.cache import invalidate
+
+HASHED = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}\.[^/.]*$')
+
+
+class Command(BaseCommand):
+    """rename the images uploaded with uuid names after their content
+
+    Each file is hard linked to its hashed name, together with its
+    variants, before the movies switch to it, so both names serve until
+    the old one is removed. Files already stored under the hashed name
+    are duplicates and only their old copy is removed. The reference
+    counts are then rebuilt from the movies; run it while no images are
+    being uploaded.
+    """
+    help = 'Rename movie images after their content and recount them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='print the renames without doing them')
+
+    def handle(self, dry_run, **options):
+        storage = Movie._meta.get_field('image').storage
+        names = Movie.objects.exclude(image='').exclude(image=None) \
+            .values_list('image', flat=True).distinct().order_by('image')
+
+        rehashed = duplicates = freed = 0
+        for name in list(names):
+            if HASHED.search(name):
+                continue
+            if not storage.exists(name):
+                self.stderr.write(f'{name}: missing, skipped')
+                continue
+            with storage.open(name) as file:
+                new = storage.hashed_name(name, content_hash(File(file)))
+            duplicate = storage.exists(new)
+            if options['verbosity'] > 1 or dry_run:
+                self.stdout.write(
+                    f'{name} -> {new}{" (duplicate)" if duplicate else ""}')
+            if dry_run:
+                rehashed += 1
+                duplicates += duplicate
+                continue
+
+            old_dir = storage.path(os.path.splitext(name)[0])
+            new_dir = storage.path(os.path.splitext(new)[0])
+            if duplicate:
+                freed += storage.size(name)
+            else:
+                os.makedirs(os.path.dirname(storage.path(new)), exist_ok=True)
+                os.link(storage.path(name), storage.path(new))
+            if os.path.isdir(old_dir) and not os.path.exists(new_dir):
+                shutil.copytree(old_dir, new_dir, copy_function=os.link)
+
+            self.rename(name, new)
+            storage.delete(name)
+            rehashed += 1
+            duplicates += duplicate
+
+        if not dry_run:
+            self.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'{"would rehash" if dry_run else "rehashed"} {rehashed} images, '
+            f'{duplicates} duplicate, {freed / 2 ** 20:.1f} MB freed'))
+
+    def rename(self, name, new):
+        """point the movies with image `name` at `new`, and its variants"""
+        with transaction.atomic():
+            movies = Movie.objects.select_for_update().filter(image=name)
+            pks = []
+            for pk, variants in movies.values_list('pk', 'image_variants'):
+                for variant in variants:
+                    variant['name'] = movie_image_variant_path(
+                        new, variant['width'],
+                        os.path.splitext(variant['name'])[1][1:])
+                Movie.objects.filter(pk=pk).update(
+                    image=new, image_variants=variants,
+                    version=F('version') + 1)
+                pks.append(pk)
+        invalidate('movies', *(f'movie:{pk}' for pk in pks))
+
+    def recount(self):
+        """set every stored image's reference count from the movies"""
+        with transaction.atomic():
+            StoredFile.objects.all().delete()
+            StoredFile.objects.bulk_create(
+                (StoredFile(name=row['image'], references=row['references'])
+                 for row in Movie.objects.exclude(image='')
+                 .exclude(image=None).values('image')
+                 .annotate(references=Count('id')).order_by()),
+                batch_size=1000,
+            )
@@ -0,0 +1,119 @@
+"""Django command to collect the static files that changed since last time
+
+Fingerprints the static source tree, each file by its size and
+modification time, and compares it with the manifest the previous run
+left in STATIC_ROOT. An unchanged tree is skipped outright; otherwise
+only the files new or changed since the manifest are copied, by a pool
+of threads, each written aside then renamed into place. Storages that
+post-process or are not on the local disk get a plain collectstatic.
+"""
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.contrib.staticfiles.finders import get_finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.checks import Tags
+from django.core.management.base import BaseCommand
+
+MANIFEST = '.sync-static.json'
+
+
+def static_sources():
+    """map each collected path to its source file, as collectstatic would"""
+    ignore_patterns = apps.get_app_config('staticfiles').ignore_patterns
+    sources = {}
+    for finder in get_finders():
+        for path, storage in finder.list(ignore_patterns):
+            prefixed = path
+            if getattr(storage, 'prefix', None):
+                prefixed = os.path.join(storage.prefix, path)
+            # the first finder to list a path wins
+            sources.setdefault(prefixed, storage.path(path))
+    return sources
+
+
+def fingerprint(files):
+    """digest of `files`, a map of path to `[size, mtime_ns]`"""
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        digest.update(f'{path}\0{files[path][0]}\0{files[path][1]}\n'.encode())
+    return digest.hexdigest()
+
+
+def copy(source, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    temporary = f'{destination}.{os.getpid()}.tmp'
+    shutil.copy2(source, temporary)
+    os.replace(temporary, destination)
+
+
+class Command(BaseCommand):
+    """Django command to copy the static files that changed"""
+    requires_system_checks = [Tags.staticfiles]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='files copied at once')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='copy every file, whatever the manifest says')
+
+    def handle(self, **options):
+        storage = staticfiles_storage
+        if hasattr(storage, 'post_process') or not self.local(storage):
+            call_command('collectstatic', interactive=False,
+                         verbosity=options['verbosity'])
+            return
+
+        sources = static_sources()
+        files = {}
+        for path, source in sources.items():
+            stat = os.stat(source)
+            files[path] = [stat.st_size, stat.st_mtime_ns]
+        current = fingerprint(files)
+
+        manifest_path = storage.path(MANIFEST)
+        try:
+            with open(manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            manifest = {'fingerprint': None, 'files': {}}
+        if options['force']:
+            manifest = {'fingerprint': None, 'files': {}}
+
+        if manifest['fingerprint'] == current:
+            self.stdout.write(
+                f'static files unchanged, {len(files)} up to date')
+            return
+
+        changed = [
+            path for path, entry in files.items()
+            if manifest['files'].get(path) != entry or
+            not os.path.exists(storage.path(path))
+        ]
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            # list() re-raises the first failed copy
+            list(pool.map(
+                lambda path: copy(sources[path], storage.path(path)),
+                changed))
+
+        # written last: an interrupted run copies again next time
+        with open(manifest_path + '.tmp', 'w') as manifest_file:
+            json.dump({'fingerprint': current, 'files': files},
+                      manifest_file)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        self.stdout.write(self.style.SUCCESS(
+            f'copied {len(changed)} of {len(files)} static files'))
+
+    def local(self, storage):
+        try:
+            storage.path('')
+        except NotImplementedError:
+            return False
+        return True
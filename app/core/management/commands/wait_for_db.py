@@ -1,6 +1,7 @@
 """Django command to wait for the database to be avaiable"""
+import random
 import time
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db.utils import OperationalError
 from psycopg2 import OperationalError as Psycopg2Error
 
@@ -8,16 +9,34 @@ from psycopg2 import OperationalError as Psycopg2Error
 class Command(BaseCommand):
     """Dajango command to wait for the database"""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='give up after this many seconds')
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='longest wait between two attempts, in seconds')
+
     def handle(self, **options):
         """Entrypoint for command"""
         self.stdout.write('waiting for database...')
-        db_up = False
-        while db_up is False:
+        deadline = time.monotonic() + options['timeout']
+        attempt = 0
+        while True:
             try:
                 self.check(databases=['default'])
-                db_up = True
+                break
             except (OperationalError, Psycopg2Error):
-                self.stdout.write('database unavaiable, wait 1 second')
-                time.sleep(1)
+                # exponential backoff with full jitter, so restarting
+                # containers do not retry in lockstep
+                delay = random.uniform(
+                    0, min(options['max_delay'], 0.1 * 2 ** attempt))
+                attempt += 1
+                if time.monotonic() + delay > deadline:
+                    raise CommandError(
+                        f'database unavaiable after {attempt} attempts')
+                self.stdout.write(
+                    f'database unavaiable, wait {delay:.2f} seconds')
+                time.sleep(delay)
 
         self.stdout.write(self.style.SUCCESS('database avaiable'))
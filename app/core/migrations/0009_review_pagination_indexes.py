@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-16 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_movie_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', '-created', '-id'], name='review_movie_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', '-created', '-id'], name='review_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-16 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_review_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['platform', '-id'], name='movie_platform_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-16 22:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_movie_platform_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
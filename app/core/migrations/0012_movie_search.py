@@ -0,0 +1,65 @@
+# Generated by Django 3.2.25 on 2026-10-16 22:47
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION core_movie_search_vector_update()
+RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW."storyLine", '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_movie_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, "storyLine", search_vector
+    ON core_movie
+    FOR EACH ROW EXECUTE PROCEDURE core_movie_search_vector_update();
+
+UPDATE core_movie SET title = title;
+
+CREATE INDEX movie_search_vector_idx
+    ON core_movie USING gin (search_vector);
+CREATE INDEX movie_title_trgm_idx
+    ON core_movie USING gin (title gin_trgm_ops);
+"""
+
+DROP_SEARCH_SQL = """
+DROP INDEX IF EXISTS movie_title_trgm_idx;
+DROP INDEX IF EXISTS movie_search_vector_idx;
+DROP TRIGGER IF EXISTS core_movie_search_vector_trigger ON core_movie;
+DROP FUNCTION IF EXISTS core_movie_search_vector_update();
+"""
+
+
+def create_search(apps, schema_editor):
+    """maintain and index the search vector, on postgres only"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SEARCH_SQL, params=None)
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_SQL, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_movie_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True),
+        ),
+        migrations.RunPython(create_search, drop_search),
+    ]
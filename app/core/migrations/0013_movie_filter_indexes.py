@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_movie_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['avg_rating', 'id'], name='movie_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['number_rating', 'id'], name='movie_number_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['created', 'id'], name='movie_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['platform', 'avg_rating', 'id'], name='movie_plat_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['platform', 'number_rating', 'id'], name='movie_plat_number_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['platform', 'created', 'id'], name='movie_plat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('active', True)), fields=['avg_rating', 'id'], name='movie_active_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('active', True)), fields=['platform', 'avg_rating', 'id'], name='movie_active_plat_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:04
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def backfill_ratings(apps, schema_editor):
+    """recompute every movie's rating from its reviews"""
+    Movie = apps.get_model('core', 'Movie')
+    Review = apps.get_model('core', 'Review')
+
+    reviews = Review.objects.filter(movie=OuterRef('pk')).order_by()
+    reviews = reviews.values('movie')
+    Movie.objects.update(
+        number_rating=Coalesce(Subquery(
+            reviews.annotate(count=Count('id')).values('count')), 0),
+        rating_sum=Coalesce(Subquery(
+            reviews.annotate(total=Sum('rating')).values('total')), 0),
+    )
+
+    decimal = models.DecimalField(max_digits=12, decimal_places=2)
+    Movie.objects.update(avg_rating=Coalesce(
+        Cast(F('rating_sum'), decimal) / NullIf(F('number_rating'), Value(0)),
+        Value(0),
+        output_field=decimal,
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_movie_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:15
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def remove_duplicate_reviews(apps, schema_editor):
+    """keep the latest review of each user and movie"""
+    Movie = apps.get_model('core', 'Movie')
+    Review = apps.get_model('core', 'Review')
+
+    latest = Review.objects.order_by().values('movie', 'user').annotate(
+        latest=Max('id')).values('latest')
+    duplicates = Review.objects.filter(
+        movie__isnull=False, user__isnull=False,
+    ).exclude(id__in=Subquery(latest))
+    movie_ids = set(duplicates.values_list('movie_id', flat=True))
+    if not movie_ids:
+        return
+    duplicates.delete()
+
+    # recount the movies that lost reviews
+    reviews = Review.objects.filter(movie=OuterRef('pk')).order_by()
+    reviews = reviews.values('movie')
+    movies = Movie.objects.filter(pk__in=movie_ids)
+    movies.update(
+        number_rating=Coalesce(Subquery(
+            reviews.annotate(count=Count('id')).values('count')), 0),
+        rating_sum=Coalesce(Subquery(
+            reviews.annotate(total=Sum('rating')).values('total')), 0),
+        version=F('version') + 1,
+    )
+    decimal = models.DecimalField(max_digits=12, decimal_places=2)
+    movies.update(avg_rating=Coalesce(
+        Cast(F('rating_sum'), decimal) / NullIf(F('number_rating'), Value(0)),
+        Value(0),
+        output_field=decimal,
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_movie_rating_sum'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_reviews, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(
+                fields=('movie', 'user'), name='review_movie_user_unique'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_histogram(apps, schema_editor):
+    """count every movie's reviews per star rating"""
+    Movie = apps.get_model('core', 'Movie')
+    Review = apps.get_model('core', 'Review')
+
+    def count(rating):
+        reviews = Review.objects.filter(
+            movie=OuterRef('pk'), rating=rating).order_by().values('movie')
+        return Coalesce(Subquery(
+            reviews.annotate(count=Count('id')).values('count')), 0)
+
+    Movie.objects.update(**{
+        f'rating_count_{rating}': count(rating) for rating in range(1, 6)
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_review_movie_user_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count_1',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count_2',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count_3',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count_4',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count_5',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_histogram, migrations.RunPython.noop),
+    ]
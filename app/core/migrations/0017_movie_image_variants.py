@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_movie_rating_histogram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='image_variants',
+            field=models.JSONField(default=list, editable=False),
+        ),
+    ]
@@ -1,7 +1,10 @@
 """Database models"""
 import uuid
 import os
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
 from django.contrib.auth.models import BaseUserManager
@@ -10,6 +13,11 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 
 from django.conf import settings
 
+from core.storage import ContentAddressedStorage
+
+# content addressed, see core.storage
+image_storage = ContentAddressedStorage()
+
 
 def movie_image_file_path(instance, filename):
     """Generate file path for new dessert image"""
@@ -18,6 +26,16 @@ def movie_image_file_path(instance, filename):
     return os.path.join('uploads', 'movie', filename)
 
 
+def movie_image_variant_path(name, width, extension):
+    """Generate file path for a resized copy of the movie image `name`
+
+    The variants of `uploads/movie/ab/<sha256>.jpg` go in
+    `uploads/movie/ab/<sha256>/` next to it, under MEDIA_ROOT where nginx
+    serves them directly.
+    """
+    return os.path.join(os.path.splitext(name)[0], f'{width}.{extension}')
+
+
 class UserProfileManager(BaseUserManager):
     """manager for the user profile"""
 
@@ -67,6 +85,60 @@ class Stream(models.Model):
         return self.name
 
 
+class MovieManager(models.Manager):
+    """manager for movies"""
+
+    def update_rating(self, pk, added=None, removed=None):
+        """add and/or remove one rating of movie `pk` in a single UPDATE
+
+        The counters change relative to the stored row, so concurrent
+        reviews never overwrite each other, and `avg_rating` is derived
+        from them in the same statement. Also bumps the movie's version.
+        Returns the number of movies updated.
+        """
+        count = (added is not None) - (removed is not None)
+        total = (added or 0) - (removed or 0)
+        number_rating = F('number_rating') + count
+        rating_sum = F('rating_sum') + total
+
+        histogram = {}
+        if added in RATINGS:
+            histogram[rating_count_field(added)] = 1
+        if removed in RATINGS:
+            field = rating_count_field(removed)
+            histogram[field] = histogram.get(field, 0) - 1
+        histogram = {
+            field: F(field) + delta
+            for field, delta in histogram.items() if delta
+        }
+
+        return self.filter(pk=pk).update(
+            number_rating=number_rating,
+            rating_sum=rating_sum,
+            avg_rating=average_rating(rating_sum, number_rating),
+            version=F('version') + 1,
+            **histogram,
+        )
+
+
+RATINGS = range(1, 6)
+
+
+def rating_count_field(rating):
+    """return the name of the movie field counting `rating` stars"""
+    return f'rating_count_{rating}'
+
+
+def average_rating(rating_sum, number_rating):
+    """return the expression for the mean rating, 0 without ratings"""
+    decimal = models.DecimalField(max_digits=12, decimal_places=2)
+    return Coalesce(
+        Cast(rating_sum, decimal) / NullIf(number_rating, Value(0)),
+        Value(0),
+        output_field=decimal,
+    )
+
+
 class Movie(models.Model):
     """movie objects"""
     user = models.ForeignKey(
@@ -76,7 +148,11 @@ class Movie(models.Model):
         blank=True
     )
     title = models.CharField(max_length=250)
-    image = models.ImageField(null=True, upload_to=movie_image_file_path)
+    image = models.ImageField(null=True, upload_to=movie_image_file_path,
+                              storage=image_storage)
+    # resized copies of `image` as `{"width", "format", "name"}` dicts,
+    # filled in once generated; see movie.images
+    image_variants = models.JSONField(default=list, editable=False)
     storyLine = models.CharField(max_length=250)
     platform = models.ForeignKey(
         Stream,
@@ -89,7 +165,50 @@ class Movie(models.Model):
     avg_rating = models.DecimalField(
         max_digits=5, decimal_places=2, default=0.0)
     number_rating = models.IntegerField(default=0)
+    # sum of the ratings of every review; see MovieManager.update_rating
+    rating_sum = models.IntegerField(default=0, editable=False)
+    # number of reviews giving each star rating
+    rating_count_1 = models.IntegerField(default=0, editable=False)
+    rating_count_2 = models.IntegerField(default=0, editable=False)
+    rating_count_3 = models.IntegerField(default=0, editable=False)
+    rating_count_4 = models.IntegerField(default=0, editable=False)
+    rating_count_5 = models.IntegerField(default=0, editable=False)
     created = models.DateTimeField(auto_now_add=True)
+    # bumped whenever the movie or one of its reviews changes
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # title (weight A) and storyLine (weight B), kept up to date by a
+    # database trigger on postgres; see movie.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = MovieManager()
+
+    class Meta:
+        indexes = [
+            # newest movies per stream, nested in the stream endpoints
+            models.Index(fields=['platform', '-id'],
+                         name='movie_platform_id_idx'),
+            # whitelisted orderings, alone or within a platform; scanned
+            # backwards for descending orders
+            models.Index(fields=['avg_rating', 'id'],
+                         name='movie_rating_idx'),
+            models.Index(fields=['number_rating', 'id'],
+                         name='movie_number_rating_idx'),
+            models.Index(fields=['created', 'id'],
+                         name='movie_created_idx'),
+            models.Index(fields=['platform', 'avg_rating', 'id'],
+                         name='movie_plat_rating_idx'),
+            models.Index(fields=['platform', 'number_rating', 'id'],
+                         name='movie_plat_number_rating_idx'),
+            models.Index(fields=['platform', 'created', 'id'],
+                         name='movie_plat_created_idx'),
+            # the public catalog: active movies by rating
+            models.Index(fields=['avg_rating', 'id'],
+                         name='movie_active_rating_idx',
+                         condition=models.Q(active=True)),
+            models.Index(fields=['platform', 'avg_rating', 'id'],
+                         name='movie_active_plat_rating_idx',
+                         condition=models.Q(active=True)),
+        ]
 
     def __str__(self):
         return self.title
@@ -117,5 +236,73 @@ class Review(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     update = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination of a movie's / a user's reviews
+            models.Index(fields=['movie', '-created', '-id'],
+                         name='review_movie_created_idx'),
+            models.Index(fields=['user', '-created', '-id'],
+                         name='review_user_created_idx'),
+        ]
+        constraints = [
+            # one review per user and movie
+            models.UniqueConstraint(fields=['movie', 'user'],
+                                    name='review_movie_user_unique'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """save the review and update the rating of its movie(s)
+
+        Raises Movie.DoesNotExist, rolling the save back, when the movie
+        is missing: the foreign key is only checked at commit.
+        """
+        # no savepoint when nested, so a create costs just two queries
+        with transaction.atomic(savepoint=False):
+            old = None
+            if not self._state.adding:
+                # lock the row: concurrent edits of this review must each
+                # see the rating the other one wrote
+                old = Review.objects.select_for_update().filter(
+                    pk=self.pk).values('movie_id', 'rating').first()
+            super().save(*args, **kwargs)
+
+            if old is None:
+                changes = [(self.movie_id, {'added': self.rating})]
+            elif old['movie_id'] == self.movie_id:
+                changes = [(self.movie_id, {
+                    'added': self.rating, 'removed': old['rating']})]
+            else:
+                # moved: lock both movies in pk order, as every other
+                # move does, so two opposite moves can not deadlock
+                changes = sorted([
+                    (old['movie_id'], {'removed': old['rating']}),
+                    (self.movie_id, {'added': self.rating}),
+                ], key=lambda change: change[0] or 0)
+
+            for pk, change in changes:
+                updated = Movie.objects.update_rating(pk, **change)
+                if pk == self.movie_id and pk is not None and not updated:
+                    raise Movie.DoesNotExist(f'movie {pk} does not exist')
+
+    def delete(self, *args, **kwargs):
+        """delete the review; the post_delete signal updates its movie"""
+        with transaction.atomic(savepoint=False):
+            current = Review.objects.select_for_update().filter(
+                pk=self.pk).values('movie_id', 'rating').first()
+            if current is None:
+                # already deleted, and its rating removed
+                return 0, {}
+            self.movie_id, self.rating = current['movie_id'], current['rating']
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         return str(self.rating) + " | " + self.movie.title + " | " + str(self.user)
+
+
+class StoredFile(models.Model):
+    """number of rows referencing a content addressed file"""
+    name = models.CharField(max_length=255, primary_key=True)
+    references = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
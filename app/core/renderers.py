@@ -0,0 +1,76 @@
+"""JSON rendering for the api"""
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - pure python fallback
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer producing the same bytes through orjson when installed
+
+    orjson encodes in C straight to bytes. Anything it does not know
+    natively (Decimal, lazy strings, querysets...) goes through DRF's
+    own encoder, so the output matches `JSONRenderer` exactly.
+    """
+    encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or \
+                not self.compact or \
+                self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME |
+                orjson.OPT_NON_STR_KEYS,
+            )
+        except TypeError:
+            # e.g. integers beyond 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # same strict javascript subset escaping as JSONRenderer
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
+
+    def render_list(self, chunks):
+        """render an iterable of lists as one JSON array, chunk by chunk"""
+        yield b'['
+        separator = b''
+        for chunk in chunks:
+            if chunk:
+                yield separator + self.render(chunk)[1:-1]
+                separator = b','
+        yield b']'
+
+
+def streaming_list_response(queryset, serializer_class, context=None,
+                            chunk_size=500):
+    """stream a queryset as a JSON array, serializing one chunk at a time
+
+    Rows come from a server-side cursor, so a worker holds at most one
+    chunk of model instances and their JSON in memory.
+    """
+    # one serializer for every chunk: a serializer per chunk would leave
+    # each chunk's instances in reference cycles until a full collection
+    serializer = serializer_class(many=True, context=context or {})
+
+    def chunks():
+        rows = queryset.iterator(chunk_size=chunk_size)
+        while True:
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                return
+            yield serializer.to_representation(batch)
+
+    renderer = FastJSONRenderer()
+    return StreamingHttpResponse(
+        renderer.render_list(chunks()), content_type=renderer.media_type)
@@ -0,0 +1,243 @@
+"""Route the reads of safe requests to replica databases
+
+`ReplicaMiddleware` picks one of the DATABASE_REPLICAS aliases for each
+GET, HEAD or OPTIONS request and `ReplicaRouter` sends that request's
+reads there; writes, and every query of other requests, go to the
+primary. A replica is checked at most every REPLICA_CHECK_INTERVAL
+seconds and skipped while down or REPLICA_MAX_LAG seconds or more
+behind. A successful write pins its client to the primary for
+REPLICA_PIN_SECONDS through a signed cookie, also sent back as the
+X-DB-Pin header for clients without cookies to echo, so the client
+reads what it wrote.
+"""
+import asyncio
+import contextvars
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core import signing
+from django.core.signals import setting_changed
+from django.db import (
+    DEFAULT_DB_ALIAS, DatabaseError, InterfaceError, OperationalError,
+    connections,
+)
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+
+PIN_COOKIE = 'db_pin'
+PIN_HEADER = 'X-DB-Pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# replication delay in seconds; 0 on a primary or a caught up replica
+LAG_QUERY = (
+    'SELECT CASE WHEN NOT pg_is_in_recovery() '
+    'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+def read_alias():
+    """the replica the current request reads from, None for the primary"""
+    return _read_alias.get()
+
+
+@contextmanager
+def use_primary():
+    """read from the primary within the block"""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """reads to the request's replica, if any; everything else to primary"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'django_cache':
+            # the shared cache's table, bumped by writes moments ago
+            return DEFAULT_DB_ALIAS
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # also for rows read from a replica, e.g. a cached request.user
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the primary's rows
+        return True
+
+
+class Replica:
+    """health of one replica alias, as last checked"""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.healthy = True
+        self.lag = 0.0
+        self.latency = None
+        self.checked = None
+        self.failures = 0
+
+    def usable(self, max_lag):
+        return self.healthy and self.lag < max_lag
+
+
+class ReplicaSet:
+    """replicas to read from, checked when due and chosen per request"""
+
+    def __init__(self, aliases, selection='round-robin', max_lag=2,
+                 check_interval=5):
+        self.replicas = [Replica(alias) for alias in aliases]
+        self.selection = selection
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._turn = itertools.count()
+        self._checking = threading.Lock()
+
+    def choose(self):
+        """return a usable replica's alias, None to read from the primary"""
+        self._check_due()
+        usable = [replica for replica in self.replicas
+                  if replica.usable(self.max_lag)]
+        if not usable:
+            return None
+        if self.selection == 'least-latency':
+            return min(usable, key=lambda replica: replica.latency or 0).alias
+        return usable[next(self._turn) % len(usable)].alias
+
+    def check(self, replica):
+        """measure the replica's lag and the latency of doing so"""
+        start = time.monotonic()
+        try:
+            with connections[replica.alias].cursor() as cursor:
+                cursor.execute(LAG_QUERY)
+                lag = float(cursor.fetchone()[0] or 0)
+        except DatabaseError:
+            # the request's end closes the broken connection
+            self.mark_down(replica.alias)
+            return
+        latency = time.monotonic() - start
+        replica.latency = latency if replica.latency is None else \
+            replica.latency * 0.7 + latency * 0.3
+        replica.lag = lag
+        replica.healthy = True
+        replica.checked = time.monotonic()
+
+    def mark_down(self, alias):
+        """skip `alias` until its next check"""
+        for replica in self.replicas:
+            if replica.alias == alias:
+                replica.healthy = False
+                replica.failures += 1
+                replica.checked = time.monotonic()
+
+    def stats(self):
+        return [{
+            'alias': replica.alias,
+            'healthy': replica.healthy,
+            'lag': replica.lag,
+            'latency_ms': None if replica.latency is None
+            else round(replica.latency * 1000, 2),
+            'failures': replica.failures,
+        } for replica in self.replicas]
+
+    def _check_due(self):
+        # one thread checks while the others go by the last results
+        if not self._checking.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            for replica in self.replicas:
+                if replica.checked is None or \
+                        now - replica.checked >= self.check_interval:
+                    self.check(replica)
+        finally:
+            self._checking.release()
+
+
+_replicas = None
+
+
+def get_replicas():
+    """return the process wide replica set"""
+    global _replicas
+    if _replicas is None:
+        _replicas = ReplicaSet(
+            settings.DATABASE_REPLICAS,
+            selection=settings.REPLICA_SELECTION,
+            max_lag=settings.REPLICA_MAX_LAG,
+            check_interval=settings.REPLICA_CHECK_INTERVAL,
+        )
+    return _replicas
+
+
+@receiver(setting_changed)
+def reset_replicas(setting, **kwargs):
+    global _replicas
+    if setting in ('DATABASE_REPLICAS', 'REPLICA_SELECTION',
+                   'REPLICA_MAX_LAG', 'REPLICA_CHECK_INTERVAL'):
+        _replicas = None
+
+
+def _signer():
+    return signing.TimestampSigner(salt='core.routers.pin')
+
+
+def pinned(request):
+    """whether the request's client wrote within REPLICA_PIN_SECONDS"""
+    value = request.COOKIES.get(PIN_COOKIE) or \
+        request.headers.get(PIN_HEADER)
+    if not value:
+        return False
+    try:
+        _signer().unsign(value, max_age=settings.REPLICA_PIN_SECONDS)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def pin(response):
+    """pin the response's client to the primary"""
+    value = _signer().sign('primary')
+    response.set_cookie(PIN_COOKIE, value,
+                        max_age=settings.REPLICA_PIN_SECONDS,
+                        httponly=True, samesite='Lax')
+    response[PIN_HEADER] = value
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """read safe requests from a replica, unless the client just wrote"""
+
+    def process_request(self, request):
+        if settings.DATABASE_REPLICAS and request.method in SAFE_METHODS \
+                and not pinned(request):
+            _read_alias.set(get_replicas().choose())
+
+    def process_exception(self, request, exception):
+        alias = _read_alias.get()
+        if alias is None or \
+                not isinstance(exception, (OperationalError, InterfaceError)):
+            return None
+        # the replica failed mid request: skip it and retry on the
+        # primary, which for a safe request is harmless
+        get_replicas().mark_down(alias)
+        _read_alias.set(None)
+        if asyncio.iscoroutinefunction(self.get_response):
+            return async_to_sync(self.get_response)(request)
+        return self.get_response(request)
+
+    def process_response(self, request, response):
+        _read_alias.set(None)
+        if settings.DATABASE_REPLICAS and \
+                request.method not in SAFE_METHODS and \
+                response.status_code < 400:
+            pin(response)
+        return response
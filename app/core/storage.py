@@ -0,0 +1,135 @@
+"""content addressed file storage
+
+Files are named by the sha256 of their content, so the same image
+uploaded for several movies is stored once and a name's content never
+changes, which lets caches keep it forever. Each name's users are
+counted in `StoredFile`; a file is unlinked once nothing references it.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+def content_hash(content):
+    """sha256 hex digest of a File, using one computed during the upload"""
+    digest = getattr(content, 'content_hash', None)
+    if digest is None:
+        sha = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            sha.update(chunk)
+        digest = sha.hexdigest()
+    content.seek(0)
+    return digest
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """file system storage naming files `<dir>/<ab>/<sha256><ext>`
+
+    Only the directory and the extension of the name asked for are kept.
+    Saving content that is already stored writes nothing and returns the
+    existing name. Files derived from a stored one, e.g. image variants,
+    belong in the directory named like it without its extension and are
+    deleted with it.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content_hash(content))
+        if not self.exists(name):
+            self._write(name, content)
+        return name
+
+    def hashed_name(self, name, digest):
+        """the name content with sha256 `digest` asked to be `name` gets"""
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest + extension).replace('\\', '/')
+
+    def _write(self, name, content):
+        """put `content` in place atomically
+
+        Racing writers have the same bytes, so the last rename winning
+        is harmless.
+        """
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        if hasattr(content, 'temporary_file_path'):
+            file_move_safe(content.temporary_file_path(), path,
+                           allow_overwrite=True)
+        else:
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    for chunk in content.chunks():
+                        file.write(chunk)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+
+    def delete(self, name):
+        super().delete(name)
+        derived = self.path(os.path.splitext(name)[0])
+        shutil.rmtree(derived, ignore_errors=True)
+
+
+def acquire(name, storage=None, content=None):
+    """count one more reference to the stored file `name`
+
+    The count is raised under the row's lock, which `release` holds
+    while unlinking, so once it is raised the file stays. A file found
+    missing in `storage` then went with a release that locked first
+    and is written again from `content`, the upload `save` skipped.
+    """
+    from core.models import StoredFile
+
+    if not name:
+        return
+    objects = StoredFile.objects.filter(name=name)
+    if not objects.update(references=F('references') + 1):
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, references=1)
+        except IntegrityError:
+            # created concurrently
+            objects.update(references=F('references') + 1)
+    if content is not None and not storage.exists(name):
+        # chunks from the open file, as a temporary upload may be moved
+        storage._write(name, File(content))
+
+
+def release(name, storage):
+    """count one reference less, deleting the file once unreferenced"""
+    from core.models import StoredFile
+
+    if not name:
+        return
+    objects = StoredFile.objects.filter(name=name)
+    objects.filter(references__gt=0).update(references=F('references') - 1)
+    if not objects.filter(references__lte=0).exists():
+        return
+
+    def unlink():
+        # the row is deleted, and locked, before the file: an acquire
+        # meanwhile keeps both, one after waits for the file to go
+        with transaction.atomic():
+            if objects.filter(references__lte=0).delete()[0]:
+                storage.delete(name)
+    transaction.on_commit(unlink)
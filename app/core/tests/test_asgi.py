@@ -0,0 +1,135 @@
+"""Test serving the read endpoints over ASGI"""
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import patch
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.asgi import ReadPoolASGIHandler
+from core.models import Movie, Review
+from movie.views import MovieViewSet
+
+
+async def request(application, method, path, token):
+    """send one request to `application`, return status, headers, body"""
+    communicator = ApplicationCommunicator(application, {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'testserver'),
+                    (b'authorization', f'Token {token}'.encode())],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    })
+    await communicator.send_input(
+        {'type': 'http.request', 'body': b'', 'more_body': False})
+    start = await communicator.receive_output(5)
+    body = b''
+    while True:
+        message = await communicator.receive_output(5)
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    await communicator.wait()
+    return start['status'], dict(start['headers']), body
+
+
+class ReadPoolASGIHandlerTests(TransactionTestCase):
+    """Test read endpoints run in the read pool under ASGI"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.token = Token.objects.create(user=user).key
+        self.movie = Movie.objects.create(title='movie', storyLine='story')
+        self.application = ReadPoolASGIHandler()
+
+    def get(self, path, method='GET'):
+        return asyncio.run(
+            request(self.application, method, path, self.token))
+
+    def test_reads_match_wsgi(self):
+        """Test the read endpoints answer as they do over WSGI"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        for path in (reverse('movie:movie-list'),
+                     reverse('movie:movie-detail', args=[self.movie.pk]),
+                     reverse('movie:stream-list'),
+                     reverse('movie:review-list', args=[self.movie.pk])):
+            status, headers, body = self.get(path)
+
+            self.assertEqual(status, 200)
+            self.assertEqual(json.loads(body), client.get(path).json())
+
+    def test_reads_run_in_read_pool(self):
+        """Test listed views run in the pool, the others as before"""
+        threads = []
+
+        def list_view(view, request, *args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return original(view, request, *args, **kwargs)
+
+        original = MovieViewSet.list
+        with patch.object(MovieViewSet, 'list', autospec=True,
+                          side_effect=list_view):
+            self.get(reverse('movie:movie-list'))
+            self.get(reverse('movie:movie-list'), method='HEAD')
+
+        self.assertEqual(len(threads), 2)
+        for name in threads:
+            self.assertTrue(name.startswith('async-read'))
+
+        status, _, body = self.get(reverse('user:me'))
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['email'], 'user@example.com')
+
+    @override_settings(STREAM_CHUNK_SIZE=2)
+    def test_streaming_export(self):
+        """Test a streamed response queries away from the event loop"""
+        for i in range(5):
+            Review.objects.create(
+                movie=self.movie, rating=4, user=get_user_model().objects
+                .create_user(email=f'reviewer{i}@example.com'))
+
+        status, _, body = self.get(
+            reverse('movie:review-export', args=[self.movie.pk]))
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(json.loads(body)), 5)
+
+    def test_slow_reads_overlap(self):
+        """Test a slow read does not hold up the others"""
+        original = MovieViewSet.retrieve
+
+        def slow_retrieve(view, request, *args, **kwargs):
+            time.sleep(0.3)
+            return original(view, request, *args, **kwargs)
+
+        async def concurrently():
+            path = reverse('movie:movie-detail', args=[self.movie.pk])
+            return await asyncio.gather(*(
+                request(self.application, 'GET', path, self.token)
+                for _ in range(4)))
+
+        with patch.object(MovieViewSet, 'retrieve', autospec=True,
+                          side_effect=slow_retrieve):
+            start = time.monotonic()
+            responses = asyncio.run(concurrently())
+            elapsed = time.monotonic() - start
+
+        self.assertEqual([status for status, _, _ in responses], [200] * 4)
+        self.assertLess(elapsed, 1.0)
@@ -0,0 +1,42 @@
+"""Test for the cache backends"""
+
+from unittest.mock import patch
+from django.test import SimpleTestCase
+
+from core.cache import LRUCache
+
+
+class LRUCacheTests(SimpleTestCase):
+    """Test the in-process LRU cache"""
+
+    def test_least_recently_used_evicted(self):
+        """Test the least recently used entry is evicted first"""
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    @patch('core.cache.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Test entries are dropped once their timeout passes"""
+        patched_monotonic.return_value = 100
+        cache = LRUCache(timeout=10)
+        cache.set('a', 1)
+
+        patched_monotonic.return_value = 111
+        self.assertIsNone(cache.get('a'))
+
+    def test_stats_count_hits_and_misses(self):
+        """Test hits and misses are counted"""
+        cache = LRUCache()
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
@@ -1,10 +1,30 @@
 """Test custom django custom django management command"""
 
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 from django.db.utils import OperationalError
 from psycopg2 import OperationalError as Psycopg2Error
-from django.core.management import call_command
-from django.test import SimpleTestCase
+from django.core.management import CommandError, call_command
+from django.contrib.auth import get_user_model
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+
+from core.models import (
+    Movie,
+    Review,
+    StoredFile,
+    movie_image_variant_path,
+)
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -27,3 +47,409 @@ class CommandTests(SimpleTestCase):
         call_command('wait_for_db')
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_check):
+        """Test the waits grow exponentially, jittered, up to a maximum"""
+        patched_check.side_effect = [OperationalError] * 8 + [True]
+
+        call_command('wait_for_db', max_delay=1, stdout=StringIO())
+
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        bounds = [0.1, 0.2, 0.4, 0.8, 1, 1, 1, 1]
+        self.assertEqual(len(delays), len(bounds))
+        for delay, bound in zip(delays, bounds):
+            self.assertTrue(0 <= delay <= bound)
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_check):
+        """Test waiting gives up once the timeout would be exceeded"""
+        patched_check.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0, stdout=StringIO())
+        patched_check.assert_called_once()
+
+    @patch('core.management.commands.boot.call_command')
+    def test_boot(self, patched_call, patched_check):
+        """Test boot runs the start steps in order in one process"""
+        call_command('boot', stdout=StringIO())
+
+        self.assertEqual(
+            [call.args[0] for call in patched_call.call_args_list],
+            ['wait_for_db', 'sync_static', 'migrate_pending',
+             'createcachetable'])
+
+
+class RebuildRatingHistogramTests(TestCase):
+    """Test recounting the star ratings of movies"""
+
+    def test_rebuild_histogram(self):
+        """Test wrong counters are fixed and right ones left alone"""
+        movies = [
+            Movie.objects.create(title=f'movie {i}', storyLine='story')
+            for i in range(5)
+        ]
+        for i, rating in enumerate([1, 5, 5, 2]):
+            Review.objects.create(
+                movie=movies[i % 2], rating=rating,
+                user=get_user_model().objects.create_user(
+                    email=f'user{i}@example.com'))
+        Movie.objects.filter(pk=movies[0].pk).update(rating_count_5=7)
+        Movie.objects.filter(pk=movies[4].pk).update(rating_count_3=2)
+        out = StringIO()
+
+        call_command('rebuild_rating_histogram', batch_size=2, stdout=out)
+
+        self.assertIn('checked 5 movies, fixed 2', out.getvalue())
+        counts = {
+            movie.pk: [movie.rating_count_1, movie.rating_count_2,
+                       movie.rating_count_3, movie.rating_count_4,
+                       movie.rating_count_5]
+            for movie in Movie.objects.all()
+        }
+        self.assertEqual(counts[movies[0].pk], [1, 0, 0, 0, 1])
+        self.assertEqual(counts[movies[1].pk], [0, 1, 0, 0, 1])
+        self.assertEqual(counts[movies[4].pk], [0, 0, 0, 0, 0])
+
+
+class ImportReviewsTests(TestCase):
+    """Test bulk loading reviews from a file"""
+
+    def setUp(self):
+        self.movies = [
+            Movie.objects.create(title=f'movie {i}', storyLine='story')
+            for i in range(2)
+        ]
+        self.users = [
+            get_user_model().objects.create_user(email=f'user{i}@example.com')
+            for i in range(3)
+        ]
+        Review.objects.create(
+            movie=self.movies[0], user=self.users[0], rating=1)
+
+    def import_file(self, content, suffix='.ndjson', **options):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix=suffix, delete=False) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_reviews', file.name, stdout=out, stderr=err,
+                     **options)
+        return out.getvalue(), err.getvalue()
+
+    def assertAggregates(self, movie):
+        """Test the movie's rating aggregates match its reviews"""
+        movie.refresh_from_db()
+        ratings = list(movie.review.values_list('rating', flat=True))
+        self.assertEqual(movie.number_rating, len(ratings))
+        self.assertEqual(movie.rating_sum, sum(ratings))
+        self.assertEqual(
+            movie.avg_rating,
+            round(Decimal(sum(ratings)) / len(ratings), 2) if ratings else 0)
+        self.assertEqual(
+            [getattr(movie, f'rating_count_{r}') for r in range(1, 6)],
+            [ratings.count(r) for r in range(1, 6)])
+
+    def ndjson(self, *records):
+        return ''.join(json.dumps(record) + '\n' for record in records)
+
+    def test_import_ndjson(self):
+        """Test new reviews are loaded and duplicates or orphans skipped"""
+        m0, m1 = (movie.pk for movie in self.movies)
+        u0, u1, u2 = (user.pk for user in self.users)
+        content = self.ndjson(
+            {'movie': m0, 'user': u0, 'rating': 5},  # already reviewed
+            {'movie': m0, 'user': u1, 'rating': 4, 'description': 'good'},
+            {'movie': m0, 'user': u1, 'rating': 2},  # repeated in the file
+            {'movie': m1, 'user': u1, 'rating': 3},
+            {'movie': m1, 'user': u2, 'rating': 5, 'active': False},
+            {'movie': 0, 'user': u2, 'rating': 5},  # unknown movie
+            {'movie': m1, 'user': 0, 'rating': 5},  # unknown user
+        ) + '{"movie": 1, "user": 1, "rating": 9}\nnot json\n'
+
+        out, err = self.import_file(content, batch_size=4)
+
+        self.assertIn('read 9 rows, imported 3', out)
+        self.assertIn('rows/s', out)
+        self.assertIn('line 8', err)
+        self.assertIn('line 9', err)
+        reviews = {
+            (r.movie_id, r.user_id): r for r in Review.objects.all()}
+        self.assertEqual(len(reviews), 4)
+        self.assertEqual(reviews[m0, u0].rating, 1)
+        self.assertEqual(reviews[m0, u1].rating, 4)
+        self.assertEqual(reviews[m0, u1].description, 'good')
+        self.assertFalse(reviews[m1, u2].active)
+        self.assertIsNotNone(reviews[m1, u2].created)
+        for movie in self.movies:
+            self.assertAggregates(movie)
+
+    def test_import_csv(self):
+        """Test reviews are loaded from csv, quoting included"""
+        m1 = self.movies[1].pk
+        content = (
+            'movie,user,rating,description,active\n'
+            f'{m1},{self.users[1].pk},2,"bad, really\n""bad""",true\n'
+            f'{m1},{self.users[2].pk},4,,0\n'
+        )
+
+        out, _ = self.import_file(content, suffix='.csv')
+
+        self.assertIn('imported 2', out)
+        review = Review.objects.get(movie=m1, user=self.users[1])
+        self.assertEqual(review.description, 'bad, really\n"bad"')
+        self.assertFalse(
+            Review.objects.get(movie=m1, user=self.users[2]).active)
+        self.assertAggregates(self.movies[1])
+
+    @patch('core.management.commands.import_reviews.connection.vendor',
+           'other')
+    def test_import_portable_fallback(self):
+        """Test the executemany path without postgres only statements"""
+        m0 = self.movies[0].pk
+        content = self.ndjson(
+            {'movie': m0, 'user': self.users[1].pk, 'rating': 2},
+            {'movie': m0, 'user': self.users[1].pk, 'rating': 5},
+            {'movie': m0, 'user': self.users[2].pk, 'rating': 3},
+        )
+
+        out, _ = self.import_file(content)
+
+        self.assertIn('imported 2', out)
+        self.assertEqual(self.movies[0].review.count(), 3)
+        self.assertAggregates(self.movies[0])
+
+
+class RebuildRatingsTests(TransactionTestCase):
+    """Test recomputing the rating aggregates of movies"""
+
+    def setUp(self):
+        self.movies = [
+            Movie.objects.create(title=f'movie {i}', storyLine='story')
+            for i in range(5)
+        ]
+        users = [
+            get_user_model().objects.create_user(email=f'user{i}@example.com')
+            for i in range(3)
+        ]
+        for i, rating in enumerate([1, 5, 4, 2, 3, 3]):
+            Review.objects.create(
+                movie=self.movies[i % 3], user=users[i // 3], rating=rating)
+        self.expected = self.aggregates()
+        # drift two movies, one of them without reviews
+        Movie.objects.filter(pk=self.movies[0].pk).update(
+            number_rating=7, avg_rating=Decimal('1.00'), rating_count_3=2)
+        Movie.objects.filter(pk=self.movies[4].pk).update(rating_sum=9)
+        self.drifted = self.aggregates()
+
+    def aggregates(self):
+        return {
+            movie['id']: movie for movie in Movie.objects.values(
+                'id', 'number_rating', 'rating_sum', 'avg_rating',
+                'rating_count_1', 'rating_count_2', 'rating_count_3',
+                'rating_count_4', 'rating_count_5')
+        }
+
+    def rebuild(self, **options):
+        out = StringIO()
+        call_command('rebuild_ratings', stdout=out, **options)
+        return out.getvalue()
+
+    def test_rebuild_ratings(self):
+        """Test drifted movies are fixed and their version bumped"""
+        versions = dict(Movie.objects.values_list('id', 'version'))
+
+        out = self.rebuild(workers=1, range_size=2)
+
+        self.assertIn('checked 5 movies, fixed 2', out)
+        self.assertIn('[3/3]', out)
+        self.assertEqual(self.aggregates(), self.expected)
+        for movie_id, version in Movie.objects.values_list('id', 'version'):
+            bumped = movie_id in (self.movies[0].pk, self.movies[4].pk)
+            self.assertEqual(version, versions[movie_id] + bumped)
+
+    def test_rebuild_ratings_in_parallel(self):
+        """Test ranges fixed by a pool of worker processes"""
+        out = self.rebuild(workers=2, range_size=1)
+
+        self.assertIn('checked 5 movies, fixed 2', out)
+        self.assertEqual(self.aggregates(), self.expected)
+
+    def test_rebuild_ratings_dry_run(self):
+        """Test differences are printed and nothing is written"""
+        out = self.rebuild(workers=1, dry_run=True)
+
+        self.assertIn('would fix 2', out)
+        self.assertIn(
+            f'movie {self.movies[0].pk}: number_rating 7 -> 2', out)
+        self.assertIn(f'movie {self.movies[4].pk}: rating_sum 9 -> 0', out)
+        self.assertEqual(self.aggregates(), self.drifted)
+
+    def test_rebuild_ratings_resumes_from_checkpoint(self):
+        """Test ranges recorded in the checkpoint are skipped"""
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'ratings.json')
+        self.addCleanup(os.remove, checkpoint)
+        first = self.movies[0].pk
+        with open(checkpoint, 'w') as file:
+            json.dump({'range_size': 1, 'done': [first]}, file)
+
+        out = self.rebuild(workers=1, range_size=1, checkpoint=checkpoint)
+
+        self.assertIn('checked 4 movies, fixed 1', out)
+        self.assertEqual(self.aggregates()[first], self.drifted[first])
+        with open(checkpoint) as file:
+            self.assertEqual(
+                json.load(file)['done'], sorted(self.expected))
+
+        with self.assertRaises(CommandError):
+            self.rebuild(range_size=2, checkpoint=checkpoint)
+
+
+class RehashImagesTests(TestCase):
+    """Test moving uuid named movie images to content addressed names"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def legacy_movie(self, name, content):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.splitext(path)[0])
+        with open(path, 'wb') as file:
+            file.write(content)
+        with open(os.path.join(os.path.splitext(path)[0], '100.webp'),
+                  'wb') as file:
+            file.write(b'variant')
+        movie = Movie.objects.create(title=name, storyLine='story')
+        Movie.objects.filter(pk=movie.pk).update(
+            image=name, image_variants=[{
+                'width': 100, 'format': 'webp',
+                'name': movie_image_variant_path(name, 100, 'webp')}])
+        return movie
+
+    def test_rehash_images(self):
+        """Test duplicates end up in one file, counted twice"""
+        first = self.legacy_movie('uploads/movie/one.jpg', b'poster')
+        second = self.legacy_movie('uploads/movie/two.jpg', b'poster')
+        third = self.legacy_movie('uploads/movie/three.jpg', b'other')
+        digest = hashlib.sha256(b'poster').hexdigest()
+        name = f'uploads/movie/{digest[:2]}/{digest}.jpg'
+        out = StringIO()
+
+        call_command('rehash_images', stdout=out)
+
+        self.assertIn('rehashed 3 images, 1 duplicate', out.getvalue())
+        for movie in (first, second):
+            movie.refresh_from_db()
+            self.assertEqual(movie.image.name, name)
+            self.assertEqual(movie.image_variants[0]['name'],
+                             f'uploads/movie/{digest[:2]}/{digest}/100.webp')
+        third.refresh_from_db()
+        self.assertNotEqual(third.image.name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 2)
+        with open(os.path.join(self.media_root, name), 'rb') as file:
+            self.assertEqual(file.read(), b'poster')
+        self.assertTrue(os.path.exists(os.path.join(
+            self.media_root, first.image_variants[0]['name'])))
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.media_root, 'uploads/movie'))),
+            sorted({digest[:2], third.image.name.split('/')[2]}))
+
+        out = StringIO()
+        call_command('rehash_images', stdout=out)
+
+        self.assertIn('rehashed 0 images', out.getvalue())
+
+    def test_rehash_images_dry_run(self):
+        """Test a dry run renames nothing"""
+        movie = self.legacy_movie('uploads/movie/one.jpg', b'poster')
+        out = StringIO()
+
+        call_command('rehash_images', dry_run=True, stdout=out)
+
+        self.assertIn('uploads/movie/one.jpg -> ', out.getvalue())
+        self.assertIn('would rehash 1 images', out.getvalue())
+        movie.refresh_from_db()
+        self.assertEqual(movie.image.name, 'uploads/movie/one.jpg')
+        self.assertFalse(StoredFile.objects.exists())
+
+
+class SyncStaticTests(SimpleTestCase):
+    """Test collecting only the static files that changed"""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.root)
+        for name in ('app.css', 'js/app.js'):
+            self.write(name, name)
+        settings = override_settings(
+            STATIC_ROOT=self.root, STATICFILES_DIRS=[self.source],
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder'])
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write(self, name, content, mtime=1000000000):
+        path = os.path.join(self.source, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(content)
+        os.utime(path, (mtime, mtime))
+
+    def sync(self):
+        out = StringIO()
+        call_command('sync_static', stdout=out)
+        return out.getvalue()
+
+    def test_sync_static(self):
+        """Test a first run copies all, the next only what changed"""
+        self.assertIn('copied 2 of 2 static files', self.sync())
+        with open(os.path.join(self.root, 'js/app.js')) as file:
+            self.assertEqual(file.read(), 'js/app.js')
+
+        self.assertIn('static files unchanged', self.sync())
+
+        self.write('app.css', 'changed', mtime=1000000001)
+        self.write('new.css', 'new')
+
+        self.assertIn('copied 2 of 3 static files', self.sync())
+        with open(os.path.join(self.root, 'app.css')) as file:
+            self.assertEqual(file.read(), 'changed')
+
+    def test_sync_static_missing_file(self):
+        """Test a file gone from STATIC_ROOT is copied again"""
+        self.sync()
+        self.write('app.css', 'changed', mtime=1000000001)
+        os.remove(os.path.join(self.root, 'js/app.js'))
+
+        self.assertIn('copied 2 of 2 static files', self.sync())
+
+
+class MigratePendingTests(TestCase):
+    """Test migrating only when migrations are pending"""
+
+    @patch('core.management.commands.migrate_pending.call_command')
+    def test_nothing_pending(self, patched_migrate):
+        """Test migrate is skipped when every migration is applied"""
+        out = StringIO()
+
+        call_command('migrate_pending', stdout=out)
+
+        self.assertIn('no migrations to apply', out.getvalue())
+        patched_migrate.assert_not_called()
+
+    @patch('core.management.commands.migrate_pending.call_command')
+    def test_migrations_pending(self, patched_migrate):
+        """Test migrate runs when a migration is unapplied"""
+        with patch('django.db.migrations.executor.MigrationExecutor'
+                   '.migration_plan', return_value=[('migration', False)]):
+            call_command('migrate_pending', stdout=StringIO())
+
+        patched_migrate.assert_called_once_with(
+            'migrate', database='default', interactive=False, verbosity=1)
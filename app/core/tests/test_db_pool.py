@@ -0,0 +1,150 @@
+"""Test the database connection pool"""
+import threading
+import time
+
+import psycopg2
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db.pool import ConnectionPool, PoolTimeout, close_pools, get_pool
+
+
+class ConnectionPoolTests(TestCase):
+    """Test checking connections out of and back into the pool"""
+
+    def pool(self, **options):
+        params = connection.get_connection_params()
+        pool = ConnectionPool(lambda: psycopg2.connect(**params), **options)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_connection_reused(self):
+        """Test a returned connection is lent again instead of a new one"""
+        pool = self.pool()
+        first = pool.getconn()
+        pool.putconn(first)
+
+        self.assertIs(pool.getconn(), first)
+        self.assertEqual(pool.stats()['opened'], 1)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_checkout_timeout(self):
+        """Test a checkout from an exhausted pool gives up after its timeout"""
+        pool = self.pool(max_size=1, timeout=0.05)
+        pool.getconn()
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        stats = pool.stats()
+        self.assertEqual((stats['timeouts'], stats['saturation']), (1, 1))
+
+    def test_checkout_waits_for_return(self):
+        """Test a checkout waits for a connection another thread returns"""
+        pool = self.pool(max_size=1, timeout=5)
+        held = pool.getconn()
+        threading.Timer(0.1, pool.putconn, [held]).start()
+
+        self.assertIs(pool.getconn(), held)
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreaterEqual(stats['wait_ms_max'], 50)
+
+    def test_open_transaction_rolled_back(self):
+        """Test a connection returned mid transaction is rolled back"""
+        pool = self.pool()
+        conn = pool.getconn()
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(conn.info.transaction_status,
+                         psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def test_old_connections_recycled(self):
+        """Test connections past their lifetime are closed, not reused"""
+        pool = self.pool(max_lifetime=0)
+        first = pool.getconn()
+        pool.putconn(first)
+
+        self.assertIsNot(pool.getconn(), first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['recycled'], 1)
+
+    def test_broken_connection_replaced(self):
+        """Test a connection dropped while idle fails its ping, is replaced"""
+        pool = self.pool(ping_after=0)
+        first = pool.getconn()
+        pid = first.get_backend_pid()
+        pool.putconn(first)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+        time.sleep(0.1)
+
+        conn = pool.getconn()
+        self.assertIsNot(conn, first)
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        stats = pool.stats()
+        self.assertEqual((stats['ping_failures'], stats['opened']), (1, 2))
+
+    def test_idle_surplus_closed(self):
+        """Test idle connections beyond the minimum close after max_idle"""
+        pool = self.pool(min_size=1, max_idle=0)
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first)
+        time.sleep(0.01)
+        pool.putconn(second)
+
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['closed']), (1, 1))
+        self.assertTrue(first.closed)
+
+
+class PooledBackendTests(TransactionTestCase):
+    """Test django's connections are lent by the pool"""
+
+    def test_reconnect_reuses_connection(self):
+        """Test closing and reopening the connection keeps the session"""
+        connection.ensure_connection()
+        pid = connection.connection.get_backend_pid()
+        connection.close()
+        connection.ensure_connection()
+
+        self.assertEqual(connection.connection.get_backend_pid(), pid)
+        self.assertGreater(connection.pool.stats()['checkouts'], 1)
+
+    def test_pool_per_database(self):
+        """Test connections to another database come from another pool"""
+        params = connection.get_connection_params()
+        other = dict(params, database='other')
+        self.addCleanup(close_pools, database='other')
+        connection.ensure_connection()
+
+        self.assertIs(get_pool('default', params, {}, None), connection.pool)
+        self.assertIsNot(get_pool('default', params, {}, None),
+                         get_pool('default', other, {}, None))
+
+    def test_stats_endpoint(self):
+        """Test the pool counters are exposed to admins"""
+        client = APIClient()
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        client.force_authenticate(user)
+
+        res = client.get(reverse('movie:db-pool-stats'))
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        res = client.get(reverse('movie:db-pool-stats'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        stats = {pool['database']: pool for pool in res.data}
+        database = connection.settings_dict['NAME']
+        self.assertEqual(stats[database]['alias'], 'default')
+        self.assertGreaterEqual(stats[database]['checkouts'], 1)
@@ -0,0 +1,47 @@
+"""Test data migrations"""
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class ReviewUniqueMigrationTests(TransactionTestCase):
+    """Test duplicate reviews are removed before the unique constraint"""
+    migrate_from = [('core', '0014_movie_rating_sum')]
+    migrate_to = [('core', '0015_review_movie_user_unique')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_duplicates_removed(self):
+        """Test the latest review of each user and movie is kept"""
+        apps = self.migrate(self.migrate_from)
+        User = apps.get_model('core', 'User')
+        Movie = apps.get_model('core', 'Movie')
+        Review = apps.get_model('core', 'Review')
+        user = User.objects.create(email='user@example.com')
+        other = User.objects.create(email='other@example.com')
+        movie = Movie.objects.create(
+            title='sample title', storyLine='sample storyLine',
+            number_rating=4, rating_sum=12)
+        Review.objects.create(movie=movie, user=user, rating=1)
+        Review.objects.create(movie=movie, user=user, rating=2)
+        latest = Review.objects.create(movie=movie, user=user, rating=5)
+        kept = Review.objects.create(movie=movie, user=other, rating=4)
+
+        apps = self.migrate(self.migrate_to)
+
+        Movie = apps.get_model('core', 'Movie')
+        Review = apps.get_model('core', 'Review')
+        self.assertEqual(
+            set(Review.objects.values_list('id', flat=True)),
+            {latest.id, kept.id})
+        movie = Movie.objects.get(pk=movie.pk)
+        self.assertEqual(movie.number_rating, 2)
+        self.assertEqual(movie.rating_sum, 9)
+        self.assertEqual(str(movie.avg_rating), '4.50')
@@ -0,0 +1,83 @@
+"""Test the fast JSON renderer"""
+import datetime
+import decimal
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test FastJSONRenderer matches JSONRenderer byte for byte"""
+
+    def assertSameOutput(self, data, **kwargs):
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(data, **kwargs),
+            JSONRenderer().render(data, **kwargs),
+        )
+
+    def test_plain_values(self):
+        """Test nested containers, unicode and javascript separators"""
+        self.assertSameOutput({
+            'results': [{'id': 1, 'title': 'café ☕', 'active': True}],
+            'next': None,
+            'count': 1.5,
+            'story': 'line separator ',
+        })
+
+    def test_decimal_and_datetimes(self):
+        """Test Decimal, aware and naive datetimes, dates and times"""
+        aware = timezone.now()
+        self.assertSameOutput({
+            'avg_rating': decimal.Decimal('4.50'),
+            'created': aware,
+            'utc': datetime.datetime(2021, 5, 1, 12, 30, tzinfo=timezone.utc),
+            'naive': datetime.datetime(2021, 5, 1, 12, 30, 15, 123456),
+            'date': datetime.date(2021, 5, 1),
+            'time': datetime.time(12, 30, 15, 500),
+            'delta': datetime.timedelta(seconds=90),
+        })
+
+    def test_other_types(self):
+        """Test uuids, lazy strings, tuples, bytes and int keys"""
+        self.assertSameOutput({
+            'uuid': uuid.uuid4(),
+            'lazy': gettext_lazy('Invalid'),
+            'tuple': (1, 2),
+            'bytes': b'data',
+            1: 'int key',
+        })
+
+    def test_big_int_falls_back(self):
+        """Test integers orjson can not encode still render"""
+        self.assertSameOutput({'big': 2 ** 70})
+
+    def test_indent_falls_back(self):
+        """Test indented output is left to JSONRenderer"""
+        self.assertSameOutput(
+            {'id': 1}, accepted_media_type='application/json; indent=4')
+
+    def test_without_orjson(self):
+        """Test the renderer works when orjson is not installed"""
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertSameOutput({'avg_rating': decimal.Decimal('1.5')})
+
+    def test_render_list(self):
+        """Test chunks are joined into a single JSON array"""
+        chunks = [[{'id': 1}, {'id': 2}], [], [{'id': 3}]]
+
+        content = b''.join(renderers.FastJSONRenderer().render_list(chunks))
+
+        self.assertEqual(
+            content, JSONRenderer().render([{'id': 1}, {'id': 2}, {'id': 3}]))
+
+    def test_render_empty_list(self):
+        """Test no chunks render an empty array"""
+        content = b''.join(renderers.FastJSONRenderer().render_list([]))
+
+        self.assertEqual(content, b'[]')
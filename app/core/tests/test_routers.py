@@ -0,0 +1,183 @@
+"""Test routing safe requests' reads to replicas"""
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connections
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings)
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.asgi import ReadPoolASGIHandler
+from core.models import Movie
+from core.routers import PIN_HEADER, ReplicaSet, get_replicas, reset_replicas
+from core.tests.test_asgi import request
+
+
+def detail_url(movie_id):
+    return reverse('movie:movie-detail', args=[movie_id])
+
+
+class ReplicaSetTests(SimpleTestCase):
+    """Test choosing among the replicas"""
+
+    def replicas(self, selection):
+        replicas = ReplicaSet(['a', 'b', 'c'], selection=selection,
+                              max_lag=2, check_interval=60)
+        for replica in replicas.replicas:
+            replica.checked = time.monotonic()
+        return replicas
+
+    def test_round_robin(self):
+        """Test usable replicas take turns"""
+        replicas = self.replicas('round-robin')
+        replicas.mark_down('b')
+
+        chosen = [replicas.choose() for _ in range(4)]
+
+        self.assertEqual(chosen, ['a', 'c', 'a', 'c'])
+
+    def test_least_latency(self):
+        """Test the usable replica quickest to answer is chosen"""
+        replicas = self.replicas('least-latency')
+        a, b, c = replicas.replicas
+        a.latency, b.latency, c.latency = 0.003, 0.001, 0.002
+        b.lag = 5
+
+        self.assertEqual(replicas.choose(), 'c')
+
+    def test_none_usable(self):
+        """Test the primary is read from when no replica is usable"""
+        replicas = self.replicas('round-robin')
+        for replica in replicas.replicas:
+            replica.lag = 2
+
+        self.assertIsNone(replicas.choose())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    """Test safe requests read from the replica unless pinned"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        # checked afresh by each test
+        reset_replicas('DATABASE_REPLICAS')
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        # a token only the primary has, as if just created
+        self.token = Token.objects.create(user=user).key
+        self.client = self.api_client()
+        self.movie = Movie.objects.create(
+            title='primary title', storyLine='story')
+        Movie.objects.using('replica').create(
+            pk=self.movie.pk, title='replica title', storyLine='story')
+
+    def api_client(self, **headers):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token}', **headers)
+        return client
+
+    def write(self):
+        res = self.client.post(
+            reverse('movie:review-create', args=[self.movie.pk]),
+            {'rating': 5, 'description': 'good'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res
+
+    def title(self, client=None):
+        res = (client or self.client).get(detail_url(self.movie.pk))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data['title']
+
+    def test_reads_from_replica(self):
+        """Test a safe request reads from the replica"""
+        self.assertEqual(self.title(), 'replica title')
+
+    def test_write_pins_client_to_primary(self):
+        """Test a client reads from the primary right after it writes"""
+        res = self.write()
+
+        # the cookie, kept by the client
+        self.assertEqual(self.title(), 'primary title')
+        # the header, echoed by a client without cookies
+        client = self.api_client(HTTP_X_DB_PIN=res[PIN_HEADER])
+        self.assertEqual(self.title(client), 'primary title')
+
+    def test_pin_expires_or_forged(self):
+        """Test an expired or forged pin is ignored"""
+        pin = self.write()[PIN_HEADER]
+
+        client = self.api_client(HTTP_X_DB_PIN=pin + 'x')
+        self.assertEqual(self.title(client), 'replica title')
+
+        client = self.api_client(HTTP_X_DB_PIN=pin)
+        with patch('django.core.signing.time.time',
+                   return_value=time.time() + 60):
+            self.assertEqual(self.title(client), 'replica title')
+
+    def test_lagging_replica_skipped(self):
+        """Test a replica too far behind is not read from"""
+        with patch('core.routers.LAG_QUERY', 'SELECT 10'):
+            self.assertEqual(self.title(), 'primary title')
+
+        self.assertEqual(get_replicas().stats()[0]['lag'], 10)
+
+    def test_down_replica_skipped(self):
+        """Test a replica failing its check is not read from"""
+        with patch.object(connections['replica'], 'ensure_connection',
+                          side_effect=OperationalError('down')):
+            self.assertEqual(self.title(), 'primary title')
+
+        self.assertFalse(get_replicas().stats()[0]['healthy'])
+
+    def test_replica_failing_mid_request(self):
+        """Test a request whose replica fails is retried on the primary"""
+        self.assertEqual(self.title(), 'replica title')
+
+        with patch.object(connections['replica'], 'ensure_connection',
+                          side_effect=OperationalError('down')):
+            self.assertEqual(self.title(), 'primary title')
+
+        self.assertEqual(get_replicas().stats()[0]['failures'], 1)
+        self.assertEqual(self.title(), 'primary title')
+
+    @override_settings(RESPONSE_CACHE={
+        'ENABLED': True, 'BACKEND': 'core.cache.LRUCache'})
+    def test_replica_responses_cached_briefly(self):
+        """Test responses read from a replica are cached up to max lag"""
+        with patch('core.cache.LRUCache.set', autospec=True) as cache_set:
+            self.title()
+
+        (_, _, _, timeout), = [
+            call.args for call in cache_set.call_args_list
+            if call.args[1].startswith('response:')]
+        self.assertEqual(timeout, 2)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingASGITests(TransactionTestCase):
+    """Test the ASGI read pool reads from the replica too"""
+    databases = {'default', 'replica'}
+
+    def test_reads_from_replica(self):
+        """Test a read served by the read pool reads from the replica"""
+        reset_replicas('DATABASE_REPLICAS')
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        token = Token.objects.create(user=user).key
+        movie = Movie.objects.create(title='primary title', storyLine='story')
+        Movie.objects.using('replica').create(
+            pk=movie.pk, title='replica title', storyLine='story')
+
+        status_code, _, body = asyncio.run(request(
+            ReadPoolASGIHandler(), 'GET', detail_url(movie.pk), token))
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(body)['title'], 'replica title')
@@ -0,0 +1,108 @@
+"""Test the content addressed storage of movie images"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from core.models import StoredFile
+from core.storage import ContentAddressedStorage, acquire, release
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test storing files by content and counting their references"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.storage = ContentAddressedStorage(location=self.root)
+
+    def test_save_names_file_by_content(self):
+        """Test files are named after the sha256 of their content"""
+        digest = hashlib.sha256(b'poster').hexdigest()
+
+        name = self.storage.save(
+            'uploads/movie/some-uuid.JPG', ContentFile(b'poster'))
+
+        self.assertEqual(name, f'uploads/movie/{digest[:2]}/{digest}.jpg')
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'poster')
+
+    def test_save_same_content_once(self):
+        """Test saving content already stored writes nothing"""
+        first = self.storage.save('uploads/movie/a.jpg', ContentFile(b'x'))
+        os.utime(self.storage.path(first), (0, 0))
+
+        second = self.storage.save('uploads/movie/b.jpg', ContentFile(b'x'))
+        other = self.storage.save('uploads/movie/c.jpg', ContentFile(b'y'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(os.stat(self.storage.path(first)).st_mtime, 0)
+
+    def test_release_deletes_unreferenced_file(self):
+        """Test a file and its variants go with their last reference"""
+        name = self.storage.save('uploads/movie/a.jpg', ContentFile(b'x'))
+        variants = self.storage.path(os.path.splitext(name)[0])
+        os.makedirs(variants)
+        acquire(name)
+        acquire(name)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release(name, self.storage)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+        self.assertTrue(self.storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release(name, self.storage)
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(os.path.exists(variants))
+
+    def test_release_keeps_file_acquired_again(self):
+        """Test a file referenced again before the commit stays"""
+        name = self.storage.save('uploads/movie/a.jpg', ContentFile(b'x'))
+        acquire(name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release(name, self.storage)
+            acquire(name)
+
+        self.assertTrue(self.storage.exists(name))
+
+    def test_acquire_after_release_unlinked_writes_again(self):
+        """Test an upload saved as the last reference went is kept"""
+        name = self.storage.save('uploads/movie/a.jpg', ContentFile(b'x'))
+        acquire(name)
+        upload = ContentFile(b'x', name='b.jpg')
+        # the upload finds the file stored and writes nothing...
+        self.assertEqual(self.storage.save('uploads/movie/b.jpg', upload),
+                         name)
+
+        # ...then the last reference goes and the file with it
+        with self.captureOnCommitCallbacks(execute=True):
+            release(name, self.storage)
+        self.assertFalse(self.storage.exists(name))
+
+        acquire(name, self.storage, upload)
+
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'x')
+
+    def test_release_unlinks_only_unreferenced_row(self):
+        """Test an acquire committed before the unlink keeps the file"""
+        name = self.storage.save('uploads/movie/a.jpg', ContentFile(b'x'))
+        acquire(name)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            release(name, self.storage)
+        acquire(name)
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+        self.assertTrue(self.storage.exists(name))
@@ -0,0 +1,147 @@
+"""response cache for the movie api read endpoints
+
+Cached responses are keyed by the request url, the normalized query
+params and the current version of every entity the response depends on
+(a "scope", e.g. `movie:42`). Writes bump the versions of the scopes
+they touch, which makes every dependent entry unreachable; the backend's
+LRU bound or timeout reclaims them.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+from core.cache import create_cache
+from core.routers import read_alias
+
+
+class ResponseCache:
+    """cache of serialized response data with versioned scopes"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = self.misses = 0
+
+    def version(self, scope):
+        key = f'version:{scope}'
+        version = self.backend.get(key)
+        if version is None:
+            # start from a fresh value so a version lost to eviction can
+            # never line up with entries cached under an older counter
+            self.backend.add(key, time.time_ns())
+            version = self.backend.get(key)
+        return version
+
+    def bump(self, *scopes):
+        """invalidate every response depending on one of `scopes`"""
+        for scope in scopes:
+            key = f'version:{scope}'
+            try:
+                self.backend.incr(key)
+            except (KeyError, ValueError):
+                self.backend.add(key, time.time_ns())
+
+    def key(self, request, scopes, variant=None):
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+        parts = [request.get_host(), request.path, repr(params)]
+        parts += [f'{scope}={self.version(scope)}' for scope in scopes]
+        if variant is not None:
+            parts.append(f'variant={variant}')
+        digest = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+        return f'response:{digest}'
+
+    def get(self, key):
+        data = self.backend.get(key)
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def set(self, key, data, timeout=None):
+        self.backend.set(key, data, timeout)
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        """response hits and misses, plus the backend's own counters"""
+        stats = self.backend.stats()
+        stats.update(hits=self.hits, misses=self.misses)
+        return stats
+
+
+_cache = None
+
+
+def get_response_cache():
+    """return the process wide response cache"""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(create_cache(settings.RESPONSE_CACHE))
+    return _cache
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    global _cache
+    if setting == 'RESPONSE_CACHE':
+        _cache = None
+
+
+def invalidate(*scopes):
+    """bump the version of `scopes` once the write commits, if caching is on"""
+    if settings.RESPONSE_CACHE['ENABLED']:
+        # not before: a read meanwhile would cache the rows the write
+        # has yet to commit under the version just bumped
+        transaction.on_commit(lambda: get_response_cache().bump(*scopes))
+
+
+class CachedResponseMixin:
+    """serve `list` and `retrieve` from the response cache
+
+    Views return the scopes a response depends on from `cache_scopes`,
+    and may return from `cache_variant` a value the database keeps for
+    the response, e.g. the version its ETag is made of, which the scope
+    versions of another worker's cache would not follow. Lookups happen
+    after authentication and permission checks.
+    """
+
+    def cache_scopes(self):
+        raise NotImplementedError
+
+    def cache_variant(self):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(super().retrieve, request, *args, **kwargs)
+
+    def _cached(self, handler, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE['ENABLED']:
+            return handler(request, *args, **kwargs)
+
+        cache = get_response_cache()
+        key = cache.key(request, self.cache_scopes(), self.cache_variant())
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            # a lagging replica may still serve what a write just changed:
+            # keep such responses no longer than the lag replicas may have
+            timeout = settings.REPLICA_MAX_LAG if read_alias() else None
+            cache.set(key, response.data, timeout)
+        return response
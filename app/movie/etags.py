@@ -0,0 +1,42 @@
+"""ETags for conditional GETs on movies and their reviews
+
+Tags are derived from `Movie.version`, so checking `If-None-Match`
+costs a single primary key lookup and no serialization. The version is
+looked up once per request: the response cache keys the body on it too,
+so a tag is never sent with a body cached before the version changed.
+"""
+import hashlib
+
+from core.models import Movie
+
+
+def movie_version(request, pk):
+    """`Movie.version` of movie `pk`, as of this request's first lookup"""
+    versions = request.__dict__.setdefault('_movie_versions', {})
+    if pk not in versions:
+        versions[pk] = Movie.objects.filter(pk=pk).values_list(
+            'version', flat=True).first()
+    return versions[pk]
+
+
+def _etag(request, kind, pk):
+    version = movie_version(request, pk)
+    if version is None:
+        return None
+    # the query string selects the page and the renderer the format, so
+    # both are part of the representation the tag identifies
+    params = sorted(request.GET.lists())
+    variant = hashlib.sha1(
+        f'{params}|{request.accepted_renderer.format}'.encode(),
+    ).hexdigest()[:12]
+    return f'{kind}-{pk}-{version}-{variant}'
+
+
+def movie_etag(request, pk, *args, **kwargs):
+    """ETag of a movie detail response"""
+    return _etag(request, 'movie', pk)
+
+
+def review_list_etag(request, pk, *args, **kwargs):
+    """ETag of a movie's review list response"""
+    return _etag(request, 'reviews', pk)
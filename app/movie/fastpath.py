@@ -0,0 +1,208 @@
+"""read-only fast path for flat list serializers
+
+`ModelSerializer` renders every row by walking its bound fields, each
+resolving its attribute on a model instance. For flat serializers the
+same output can be built straight from `.values()` rows: each declared
+field is compiled once per request into a (column, converter) pair and
+rows are turned into dicts with a tight loop.
+"""
+import decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class UnsupportedSerializer(Exception):
+    """the serializer has fields the fast path can not render"""
+
+
+def _identity(value):
+    return value
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(
+        field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize:
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(
+            value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = getattr(field, 'timezone', field.default_timezone())
+    if output_format is None or field_timezone is None or \
+            output_format.lower() != ISO_8601:
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _file_converter(field, model_field):
+    use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+    if not use_url:
+        return lambda name: name or None
+    url = _storage_url(model_field.storage)
+    request = field.context.get('request')
+    if request is None:
+        return lambda name: url(name) if name else None
+    origin = request.build_absolute_uri('/')[:-1]
+
+    def convert(name):
+        if not name:
+            return None
+        location = url(name)
+        if location.startswith('/') and not location.startswith('//'):
+            # what build_absolute_uri does, minus re-reading the host;
+            # storage urls are already quoted ascii
+            return origin + location
+        return request.build_absolute_uri(location)
+    return convert
+
+
+def _storage_url(storage):
+    """return `storage.url`, inlined for local file system storage"""
+    base_url = getattr(storage, 'base_url', None)
+    if not isinstance(storage, FileSystemStorage) or not base_url or \
+            not base_url.endswith('/'):
+        return storage.url
+
+    def url(name):
+        path = filepath_to_uri(name).lstrip('/')
+        if {'.', '..'} & set(path.split('/')):
+            # let urljoin resolve dot segments
+            return storage.url(name)
+        return base_url + path
+    return url
+
+
+def _compile_field(field, model):
+    """return the `.values()` column and converter for a bound field"""
+    if isinstance(field, (serializers.BaseSerializer,
+                          serializers.ManyRelatedField,
+                          serializers.SerializerMethodField)) or \
+            len(field.source_attrs) != 1:
+        raise UnsupportedSerializer(field.field_name)
+
+    column = field.source
+    try:
+        model_field = model._meta.get_field(column)
+    except FieldDoesNotExist:
+        raise UnsupportedSerializer(field.field_name)
+    if model_field.many_to_many or model_field.one_to_many:
+        raise UnsupportedSerializer(field.field_name)
+
+    if isinstance(field, serializers.RelatedField):
+        if not field.use_pk_only_optimization():
+            raise UnsupportedSerializer(field.field_name)
+        # `.values()` returns the foreign key column, which is the pk
+        convert = _identity
+    elif isinstance(field, serializers.DecimalField):
+        convert = _decimal_converter(field)
+    elif isinstance(field, serializers.DateTimeField):
+        convert = _datetime_converter(field)
+    elif isinstance(field, serializers.FileField):
+        convert = _file_converter(field, model_field)
+    elif isinstance(field, (serializers.ReadOnlyField,
+                            serializers.BooleanField,
+                            serializers.IntegerField)):
+        convert = _identity
+    else:
+        convert = field.to_representation
+    return column, convert
+
+
+class FastReader:
+    """render `.values()` rows exactly as `serializer_class` would"""
+
+    def __init__(self, serializer_class, context=None):
+        serializer = serializer_class(context=context or {})
+        if not isinstance(serializer, serializers.ModelSerializer):
+            raise UnsupportedSerializer(serializer_class.__name__)
+        model = serializer.Meta.model
+
+        self.fields = []
+        self.row_fields = []
+        columns = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if hasattr(field, 'from_values'):
+                # rendered from several columns of the row; stored in the
+                # row under a key no column can have
+                columns += field.values_columns
+                column, convert = ('field', name), _identity
+                self.row_fields.append((column, field.from_values))
+            else:
+                column, convert = _compile_field(field, model)
+                columns.append(column)
+            self.fields.append((name, column, convert))
+        self.columns = list(dict.fromkeys(columns))
+
+    def to_representation(self, rows):
+        fields = self.fields
+        if self.row_fields:
+            rows = list(rows)
+            for row in rows:
+                for column, from_values in self.row_fields:
+                    row[column] = from_values(row)
+        return [
+            {
+                name: None if row[column] is None else convert(row[column])
+                for name, column, convert in fields
+            }
+            for row in rows
+        ]
+
+
+class FastPathListMixin:
+    """opt a view's `list` into the `.values()` fast path
+
+    Falls back to the regular serializer when it has fields the fast
+    path can not render, e.g. nested serializers or method fields.
+    """
+
+    def list(self, request, *args, **kwargs):
+        try:
+            reader = FastReader(
+                self.get_serializer_class(), self.get_serializer_context())
+        except UnsupportedSerializer:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = list(reader.columns)
+        if hasattr(self.paginator, 'get_ordering'):
+            # cursor positions are read from the row dicts
+            columns += [
+                order.lstrip('-') for order in self.paginator.get_ordering(
+                    request, queryset, self)
+            ]
+        queryset = queryset.values(*dict.fromkeys(columns))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                reader.to_representation(page))
+        return Response(reader.to_representation(queryset))
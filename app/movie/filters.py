@@ -0,0 +1,57 @@
+"""whitelisted filtering and ordering for the movie api
+
+Only combinations backed by an index on `core.Movie` are accepted, so a
+client can not turn a list request into a sequential scan.
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+class MovieFilter(BaseFilterBackend):
+    """filter movies on the query params in `params`
+
+    Each param maps to the lookup it filters on and the field parsing
+    its value. Other query params are ignored.
+    """
+    params = {
+        'platform': ('platform', serializers.IntegerField()),
+        'active': ('active', serializers.BooleanField()),
+        'avg_rating__gte': ('avg_rating__gte', serializers.DecimalField(
+            max_digits=5, decimal_places=2)),
+        'avg_rating__lte': ('avg_rating__lte', serializers.DecimalField(
+            max_digits=5, decimal_places=2)),
+        'number_rating__gte': ('number_rating__gte',
+                               serializers.IntegerField()),
+        'number_rating__lte': ('number_rating__lte',
+                               serializers.IntegerField()),
+        'created__gte': ('created__gte', serializers.DateTimeField()),
+        'created__lte': ('created__lte', serializers.DateTimeField()),
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        filters, errors = {}, {}
+        for param, (lookup, field) in self.params.items():
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                filters[lookup] = field.run_validation(value)
+            except ValidationError as exc:
+                errors[param] = exc.detail
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**filters)
+
+
+class IndexedOrderingFilter(OrderingFilter):
+    """order on a single field of `ordering_fields`
+
+    Orderings combining several fields have no index to walk, so only
+    the first valid field of `?ordering=` is kept. Cursor pagination
+    adds the `id` tie-breaker.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        return ordering[:1] if ordering else ordering
@@ -0,0 +1,189 @@
+"""resized variants of uploaded movie images
+
+Once an upload commits, a process pool decodes the original once and
+writes a copy per width of MOVIE_IMAGE_VARIANT_WIDTHS in each format of
+MOVIE_IMAGE_VARIANT_FORMATS, never upscaling. The movie then records
+them in `image_variants`, which `MovieSerializer.images` renders. Files
+land under MEDIA_ROOT next to the original, so nginx serves them. As
+images are stored by content, a movie given an image some other movie
+already has reuses its variants.
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from core.db.utils import drop_inherited_connections
+
+logger = logging.getLogger(__name__)
+
+# Pillow format, file extension and encoder options
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True,
+                             'progressive': True}),
+}
+
+# the EXIF orientation tag, and its values that turn the image a quarter
+ORIENTATION = 0x0112
+QUARTER_TURNS = {5, 6, 7, 8}
+
+
+def render_variants(root, name, widths, formats):
+    """write the resized copies of image `name`, return their records
+
+    Runs in the pool's processes: plain file paths in and out, no
+    database access.
+    """
+    from core.models import movie_image_variant_path
+
+    image = _open(os.path.join(root, name), max(widths))
+    sizes = sorted({min(width, image.width) for width in widths},
+                   reverse=True)
+    variants = []
+    for width in sizes:
+        height = max(1, round(image.height * width / image.width))
+        # each size is reduced from the previous, larger one
+        image = image.resize(
+            (width, height), Image.LANCZOS, reducing_gap=3.0)
+        for format in formats:
+            pil_format, extension, options = FORMATS[format]
+            variant = _convert(image, alpha=pil_format != 'JPEG')
+            path = movie_image_variant_path(name, width, extension)
+            _save(variant, os.path.join(root, path), pil_format, options)
+            variants.append({'width': width, 'format': format, 'name': path})
+    return variants
+
+
+def render_resized(source, width, format, path):
+    """write image `source` at most `width` pixels wide to `path`"""
+    image = _open(source, width)
+    width = min(width, image.width)
+    height = max(1, round(image.height * width / image.width))
+    image = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+    pil_format, extension, options = FORMATS[format]
+    _save(_convert(image, alpha=pil_format != 'JPEG'), path, pil_format,
+          options)
+
+
+def _open(path, width):
+    """decode image `path`, upright, for resizing to at most `width`"""
+    with Image.open(path) as original:
+        upright_width = original.width
+        if original.getexif().get(ORIENTATION, 1) in QUARTER_TURNS:
+            # stored on its side: upright, its width is the stored height
+            upright_width = original.height
+        if width < upright_width:
+            # decode jpegs at the smallest scale still large enough
+            scale = width / upright_width
+            original.draft('RGB', (round(original.width * scale),
+                                   round(original.height * scale)))
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    # resampling needs RGB(A); palette images only resize nearest
+    return _convert(image, alpha=True)
+
+
+def _convert(image, alpha):
+    """return `image` as RGB, or RGBA when it has and may keep alpha"""
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or \
+        'transparency' in image.info
+    if has_alpha:
+        image = image.convert('RGBA')
+        if alpha:
+            return image
+        # flatten transparent areas onto white rather than black
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def _save(image, path, format, options):
+    """write `path` whole, so nginx never serves a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            image.save(file, format, **options)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+_executor = None
+
+
+def get_executor():
+    """return the process wide resizing pool"""
+    global _executor
+    if _executor is None:
+        # fork: spawning needs sys.executable, which uwsgi is not
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.MOVIE_IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=drop_inherited_connections,
+        )
+    return _executor
+
+
+def store_variants(pk, name, variants):
+    """record the variants, unless the movie's image changed meanwhile"""
+    from core.models import Movie
+    from movie.cache import invalidate
+
+    updated = Movie.objects.filter(pk=pk, image=name).update(
+        image_variants=variants, version=F('version') + 1)
+    if updated:
+        invalidate('movies', f'movie:{pk}')
+
+
+def generate_variants(movie):
+    """resize `movie.image` once the current transaction commits"""
+    if not movie.image:
+        return
+    args = (settings.MEDIA_ROOT, movie.image.name,
+            settings.MOVIE_IMAGE_VARIANT_WIDTHS,
+            settings.MOVIE_IMAGE_VARIANT_FORMATS)
+    pk, name = movie.pk, movie.image.name
+
+    def submit():
+        from core.models import Movie
+
+        rendered = Movie.objects.filter(image=name).exclude(
+            image_variants=[]).values_list('image_variants', flat=True)[:1]
+        if rendered:
+            store_variants(pk, name, rendered[0])
+            return
+        if not settings.MOVIE_IMAGE_WORKERS:
+            store_variants(pk, name, render_variants(*args))
+            return
+
+        def done(future):
+            try:
+                store_variants(pk, name, future.result())
+            except Exception:
+                logger.exception('resizing %s failed', name)
+            finally:
+                # callbacks run on the pool's thread, with its own
+                # connection
+                connections.close_all()
+
+        global _executor
+        try:
+            future = get_executor().submit(render_variants, *args)
+        except RuntimeError:
+            # a crashed worker breaks the pool; start a new one
+            _executor = None
+            future = get_executor().submit(render_variants, *args)
+        future.add_done_callback(done)
+
+    transaction.on_commit(submit)
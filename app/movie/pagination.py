@@ -0,0 +1,160 @@
+"""keyset (cursor) pagination for the movie api"""
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    CursorPagination,
+    Cursor,
+    _reverse_ordering,
+)
+from rest_framework.utils.urls import remove_query_param
+
+
+class KeysetCursorPagination(CursorPagination):
+    """cursor pagination keyed on every field of the ordering
+
+    DRF's cursor only remembers the first ordering field and falls back
+    to an offset for ties. Here the cursor stores the full sort key of
+    the last row, so a page is always one index range scan regardless
+    of how deep the client has paged.
+    """
+    page_size = settings.PAGINATION_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        """return the ordering with a unique `id` tie-breaker"""
+        ordering = super().get_ordering(request, queryset, view)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('-id' if ordering[-1].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, position = False, None
+        else:
+            reverse, position = self.cursor.reverse, self.cursor.position
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if position is not None:
+            queryset = queryset.filter(
+                self._position_filter(queryset.model, position, reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # an empty reversed page means nothing precedes the cursor,
+            # so the following page is simply the first one
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        position = self._get_position_from_instance(
+            self.page[-1], self.ordering)
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(
+                self.page[0], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=True, position=position))
+
+    def link_after(self, base_url, instance):
+        """return a link to the page that follows `instance`"""
+        self.base_url = base_url
+        ordering = self.ordering
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        position = self._get_position_from_instance(instance, ordering)
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            if isinstance(instance, dict):
+                attr = instance[field_name]
+            else:
+                attr = getattr(instance, field_name)
+            if hasattr(attr, 'isoformat'):
+                attr = attr.isoformat()
+            values.append(str(attr))
+        return json.dumps(values, separators=(',', ':'))
+
+    def _position_filter(self, model, position, reverse):
+        """return a filter selecting rows strictly after `position`"""
+        try:
+            values = json.loads(position)
+            if len(values) != len(self.ordering):
+                raise ValueError
+            fields = []
+            for order, value in zip(self.ordering, values):
+                name = order.lstrip('-')
+                field = model._meta.pk if name == 'pk' else \
+                    model._meta.get_field(name)
+                fields.append((name, order.startswith('-'),
+                               field.to_python(value)))
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # (a, b) > (x, y) expands to a > x OR (a = x AND b > y); the
+        # redundant a >= x bound lets the planner start the index scan
+        # at the cursor instead of filtering from the top of the index.
+        name, descending, value = fields[0]
+        lookup = 'lte' if descending != reverse else 'gte'
+        bound = Q(**{f'{name}__{lookup}': value})
+
+        after = Q()
+        equal = Q()
+        for name, descending, value in fields:
+            lookup = 'lt' if descending != reverse else 'gt'
+            after |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return bound & after
+
+
+class MoviePagination(KeysetCursorPagination):
+    """paginate movies newest first"""
+    ordering = '-id'
+
+
+class ReviewPagination(KeysetCursorPagination):
+    """paginate reviews newest first"""
+    ordering = ('-created', '-id')
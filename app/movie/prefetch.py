@@ -0,0 +1,128 @@
+"""prefetch planning for nested serializers
+
+Walks a serializer's field tree once per serializer class and works out
+which relations it will touch, so a view can load them with a constant
+number of queries instead of one query per row.
+"""
+from collections import defaultdict
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from rest_framework import serializers
+
+from core.models import Movie
+
+
+@lru_cache(maxsize=None)
+def _plan(serializer_class, model):
+    """return (select_related paths, prefetch specs) for a serializer
+
+    A prefetch spec is `(path, related model, child serializer class)`;
+    the child class is None when only the related objects themselves
+    are needed.
+    """
+    select, prefetch = [], []
+    _walk(serializer_class(), model, '', select, prefetch)
+    return tuple(select), tuple(prefetch)
+
+
+def _walk(serializer, model, prefix, select, prefetch):
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+
+        relations, current, many = [], model, False
+        for attr in field.source_attrs:
+            try:
+                relation = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not relation.is_relation:
+                break
+            relations.append(attr)
+            current = relation.related_model
+            if relation.one_to_many or relation.many_to_many:
+                many = True
+                break
+        if not relations:
+            continue
+
+        if isinstance(field, serializers.RelatedField) and \
+                field.use_pk_only_optimization() and \
+                relations == field.source_attrs:
+            # rendered from the foreign key column of the parent row
+            relations = relations[:-1]
+            if not relations:
+                continue
+
+        path = '__'.join([prefix] + relations if prefix else relations)
+        if many:
+            child = getattr(field, 'child', None)
+            nested = type(child) if isinstance(
+                child, serializers.ModelSerializer) else None
+            prefetch.append((path, current, nested))
+        else:
+            select.append(path)
+            if isinstance(field, serializers.ModelSerializer):
+                _walk(field, current, path, select, prefetch)
+
+
+def plan_queryset(queryset, serializer_class):
+    """apply the select_related / prefetch_related a serializer needs"""
+    if not issubclass(serializer_class, serializers.ModelSerializer):
+        return queryset
+    select, prefetch = _plan(serializer_class, queryset.model)
+    if select:
+        queryset = queryset.select_related(*select)
+    for path, model, nested in prefetch:
+        if nested is None:
+            queryset = queryset.prefetch_related(path)
+        else:
+            queryset = queryset.prefetch_related(Prefetch(
+                path, queryset=plan_queryset(model._default_manager.all(),
+                                             nested)))
+    return queryset
+
+
+class PrefetchPlanMixin:
+    """plan related loading from the view's serializer class"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return plan_queryset(queryset, self.get_serializer_class())
+
+
+def prefetch_top_movies(streams, limit):
+    """attach each stream's newest `limit` movies in one windowed query
+
+    Sets `top_movies` on every stream, and `has_more_movies` when the
+    stream has titles beyond the first `limit`.
+    """
+    streams = [
+        stream for stream in streams if not hasattr(stream, 'top_movies')]
+    if not streams:
+        return
+
+    ranked = Movie.objects.filter(
+        platform__in=[stream.pk for stream in streams],
+    ).annotate(row_number=Window(
+        expression=RowNumber(),
+        partition_by=[F('platform_id')],
+        order_by=F('id').desc(),
+    ))
+    sql, params = ranked.query.sql_with_params()
+    movies = Movie.objects.raw(
+        f'SELECT * FROM ({sql}) ranked WHERE row_number <= %s '
+        'ORDER BY platform_id, row_number',
+        (*params, limit + 1),
+    )
+
+    by_stream = defaultdict(list)
+    for movie in movies:
+        by_stream[movie.platform_id].append(movie)
+    for stream in streams:
+        movies = by_stream[stream.pk]
+        stream.top_movies = movies[:limit]
+        stream.has_more_movies = len(movies) > limit
@@ -0,0 +1,184 @@
+"""movie images resized on request, cached on disk
+
+`movies/<id>/image?w=&fmt=` resizes the movie's image once and keeps
+the result in `resize_dir()`. `ResizeCache` holds at most
+MOVIE_IMAGE_RESIZE_CACHE_SIZE bytes there, evicting the least recently
+used files, so a hit costs a stat and no decoding. Misses are single
+flight: concurrent requests for one file, in any process, wait on a
+file lock for the first to resize it instead of resizing it too.
+"""
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from movie.images import FORMATS, render_resized
+
+# a hit marks its file used at most this often, in seconds
+TOUCH_INTERVAL = 60
+# misses of different files mostly take different locks
+LOCK_STRIPES = 64
+
+
+def resize_dir():
+    """where resized images are cached, on MEDIA_ROOT's file system"""
+    return os.path.join(settings.MEDIA_ROOT, '.resized')
+
+
+class ResizeCache:
+    """files in `directory`, evicted least recently used past `max_size`
+
+    Use is tracked in the files' mtime, so every process shares the
+    order. Each process counts the bytes it writes on top of the size
+    last seen scanning the directory, and scans again, evicting down
+    to 90% of `max_size`, when the count passes `max_size` or is older
+    than `rescan_interval` seconds. The size can thus overshoot by what
+    the other processes wrote since.
+    """
+
+    def __init__(self, directory, max_size, rescan_interval=60):
+        self.directory = directory
+        self.max_size = max_size
+        self.rescan_interval = rescan_interval
+        self.size = None
+        self.scanned = 0
+        self.lock = threading.Lock()
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key[:2], f'{key}.{extension}')
+
+    def get(self, key, extension, render):
+        """return the path of file `key`, made by `render(path)` if missing"""
+        path = self.path(key, extension)
+        if self._hit(path):
+            return path
+        with self._single_flight(key):
+            if self._hit(path):
+                # resized while this request waited
+                return path
+            render(path)
+            self._added(os.path.getsize(path))
+        return path
+
+    def _hit(self, path):
+        try:
+            used = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        now = time.time()
+        if now - used > TOUCH_INTERVAL:
+            try:
+                os.utime(path, (now, now))
+            except FileNotFoundError:
+                # evicted meanwhile
+                return False
+        return True
+
+    @contextmanager
+    def _single_flight(self, key):
+        locks = os.path.join(self.directory, '.locks')
+        os.makedirs(locks, exist_ok=True)
+        stripe = int(key[:8], 16) % LOCK_STRIPES
+        with open(os.path.join(locks, f'{stripe}.lock'), 'a') as file:
+            # per open file, so threads exclude each other too; closing
+            # the file releases it
+            fcntl.flock(file, fcntl.LOCK_EX)
+            yield
+
+    def _added(self, size):
+        with self.lock:
+            if self.size is not None and self.size + size <= self.max_size \
+                    and time.monotonic() - self.scanned < self.rescan_interval:
+                self.size += size
+                return
+            self.evict()
+
+    def evict(self):
+        """scan the cache, removing the least recently used files"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or entry.name == '.locks':
+                continue
+            for file in os.scandir(entry.path):
+                if file.name.endswith('.tmp'):
+                    # still being written
+                    continue
+                try:
+                    stat = file.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, file.path))
+        size = sum(file_size for _, file_size, _ in files)
+        if size > self.max_size:
+            files.sort()
+            for _, file_size, path in files:
+                if size <= self.max_size * 0.9:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                size -= file_size
+        self.size = size
+        self.scanned = time.monotonic()
+
+
+_cache = None
+
+
+def get_resize_cache():
+    """return the process wide cache of resized images"""
+    global _cache
+    if _cache is None:
+        _cache = ResizeCache(
+            resize_dir(), settings.MOVIE_IMAGE_RESIZE_CACHE_SIZE)
+    return _cache
+
+
+@receiver(setting_changed)
+def reset_resize_cache(setting, **kwargs):
+    global _cache
+    if setting in ('MEDIA_ROOT', 'MOVIE_IMAGE_RESIZE_CACHE_SIZE'):
+        _cache = None
+
+
+def resized_image_response(request, name, width, format):
+    """respond with stored image `name` resized to `width`, in `format`
+
+    Stored images are named by content, so the name, width and format
+    identify the result: it is the cache key and the ETag. With
+    MOVIE_IMAGE_RESIZE_ACCEL_REDIRECT set, nginx sends the file.
+    """
+    key = hashlib.sha256(f'{name}|{width}|{format}'.encode()).hexdigest()
+    etag = f'"{key[:32]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        source = os.path.join(settings.MEDIA_ROOT, name)
+        try:
+            path = get_resize_cache().get(
+                key, FORMATS[format][1],
+                lambda path: render_resized(source, width, format, path))
+        except FileNotFoundError:
+            raise Http404('The movie image is missing.')
+        content_type = f'image/{format}'
+        if settings.MOVIE_IMAGE_RESIZE_ACCEL_REDIRECT:
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = \
+                settings.MOVIE_IMAGE_RESIZE_ACCEL_REDIRECT + \
+                os.path.relpath(path, resize_dir())
+        else:
+            response = FileResponse(
+                open(path, 'rb'), content_type=content_type)
+    response['ETag'] = etag
+    patch_cache_control(
+        response, public=True,
+        max_age=settings.MOVIE_IMAGE_RESIZE_MAX_AGE)
+    return response
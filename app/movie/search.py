@@ -0,0 +1,238 @@
+"""relevance ranked movie search
+
+On postgres, `?q=` matches the trigger-maintained `search_vector`
+(title weighted above storyLine) through its GIN index and orders every
+match by rank in SQL. Once the full text matches are exhausted, titles
+within trigram distance of the query follow, most similar first, so
+typos still find a movie. Similarity is only computed in that second,
+index driven lookup: evaluated on every full text match it costs more
+than the search itself.
+
+Results are paged by a cursor holding the last movie's `(match, rank,
+id)`, `match` being 0 for a full text and 1 for a trigram match, so a
+page is the next slice of the same order whatever came before it.
+
+Other databases use `SearchIndex`, a pure python inverted index and
+trigram matcher built from the queryset, which approximates the same
+matching and ranking.
+"""
+import base64
+import binascii
+import json
+import re
+from collections import defaultdict
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# text search configuration used by the migration's trigger
+SEARCH_CONFIG = 'english'
+# pg_trgm's default `similarity_threshold`
+TRIGRAM_THRESHOLD = 0.3
+# postgres' default weights for the A and B labels
+TITLE_WEIGHT, STORY_WEIGHT = 1.0, 0.4
+
+_WORD = re.compile(r'\w+')
+_STOP_WORDS = frozenset("""
+    a an and are as at be but by for from has he in is it its of on or she
+    that the their there they this to was were will with
+""".split())
+
+
+def _stem(word):
+    """strip the commonest english suffixes"""
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def terms(text):
+    """split `text` into lowercase, stemmed, non stop words"""
+    return [
+        _stem(word) for word in _WORD.findall(text.lower())
+        if word not in _STOP_WORDS
+    ]
+
+
+def trigrams(text):
+    """the trigram set of `text`, as pg_trgm builds it"""
+    grams = set()
+    for word in re.findall(r'[^\W_]+', text.lower()):
+        word = f'  {word} '
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+def similarity(left, right):
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class SearchIndex:
+    """in memory full text and trigram index of movie titles and stories"""
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.titles = {}
+
+    def add(self, pk, title, story_line):
+        for term in terms(story_line or ''):
+            weights = self.postings[term]
+            weights[pk] = max(weights.get(pk, 0), STORY_WEIGHT)
+        for term in terms(title or ''):
+            self.postings[term][pk] = TITLE_WEIGHT
+        self.titles[pk] = trigrams(title or '')
+
+    def ranked(self, text):
+        """return every `(match, score, pk)` of `text`, best first"""
+        scores = defaultdict(float)
+        query_terms = terms(text)
+        for term in query_terms:
+            for pk, weight in self.postings.get(term, {}).items():
+                scores[pk] += weight / len(query_terms)
+        ranked = sorted(
+            ((0, score, pk) for pk, score in scores.items()),
+            key=lambda item: (-item[1], -item[2]))
+
+        query_grams = trigrams(text)
+        similar = [
+            (1, similarity(query_grams, grams), pk)
+            for pk, grams in self.titles.items() if pk not in scores
+        ]
+        ranked += sorted(
+            (item for item in similar if item[1] >= TRIGRAM_THRESHOLD),
+            key=lambda item: (-item[1], -item[2]),
+        )
+        return ranked
+
+    def search(self, text, limit):
+        """return up to `limit` `(pk, score)` pairs, best first"""
+        return [(pk, score) for _, score, pk in self.ranked(text)[:limit]]
+
+
+def _after(position):
+    """filter of the matches ranked below `position`'s rank and id"""
+    _, rank, pk = position
+    return Q(rank__lt=rank) | Q(rank=rank, id__lt=pk)
+
+
+def _search_postgres(queryset, text, limit, after=None):
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    # ts_rank and similarity are real: compared as double precision, a
+    # cursor's rank reads back exactly what the page was ordered by
+    matches = [
+        queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField())),
+        queryset.filter(title__trigram_similar=text).exclude(
+            search_vector=query,
+        ).annotate(
+            rank=Cast(TrigramSimilarity('title', text), FloatField())),
+    ]
+    movies = []
+    for match, ranked in enumerate(matches):
+        if after is not None:
+            if match < after[0]:
+                continue
+            if match == after[0]:
+                ranked = ranked.filter(_after(after))
+        for movie in ranked.order_by('-rank', '-id')[:limit - len(movies)]:
+            movie.match = match
+            movies.append(movie)
+        if len(movies) == limit:
+            break
+    return movies
+
+
+def _search_in_memory(queryset, text, limit, after=None):
+    index = SearchIndex()
+    for pk, title, story_line in queryset.values_list(
+            'pk', 'title', 'storyLine').iterator():
+        index.add(pk, title, story_line)
+    ranked = index.ranked(text)
+    if after is not None:
+        match, rank, pk = after
+        ranked = [
+            item for item in ranked
+            if (item[0], -item[1], -item[2]) > (match, -rank, -pk)
+        ]
+    ranked = ranked[:limit]
+
+    movies = queryset.in_bulk([pk for _, _, pk in ranked])
+    results = []
+    for match, score, pk in ranked:
+        movies[pk].match, movies[pk].rank = match, score
+        results.append(movies[pk])
+    return results
+
+
+def search_movies(queryset, text, limit, after=None):
+    """return the `limit` movies of `queryset` best matching `text`
+
+    Starts after `after`, the `(match, rank, id)` of the last movie of
+    the previous page. Movies come with their `match` and `rank`.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        return _search_postgres(queryset, text, limit, after)
+    return _search_in_memory(queryset, text, limit, after)
+
+
+class SearchListMixin:
+    """answer `list` with relevance ranked pages when `?q=` is given
+
+    Pages follow one another by the `cursor` of `next`; a client goes
+    back by the links it has already followed.
+    """
+    search_param = 'q'
+    search_cursor_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def list(self, request, *args, **kwargs):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return super().list(request, *args, **kwargs)
+
+        page_size = self.paginator.get_page_size(request)
+        movies = search_movies(
+            self.filter_queryset(self.get_queryset()),
+            text,
+            page_size + 1,
+            self.decode_search_cursor(request),
+        )
+        next_link = None
+        if len(movies) > page_size:
+            movies = movies[:page_size]
+            last = movies[-1]
+            next_link = replace_query_param(
+                request.build_absolute_uri(), self.search_cursor_param,
+                self.encode_search_cursor((last.match, last.rank, last.pk)))
+        serializer = self.get_serializer(movies, many=True)
+        return Response({
+            'next': next_link,
+            'previous': None,
+            'results': serializer.data,
+        })
+
+    def encode_search_cursor(self, position):
+        return base64.urlsafe_b64encode(
+            json.dumps(position, separators=(',', ':')).encode()).decode()
+
+    def decode_search_cursor(self, request):
+        encoded = request.query_params.get(self.search_cursor_param)
+        if encoded is None:
+            return None
+        try:
+            match, rank, pk = json.loads(base64.urlsafe_b64decode(encoded))
+            return int(match), float(rank), int(pk)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
@@ -1,9 +1,19 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
 from rest_framework import serializers
 from core.models import (
     Stream,
     Movie,
     Review,
+    RATINGS,
+    rating_count_field,
 )
+from movie.images import FORMATS
+from movie.pagination import MoviePagination
+from movie.prefetch import prefetch_top_movies
+from movie.uploads import HeaderImageField
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -22,24 +32,138 @@ class ReviewDetailSerializer(ReviewSerializer):
         fields = ReviewSerializer.Meta.fields+['user', 'movie']
 
 
+class RatingDistributionField(serializers.Field):
+    """the number of reviews per star rating, from the movie's counters"""
+    values_columns = [rating_count_field(rating) for rating in RATINGS]
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, movie):
+        return {
+            str(rating): getattr(movie, rating_count_field(rating))
+            for rating in RATINGS
+        }
+
+    def from_values(self, row):
+        """render a `.values()` row, for the list fast path"""
+        return {
+            str(rating): row[rating_count_field(rating)]
+            for rating in RATINGS
+        }
+
+
+class MovieImagesField(serializers.Field):
+    """urls of the movie's image and of its resized variants
+
+    Renders `{"original": url, "variants": [{"width", "format", "url"}]}`,
+    the variants widest first, or None without an image. Variants are
+    listed once generated.
+    """
+    values_columns = ['image', 'image_variants']
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, movie):
+        return self.from_values({
+            'image': movie.image.name,
+            'image_variants': movie.image_variants,
+        })
+
+    def from_values(self, row):
+        """render a `.values()` row, for the list fast path"""
+        if not row['image']:
+            return None
+        return {
+            'original': self.url(row['image']),
+            'variants': [
+                {
+                    'width': variant['width'],
+                    'format': variant['format'],
+                    'url': self.url(variant['name']),
+                }
+                for variant in row['image_variants']
+            ],
+        }
+
+    def url(self, name):
+        url = Movie._meta.get_field('image').storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
 class MovieSerializer(serializers.ModelSerializer):
-    """serializer for movies"""
+    """serializer for movies
+
+    Fields in `Meta.optional_fields` are only rendered when asked for,
+    e.g. `?include=rating_distribution`.
+    """
+    rating_distribution = RatingDistributionField()
+    images = MovieImagesField()
 
     class Meta:
         model = Movie
-        fields = ['id', 'title', 'image', 'platform', 'active',
-                  'avg_rating', 'number_rating', 'created']
+        fields = ['id', 'title', 'image', 'images', 'platform', 'active',
+                  'avg_rating', 'number_rating', 'created',
+                  'rating_distribution']
         read_only_fields = ['id']
+        optional_fields = ['rating_distribution']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        include = set()
+        if request is not None:
+            params = getattr(request, 'query_params', request.GET)
+            for value in params.getlist('include'):
+                include.update(value.split(','))
+        for name in getattr(self.Meta, 'optional_fields', []):
+            if name not in include:
+                fields.pop(name, None)
+        return fields
+
+
+class StreamListSerializer(serializers.ListSerializer):
+    """load the nested movies of every stream in a single query"""
+
+    def to_representation(self, data):
+        streams = list(data.all() if hasattr(data, 'all') else data)
+        prefetch_top_movies(streams, settings.STREAM_MOVIES_LIMIT)
+        return super().to_representation(streams)
 
 
 class StreamSerializer(serializers.ModelSerializer):
     """serializer for stream"""
-    movies = MovieSerializer(many=True, read_only=True)
+    movies = MovieSerializer(
+        many=True, read_only=True, source='top_movies')
+    movies_next = serializers.SerializerMethodField()
 
     class Meta:
         model = Stream
-        fields = ['id', 'name', 'about', 'website', 'movies']
+        fields = ['id', 'name', 'about', 'website', 'movies', 'movies_next']
         read_only_fields = ['id']
+        list_serializer_class = StreamListSerializer
+
+    def to_representation(self, instance):
+        prefetch_top_movies([instance], settings.STREAM_MOVIES_LIMIT)
+        return super().to_representation(instance)
+
+    def get_movies_next(self, stream):
+        """link to the movies following the nested ones"""
+        if not stream.has_more_movies:
+            return None
+        url = reverse('movie:stream-movies', args=[stream.pk])
+        request = self.context.get('request')
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        return MoviePagination().link_after(url, stream.top_movies[-1])
 
 
 class MovieDetailSerializer(MovieSerializer):
@@ -48,16 +172,138 @@ class MovieDetailSerializer(MovieSerializer):
 
     class Meta(MovieSerializer.Meta):
         fields = MovieSerializer.Meta.fields+['storyLine', 'review']
+        optional_fields = []
+
+
+class BulkRelatedField(serializers.PrimaryKeyRelatedField):
+    """primary key field of a bulk item, resolved from the objects its
+    list serializer loaded for every item at once"""
+
+    def to_internal_value(self, data):
+        related = getattr(self.root, 'related', {}).get(self.field_name)
+        if related is None:
+            return super().to_internal_value(data)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return related[pk]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class MovieBulkListSerializer(serializers.ListSerializer):
+    """create and update many movies with a few statements
+
+    Items with an `id` update that movie, the others create one. Nothing
+    is written unless every item is valid.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list) and \
+                len(data) > settings.MOVIE_BULK_MAX_ITEMS:
+            raise serializers.ValidationError({
+                'non_field_errors': [
+                    f'Send at most {settings.MOVIE_BULK_MAX_ITEMS} movies.'],
+            })
+        self.related = self.load_related(data)
+        items = super().to_internal_value(data)
+
+        ids = [item['id'] for item in items if 'id' in item]
+        self.movies = Movie.objects.in_bulk(ids)
+        errors, seen = [], set()
+        for item in items:
+            pk = item.get('id')
+            if pk is None:
+                errors.append({})
+            elif pk not in self.movies:
+                errors.append({'id': ['Movie not found.']})
+            elif pk in seen:
+                errors.append({'id': ['Movie sent more than once.']})
+            else:
+                errors.append({})
+            seen.add(pk)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def load_related(self, data):
+        """the objects every item's related fields name, a query each"""
+        related = {}
+        for name, field in self.child.fields.items():
+            if not isinstance(field, BulkRelatedField):
+                continue
+            pks = set()
+            for item in data if isinstance(data, list) else []:
+                try:
+                    pks.add(int(item[name]))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            related[name] = field.get_queryset().in_bulk(pks)
+        return related
+
+    def create(self, validated_data):
+        """write every item in one transaction, return them in order"""
+        batch_size = settings.MOVIE_BULK_BATCH_SIZE
+        created, updated, results = [], [], []
+        fields = set()
+        for attrs in validated_data:
+            pk = attrs.pop('id', None)
+            if pk is None:
+                movie = Movie(**attrs)
+                created.append(movie)
+            else:
+                movie = self.movies[pk]
+                attrs.pop('user', None)
+                for name, value in attrs.items():
+                    setattr(movie, name, value)
+                # as the model's pre_save signal does for single saves
+                movie.version = F('version') + 1
+                fields.update(attrs)
+                updated.append(movie)
+            results.append(movie)
+
+        with transaction.atomic():
+            Movie.objects.bulk_create(created, batch_size=batch_size)
+            if updated:
+                Movie.objects.bulk_update(
+                    updated, [*fields, 'version'], batch_size=batch_size)
+        for movie in updated:
+            del movie.version
+        return results
+
+
+class MovieBulkSerializer(serializers.ModelSerializer):
+    """one movie of a bulk write, created unless it has an `id`"""
+    id = serializers.IntegerField(required=False)
+    platform = BulkRelatedField(
+        queryset=Stream.objects.all(), allow_null=True, required=False)
+
+    class Meta:
+        model = Movie
+        fields = ['id', 'title', 'storyLine', 'platform', 'active']
+        list_serializer_class = MovieBulkListSerializer
 
 
 class MovieImageSerializer(serializers.ModelSerializer):
     """serializer for uploading image to movie"""
+    image = HeaderImageField(required=True)
+
     class Meta:
         model = Movie
         fields = ['id', 'image']
         read_only_field = ['id']
-        extra_kwargs = {
-            'image': {
-                'required': 'True'
-            }
-        }
+
+
+class ResizedImageSerializer(serializers.Serializer):
+    """query parameters of a resized movie image"""
+    w = serializers.IntegerField(min_value=1)
+    fmt = serializers.ChoiceField(choices=list(FORMATS), default='jpeg')
+
+    def validate_w(self, value):
+        limit = settings.MOVIE_IMAGE_RESIZE_MAX_WIDTH
+        if value > limit:
+            raise serializers.ValidationError(
+                f'Ensure this value is less than or equal to {limit}.')
+        return value
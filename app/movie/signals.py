@@ -0,0 +1,84 @@
+"""keep movie versions and cached responses in step with the catalog"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.expressions import Combinable
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.models import (
+    Stream,
+    Movie,
+    Review,
+)
+from core.storage import acquire, release
+from movie.cache import invalidate
+
+
+@receiver([post_save, post_delete], sender=Stream)
+def stream_changed(sender, instance, **kwargs):
+    invalidate('streams', f'stream:{instance.pk}')
+
+
+@receiver(pre_save, sender=Movie)
+def bump_movie_version(sender, instance, **kwargs):
+    if not instance._state.adding:
+        # increment in the UPDATE itself so a stale instance can never
+        # write back a version another change already used
+        instance.version = F('version') + 1
+
+
+@receiver(post_save, sender=Movie)
+def reload_movie_version(sender, instance, **kwargs):
+    if isinstance(instance.__dict__.get('version'), Combinable):
+        # drop the expression; the field reloads on next access
+        del instance.__dict__['version']
+
+
+@receiver(pre_save, sender=Movie)
+def remember_movie_image(sender, instance, update_fields=None, **kwargs):
+    instance._stored_image = None
+    # the upload the field saves next, kept to write it again should a
+    # release unlink the stored copy before it is referenced
+    instance._image_upload = (
+        instance.image.file
+        if instance.image and not instance.image._committed else None)
+    if not instance._state.adding and (
+            update_fields is None or 'image' in update_fields):
+        instance._stored_image = Movie.objects.filter(
+            pk=instance.pk).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Movie)
+def count_movie_image(sender, instance, **kwargs):
+    old = getattr(instance, '_stored_image', None)
+    new = instance.image.name or None
+    if new != old:
+        # counts and files change together or not at all
+        with transaction.atomic(savepoint=False):
+            acquire(new, instance.image.storage,
+                    getattr(instance, '_image_upload', None))
+            release(old, instance.image.storage)
+
+
+@receiver(post_delete, sender=Movie)
+def release_movie_image(sender, instance, **kwargs):
+    release(instance.image.name, instance.image.storage)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    # here rather than in Review.delete so cascades are counted too;
+    # saves update the rating in Review.save
+    Movie.objects.update_rating(instance.movie_id, removed=instance.rating)
+
+
+@receiver([post_save, post_delete], sender=Movie)
+def movie_changed(sender, instance, **kwargs):
+    invalidate('movies', f'movie:{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=Review)
+def review_changed(sender, instance, **kwargs):
+    # every write updates the movie's rating, which lists show too
+    invalidate('movies', f'review:{instance.pk}',
+               f'movie:{instance.movie_id}')
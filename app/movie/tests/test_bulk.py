@@ -0,0 +1,177 @@
+"""Test creating and updating movies in bulk"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Stream,
+    Movie,
+)
+
+BULK_URL = reverse('movie:movie-bulk')
+
+
+class BulkMovieApiTests(TestCase):
+    """Test the movie bulk endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.platform = Stream.objects.create(
+            name='Netflix', about='about', website='https://netflix.com')
+        self.movie = Movie.objects.create(
+            title='old title', storyLine='old story', active=True)
+
+    def test_bulk_requires_admin(self):
+        """Test non staff users can not write in bulk"""
+        user = get_user_model().objects.create_user(email='u@example.com')
+        self.client.force_authenticate(user)
+
+        res = self.client.post(BULK_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_create_and_update(self):
+        """Test new items are created and items with an id updated"""
+        version = self.movie.version
+        payload = [
+            {'title': 'new 1', 'storyLine': 'story 1',
+             'platform': self.platform.pk},
+            {'id': self.movie.pk, 'title': 'renamed',
+             'storyLine': 'new story', 'active': False},
+            {'title': 'new 2', 'storyLine': 'story 2'},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual(
+            [item['status'] for item in results], [201, 200, 201])
+        self.assertEqual(results[1]['id'], self.movie.pk)
+        created = Movie.objects.get(pk=results[0]['id'])
+        self.assertEqual(created.title, 'new 1')
+        self.assertEqual(created.platform, self.platform)
+        self.assertEqual(created.user, self.user)
+        self.assertEqual(Movie.objects.get(pk=results[2]['id']).title,
+                         'new 2')
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.title, 'renamed')
+        self.assertFalse(self.movie.active)
+        self.assertIsNone(self.movie.user)
+        self.assertEqual(self.movie.version, version + 1)
+
+    def test_bulk_errors_per_item(self):
+        """Test invalid items are reported in place and nothing written"""
+        payload = [
+            {'title': 'valid', 'storyLine': 'story'},
+            {'storyLine': 'no title'},
+            {'id': 0, 'title': 'missing', 'storyLine': 'story'},
+            {'id': self.movie.pk, 'title': 'a', 'storyLine': 'b'},
+            {'id': self.movie.pk, 'title': 'c', 'storyLine': 'd'},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('title', res.data[1])
+        self.assertEqual(len(res.data), 5)
+        self.assertEqual(Movie.objects.count(), 1)
+
+        payload = payload[:1] + payload[2:4]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, [{}, {'id': ['Movie not found.']}, {}])
+
+        payload = [payload[2], payload[2]]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.data[1], {'id': ['Movie sent more than once.']})
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.title, 'old title')
+
+    @override_settings(MOVIE_BULK_MAX_ITEMS=2)
+    def test_bulk_max_items(self):
+        """Test requests with too many items are rejected"""
+        payload = [{'title': 'movie', 'storyLine': 'story'}] * 3
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', res.data)
+
+    @override_settings(MOVIE_BULK_BATCH_SIZE=10)
+    def test_bulk_writes_in_batches(self):
+        """Test rows are written a batch per statement"""
+        movies = [
+            Movie.objects.create(title=f'movie {i}', storyLine='story')
+            for i in range(15)
+        ]
+        payload = [
+            {'title': f'new {i}', 'storyLine': 'story'} for i in range(25)
+        ] + [
+            {'id': movie.pk, 'title': 'renamed', 'storyLine': 'story'}
+            for movie in movies
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        writes = [
+            query['sql'].split()[0] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE'))
+        ]
+        self.assertEqual(writes, ['INSERT'] * 3 + ['UPDATE'] * 2)
+        self.assertEqual(
+            Movie.objects.filter(title='renamed').count(), 15)
+        self.assertEqual(Movie.objects.filter(
+            title__startswith='new ', user=self.user).count(), 25)
+
+    def test_bulk_platforms_one_query(self):
+        """Test the items' platforms are loaded with one query"""
+        platforms = [self.platform] + [
+            Stream.objects.create(
+                name=f'stream {i}', about='about', website='https://a.com')
+            for i in range(3)
+        ]
+        for count in (5, 25):
+            payload = [
+                {'title': f'movie {i}', 'storyLine': 'story',
+                 'platform': platforms[i % len(platforms)].pk}
+                for i in range(count)
+            ]
+
+            # the platforms, then the insert within its savepoint
+            with self.assertNumQueries(4):
+                res = self.client.post(BULK_URL, payload, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            Movie.objects.filter(platform=platforms[1]).count(), 1 + 6)
+
+    def test_bulk_unknown_platform(self):
+        """Test an unknown or malformed platform is reported in place"""
+        payload = [
+            {'title': 'a', 'storyLine': 'story', 'platform': 0},
+            {'title': 'b', 'storyLine': 'story', 'platform': 'x'},
+            {'title': 'c', 'storyLine': 'story',
+             'platform': str(self.platform.pk)},
+            {'title': 'd', 'storyLine': 'story', 'platform': None},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('does not exist', str(res.data[0]['platform']))
+        self.assertIn('Incorrect type', str(res.data[1]['platform']))
+        self.assertEqual(res.data[2:], [{}, {}])
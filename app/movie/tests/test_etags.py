@@ -0,0 +1,137 @@
+"""Test conditional GETs on movie detail and review lists"""
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Movie,
+    Review,
+)
+from movie.cache import get_response_cache
+
+
+def detail_url(movie_id):
+    """create and return a movie detail url"""
+    return reverse('movie:movie-detail', args=[movie_id])
+
+
+def review_list_url(movie_id):
+    """create and return a review list url"""
+    return reverse('movie:review-list', args=[movie_id])
+
+
+class ETagTests(TestCase):
+    """Test ETag and If-None-Match handling"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.movie = Movie.objects.create(
+            title='sample title', storyLine='sample storyLine')
+
+    def test_matching_etag_not_modified(self):
+        """Test a matching If-None-Match gets 304 after one query"""
+        etag = self.client.get(detail_url(self.movie.id))['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                detail_url(self.movie.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(res.content)
+
+    def test_movie_change_changes_etag(self):
+        """Test editing the movie issues a new ETag"""
+        etag = self.client.get(detail_url(self.movie.id))['ETag']
+        self.movie.title = 'new title'
+        self.movie.save()
+
+        res = self.client.get(
+            detail_url(self.movie.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_stale_instance_does_not_reuse_version(self):
+        """Test saving a stale instance still moves the version forward"""
+        stale = Movie.objects.get(pk=self.movie.pk)
+        Review.objects.create(user=self.user, movie=self.movie, rating=4)
+        version = Movie.objects.get(pk=self.movie.pk).version
+
+        stale.save()
+
+        self.assertEqual(stale.version, version + 1)
+
+    def test_review_changes_review_list_etag(self):
+        """Test a new review invalidates the review list ETag"""
+        url = review_list_url(self.movie.id)
+        etag = self.client.get(url)['ETag']
+        Review.objects.create(user=self.user, movie=self.movie, rating=4)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_review_list_pages_have_own_etag(self):
+        """Test each page of the review list is tagged separately"""
+        url = review_list_url(self.movie.id)
+        first = self.client.get(url)['ETag']
+        second = self.client.get(url, {'page_size': 1})['ETag']
+
+        self.assertNotEqual(first, second)
+
+    def test_missing_movie_not_found(self):
+        """Test an unknown movie is still a 404"""
+        res = self.client.get(detail_url(0), HTTP_IF_NONE_MATCH='"x"')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(RESPONSE_CACHE={
+    'ENABLED': True, 'BACKEND': 'core.cache.LRUCache'})
+class CachedETagTests(TestCase):
+    """Test ETags agree with the bodies of the response cache"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.movie = Movie.objects.create(
+            title='sample title', storyLine='sample storyLine')
+        get_response_cache().clear()
+
+    def write_elsewhere(self):
+        """add a review, as another worker whose scope bumps go unseen"""
+        with self.captureOnCommitCallbacks():
+            Review.objects.create(user=self.user, movie=self.movie, rating=4)
+
+    def test_detail_body_follows_etag(self):
+        """Test a new ETag never comes with a body cached before it"""
+        etag = self.client.get(detail_url(self.movie.id))['ETag']
+        self.write_elsewhere()
+
+        res = self.client.get(
+            detail_url(self.movie.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(len(res.data['review']), 1)
+        self.assertEqual(res.data['number_rating'], 1)
+
+    def test_review_list_body_follows_etag(self):
+        """Test the review list is not served from before its ETag"""
+        url = review_list_url(self.movie.id)
+        self.client.get(url)
+        self.write_elsewhere()
+
+        res = self.client.get(url)
+
+        self.assertEqual(len(res.data['results']), 1)
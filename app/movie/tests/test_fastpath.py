@@ -0,0 +1,90 @@
+"""Test the fast path list serializer matches the regular one"""
+
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import (
+    Movie,
+    Stream,
+)
+from movie.fastpath import FastReader, UnsupportedSerializer
+from movie.serializers import (
+    MovieSerializer,
+    MovieDetailSerializer,
+)
+
+
+MOVIE_URL = reverse('movie:movie-list')
+
+
+class FastPathTests(TestCase):
+    """Test the `.values()` fast path"""
+
+    def setUp(self):
+        platform = Stream.objects.create(
+            name='Netflix', about='about', website='http://www.netflix.com')
+        Movie.objects.create(
+            title='with image', storyLine='storyLine', platform=platform,
+            image='uploads/movie/poster.jpg', avg_rating=Decimal('4.25'),
+            number_rating=3)
+        Movie.objects.create(
+            title='no image', storyLine='storyLine', active=False,
+            avg_rating=Decimal('0'))
+        request = APIRequestFactory().get(MOVIE_URL)
+        self.context = {'request': Request(request)}
+
+    def test_rendered_bytes_identical(self):
+        """Test fast rows render byte for byte like MovieSerializer"""
+        movies = Movie.objects.order_by('-id')
+        reader = FastReader(MovieSerializer, self.context)
+
+        fast = reader.to_representation(movies.values(*reader.columns))
+        slow = MovieSerializer(movies, many=True, context=self.context).data
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(fast), renderer.render(slow))
+
+    def test_list_endpoint_matches_serializer(self):
+        """Test the list endpoint output is unchanged"""
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123'))
+
+        res = client.get(MOVIE_URL)
+        movies = Movie.objects.order_by('-id')
+        context = {'request': res.wsgi_request}
+        expected = MovieSerializer(movies, many=True, context=context).data
+
+        self.assertEqual(
+            JSONRenderer().render(res.data['results']),
+            JSONRenderer().render(expected))
+
+    def test_rating_distribution_identical(self):
+        """Test the optional rating distribution renders identically"""
+        Movie.objects.update(rating_count_2=1, rating_count_5=4)
+        request = APIRequestFactory().get(
+            MOVIE_URL, {'include': 'rating_distribution'})
+        context = {'request': Request(request)}
+        movies = Movie.objects.order_by('-id')
+        reader = FastReader(MovieSerializer, context)
+
+        fast = reader.to_representation(movies.values(*reader.columns))
+        slow = MovieSerializer(movies, many=True, context=context).data
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(fast), renderer.render(slow))
+        self.assertEqual(
+            fast[0]['rating_distribution'],
+            {'1': 0, '2': 1, '3': 0, '4': 0, '5': 4})
+
+    def test_nested_serializer_unsupported(self):
+        """Test serializers with nested fields are refused"""
+        with self.assertRaises(UnsupportedSerializer):
+            FastReader(MovieDetailSerializer, self.context)
@@ -0,0 +1,192 @@
+"""Test filtering and ordering the movie list"""
+from decimal import Decimal
+from itertools import product
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Stream,
+    Movie,
+)
+
+MOVIES_URL = reverse('movie:movie-list')
+
+FILTERS = [
+    {},
+    {'active': 'true'},
+    {'platform': None},
+    {'platform': None, 'active': 'true'},
+    {'avg_rating__gte': '2.5'},
+    {'created__gte': '2020-01-01T00:00:00Z'},
+]
+ORDERINGS = [
+    '-id', 'id', '-avg_rating', 'avg_rating', '-number_rating',
+    'number_rating', '-created', 'created',
+]
+
+
+def create_stream(**params):
+    defaults = {
+        'name': 'sample name',
+        'about': 'sample about',
+        'website': 'https://www.netflix.com',
+    }
+    defaults.update(params)
+    return Stream.objects.create(**defaults)
+
+
+class MovieFilterTests(TestCase):
+    """Test the whitelisted filters and orderings"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.stream = create_stream()
+        self.other = create_stream(name='other')
+        for i, (platform, active) in enumerate(
+                product([self.stream, self.other, None], [True, False])):
+            Movie.objects.create(
+                title=f'movie {i}', storyLine='story', platform=platform,
+                active=active, avg_rating=Decimal(i % 4) + Decimal('0.5'),
+                number_rating=i * 7 % 5)
+
+    def titles(self, **params):
+        res = self.client.get(MOVIES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [movie['title'] for movie in res.data['results']]
+
+    def expected(self, *ordering, **filters):
+        return list(Movie.objects.filter(**filters).order_by(
+            *ordering).values_list('title', flat=True))
+
+    def test_filter_platform_and_active(self):
+        """Test active movies of one platform are returned"""
+        self.assertEqual(
+            self.titles(platform=self.stream.id, active='true'),
+            self.expected('-id', platform=self.stream, active=True))
+
+    def test_filter_ranges(self):
+        """Test range filters on rating and count"""
+        self.assertEqual(
+            self.titles(avg_rating__gte='1.5', number_rating__lte=2),
+            self.expected(
+                '-id', avg_rating__gte=Decimal('1.5'), number_rating__lte=2))
+
+    def test_ordering(self):
+        """Test ordering by rating with the id tie-breaker"""
+        self.assertEqual(
+            self.titles(ordering='-avg_rating'),
+            self.expected('-avg_rating', '-id'))
+        self.assertEqual(
+            self.titles(ordering='number_rating'),
+            self.expected('number_rating', 'id'))
+
+    def test_ordering_pages(self):
+        """Test paging through a rating ordering visits every movie once"""
+        titles, url = [], MOVIES_URL + '?ordering=-avg_rating&page_size=2'
+        while url:
+            res = self.client.get(url)
+            titles += [movie['title'] for movie in res.data['results']]
+            url = res.data['next']
+
+        self.assertEqual(titles, self.expected('-avg_rating', '-id'))
+
+    def test_unsupported_ordering_ignored(self):
+        """Test fields outside the whitelist and extra fields are dropped"""
+        self.assertEqual(
+            self.titles(ordering='title'), self.expected('-id'))
+        self.assertEqual(
+            self.titles(ordering='created,-avg_rating'),
+            self.expected('created', 'id'))
+
+    def test_invalid_filter_value(self):
+        """Test a malformed filter value is a bad request"""
+        res = self.client.get(MOVIES_URL, {'avg_rating__gte': 'high'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('avg_rating__gte', res.data)
+
+
+def expected_index(filters, ordering):
+    """the index a page of `filters` and `ordering` should walk"""
+    field = ordering.lstrip('-')
+    platform = 'platform' in filters
+    if field == 'id':
+        return 'movie_platform_id_idx' if platform else 'core_movie_pkey'
+    if field == 'avg_rating' and 'active' in filters:
+        return 'movie_active_plat_rating_idx' if platform \
+            else 'movie_active_rating_idx'
+    name = {'avg_rating': 'rating'}.get(field, field)
+    return f'movie_{"plat_" if platform else ""}{name}_idx'
+
+
+class MovieFilterIndexTests(TestCase):
+    """Test every supported filter and ordering walks its index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # a catalog large enough, and analyzed, for the planner to prefer
+        # the indexes over a scan and sort
+        streams = Stream.objects.bulk_create(
+            Stream(name=f'stream {i}', about='about',
+                   website='https://www.netflix.com') for i in range(200))
+        cls.stream = streams[0]
+        Movie.objects.bulk_create(
+            Movie(title=f'movie {i}', storyLine='story',
+                  platform=streams[i % len(streams)], active=i % 7 != 0,
+                  avg_rating=Decimal(i * 37 % 500) / 100,
+                  number_rating=i * 13 % 1000)
+            for i in range(20000))
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Movie._meta.db_table}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def movie_query(self, url, params=None):
+        """return the sql selecting the page of movies"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        selects = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and
+            'FROM "core_movie"' in query['sql']
+        ]
+        self.assertEqual(len(selects), 1)
+        return selects[0], res.data['next']
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def test_index_scans(self):
+        """Test first and following pages walk the expected index"""
+        for filters, ordering in product(FILTERS, ORDERINGS):
+            params = dict(filters, ordering=ordering, page_size=1)
+            if 'platform' in params:
+                params['platform'] = self.stream.id
+            index = expected_index(filters, ordering)
+            with self.subTest(**params):
+                sql, next_url = self.movie_query(MOVIES_URL, params)
+                plan = self.explain(sql)
+                self.assertIn(f' using {index} ', plan)
+                self.assertNotIn('Sort', plan)
+
+                sql, _ = self.movie_query(next_url)
+                plan = self.explain(sql)
+                self.assertIn(f' using {index} ', plan)
+                self.assertNotIn('Sort', plan)
@@ -0,0 +1,212 @@
+"""Test resized variants of movie images"""
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Movie
+from movie import images
+
+MOVIES_URL = reverse('movie:movie-list')
+
+
+def image_file(size):
+    file = tempfile.NamedTemporaryFile(suffix='.jpg')
+    Image.new('RGB', size, 'red').save(file, format='JPEG')
+    file.seek(0)
+    return file
+
+
+class MediaRootMixin:
+    """write media into a temporary MEDIA_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(
+            MEDIA_ROOT=self.media_root,
+            MOVIE_IMAGE_VARIANT_WIDTHS=[100, 400],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def save_original(self, name, size, mode='RGB', format='JPEG',
+                      color='red', **options):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new(mode, size, color).save(path, format=format, **options)
+        return name
+
+
+class RenderVariantsTests(MediaRootMixin, TestCase):
+    """Test rendering the variants of one image"""
+
+    def test_render_variants(self):
+        """Test every width is written in every format"""
+        name = self.save_original('uploads/movie/abc.jpg', (1000, 500))
+
+        variants = images.render_variants(
+            self.media_root, name, [100, 400], ['webp', 'jpeg'])
+
+        self.assertEqual(
+            [(v['width'], v['format'], v['name']) for v in variants], [
+                (400, 'webp', 'uploads/movie/abc/400.webp'),
+                (400, 'jpeg', 'uploads/movie/abc/400.jpg'),
+                (100, 'webp', 'uploads/movie/abc/100.webp'),
+                (100, 'jpeg', 'uploads/movie/abc/100.jpg'),
+            ])
+        for variant in variants:
+            with Image.open(
+                    os.path.join(self.media_root, variant['name'])) as image:
+                self.assertEqual(
+                    image.size, (variant['width'], variant['width'] // 2))
+                self.assertEqual(
+                    image.format,
+                    {'webp': 'WEBP', 'jpeg': 'JPEG'}[variant['format']])
+        self.assertEqual(
+            [n for n in os.listdir(os.path.dirname(
+                os.path.join(self.media_root, variants[0]['name'])))
+             if n.endswith('.tmp')], [])
+
+    def test_render_variants_never_upscales(self):
+        """Test widths beyond the original collapse to its own width"""
+        name = self.save_original(
+            'uploads/movie/small.png', (150, 30), mode='RGBA', format='PNG',
+            color=(255, 0, 0, 0))
+
+        variants = images.render_variants(
+            self.media_root, name, [100, 400], ['webp', 'jpeg'])
+
+        self.assertEqual(
+            [v['width'] for v in variants], [150, 150, 100, 100])
+        with Image.open(os.path.join(
+                self.media_root, 'uploads/movie/small/150.webp')) as image:
+            self.assertEqual(image.mode, 'RGBA')
+        with Image.open(os.path.join(
+                self.media_root, 'uploads/movie/small/150.jpg')) as image:
+            self.assertEqual(image.mode, 'RGB')
+
+    def test_render_variants_rotated(self):
+        """Test a jpeg stored on its side is scaled by its upright width"""
+        exif = Image.Exif()
+        exif[images.ORIENTATION] = 6
+        name = self.save_original(
+            'uploads/movie/rotated.jpg', (4000, 1000), exif=exif)
+
+        variants = images.render_variants(
+            self.media_root, name, [320, 640], ['jpeg'])
+
+        self.assertEqual([v['width'] for v in variants], [640, 320])
+        with Image.open(os.path.join(
+                self.media_root, 'uploads/movie/rotated/640.jpg')) as image:
+            self.assertEqual(image.size, (640, 2560))
+
+
+class UploadVariantsTests(MediaRootMixin, TestCase):
+    """Test variants made for uploaded images"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                email='admin@example.com', password='testpass123'))
+        self.movie = Movie.objects.create(title='movie', storyLine='story')
+
+    def upload(self, size):
+        url = reverse('movie:movie-upload-image', args=[self.movie.pk])
+        with image_file(size) as file, \
+                self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, {'image': file}, format='multipart')
+
+    def test_upload_generates_variants(self):
+        """Test an upload is resized and its variants listed"""
+        res = self.upload((800, 600))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.movie.refresh_from_db()
+        self.assertEqual(len(self.movie.image_variants), 4)
+
+        res = self.client.get(
+            reverse('movie:movie-detail', args=[self.movie.pk]))
+
+        images_data = res.data['images']
+        self.assertTrue(images_data['original'].startswith('http://'))
+        self.assertTrue(images_data['original'].endswith('.jpg'))
+        self.assertEqual(
+            [(v['width'], v['format']) for v in images_data['variants']],
+            [(400, 'webp'), (400, 'jpeg'), (100, 'webp'), (100, 'jpeg')])
+        for variant in self.movie.image_variants:
+            self.assertTrue(os.path.exists(
+                os.path.join(self.media_root, variant['name'])))
+
+        res = self.client.get(MOVIES_URL)
+
+        self.assertEqual(res.data['results'][0]['images'], images_data)
+
+    def test_new_upload_replaces_variants(self):
+        """Test variants of a replaced image are no longer listed"""
+        self.upload((800, 600))
+        self.movie.refresh_from_db()
+        old = self.movie.image_variants
+
+        self.upload((300, 300))
+
+        self.movie.refresh_from_db()
+        self.assertNotEqual(self.movie.image_variants, old)
+        self.assertEqual(
+            [v['width'] for v in self.movie.image_variants],
+            [300, 300, 100, 100])
+
+    def test_same_image_reuses_variants(self):
+        """Test a movie given another's image reuses its variants"""
+        self.upload((800, 600))
+        self.movie.refresh_from_db()
+        other = self.movie
+        self.movie = Movie.objects.create(title='other', storyLine='story')
+
+        with patch('movie.images.render_variants') as render:
+            self.upload((800, 600))
+
+        render.assert_not_called()
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.image.name, other.image.name)
+        self.assertEqual(self.movie.image_variants, other.image_variants)
+
+    def test_movie_without_image(self):
+        """Test a movie without an image renders no images"""
+        res = self.client.get(MOVIES_URL)
+
+        self.assertIsNone(res.data['results'][0]['images'])
+
+
+class VariantPoolTests(MediaRootMixin, TransactionTestCase):
+    """Test resizing off the request, in the process pool"""
+
+    @override_settings(MOVIE_IMAGE_WORKERS=1)
+    def test_generate_variants_in_pool(self):
+        """Test the pool resizes and the movie records the variants"""
+        self.addCleanup(setattr, images, '_executor', None)
+        name = self.save_original('uploads/movie/pooled.jpg', (500, 250))
+        movie = Movie.objects.create(
+            title='movie', storyLine='story', image=name)
+
+        images.generate_variants(movie)
+
+        deadline = time.monotonic() + 30
+        while not Movie.objects.get(pk=movie.pk).image_variants:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+        images.get_executor().shutdown()
+        self.assertEqual(
+            len(Movie.objects.get(pk=movie.pk).image_variants), 4)
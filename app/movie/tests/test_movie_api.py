@@ -91,7 +91,7 @@ class PrivateMovieApiTests(TestCase):
         movies = Movie.objects.all().order_by('-id')
         serializer = MovieSerializer(movies, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     # def test_movie_list_limited_to_user(self):
     #     """Test list of movie is limited to user"""
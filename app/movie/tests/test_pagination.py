@@ -0,0 +1,134 @@
+"""Test for keyset pagination of the list endpoints"""
+
+from base64 import b64encode
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Movie,
+    Review,
+)
+from movie.pagination import KeysetCursorPagination
+
+
+MOVIE_URL = reverse('movie:movie-list')
+USER_REVIEW_URL = reverse('movie:user-review-detail')
+
+
+def review_list_url(movie_id):
+    """create and return a review list url"""
+    return reverse('movie:review-list', args=[movie_id])
+
+
+def create_movie(**params):
+    """create and return a sample movie"""
+    defaults = {
+        'title': 'sample title',
+        'storyLine': 'sample storyLine',
+    }
+    defaults.update(params)
+    return Movie.objects.create(**defaults)
+
+
+def walk(client, url):
+    """follow `next` links and return every page"""
+    pages = []
+    while url:
+        res = client.get(url)
+        assert res.status_code == status.HTTP_200_OK, res.data
+        pages.append(res.data)
+        url = res.data['next']
+    return pages
+
+
+class PaginationTests(TestCase):
+    """Test cursor pagination of movies and reviews"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def test_movie_pages_cover_every_movie_once(self):
+        """Test walking movie pages returns each movie once, newest first"""
+        ids = [create_movie(title=f'movie {i}').id for i in range(7)]
+
+        pages = walk(self.client, f'{MOVIE_URL}?page_size=3')
+
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 1])
+        seen = [m['id'] for page in pages for m in page['results']]
+        self.assertEqual(seen, sorted(ids, reverse=True))
+
+    def test_movie_previous_link(self):
+        """Test the previous link returns the preceding page"""
+        for i in range(5):
+            create_movie(title=f'movie {i}')
+
+        first = self.client.get(f'{MOVIE_URL}?page_size=2').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+
+        self.assertIsNone(first['previous'])
+        self.assertEqual(back['results'], first['results'])
+
+    def test_page_size_capped(self):
+        """Test page size can not exceed the configured maximum"""
+        for i in range(4):
+            create_movie(title=f'movie {i}')
+
+        with patch.object(KeysetCursorPagination, 'max_page_size', 2):
+            res = self.client.get(f'{MOVIE_URL}?page_size=50')
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor returns not found"""
+        cursor = b64encode(urlencode({'p': '["abc"]'}).encode()).decode()
+        res = self.client.get(MOVIE_URL, {'cursor': cursor})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_review_pages_ordered_by_created_then_id(self):
+        """Test reviews sharing a timestamp are paged without gaps"""
+        movie = create_movie()
+        users = [
+            get_user_model().objects.create_user(
+                email=f'user{i}@example.com', password='testpass123')
+            for i in range(5)
+        ]
+        reviews = [
+            Review.objects.create(user=user, movie=movie, rating=3)
+            for user in users
+        ]
+        same_time = timezone.now()
+        Review.objects.filter(
+            id__in=[r.id for r in reviews[:3]]).update(created=same_time)
+
+        pages = walk(self.client, f'{review_list_url(movie.id)}?page_size=2')
+
+        seen = [r['id'] for page in pages for r in page['results']]
+        expected = Review.objects.filter(movie=movie).order_by(
+            '-created', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_user_reviews_paginated(self):
+        """Test the authenticated user's reviews are paginated"""
+        for i in range(3):
+            Review.objects.create(
+                user=self.user, movie=create_movie(), rating=4)
+
+        res = self.client.get(f'{USER_REVIEW_URL}?page_size=2')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
@@ -0,0 +1,121 @@
+"""Test the movie api runs a constant number of queries per endpoint"""
+
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Movie,
+    Review,
+    Stream,
+)
+from movie.prefetch import plan_queryset
+from movie.serializers import (
+    MovieDetailSerializer,
+    StreamSerializer,
+)
+
+
+def create_user(**params):
+    """create and return a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class PrefetchPlanTests(TestCase):
+    """Test the planned related lookups"""
+
+    def test_movie_detail_plan(self):
+        """Test reviews are prefetched together with their users"""
+        queryset = plan_queryset(Movie.objects.all(), MovieDetailSerializer)
+
+        lookup, = queryset._prefetch_related_lookups
+        self.assertEqual(lookup.prefetch_through, 'review')
+        self.assertEqual(lookup.queryset.query.select_related, {'user': {}})
+        self.assertFalse(queryset.query.select_related)
+
+    def test_stream_plan(self):
+        """Test nested movies are left to the windowed stream query"""
+        queryset = plan_queryset(Stream.objects.all(), StreamSerializer)
+
+        self.assertFalse(queryset._prefetch_related_lookups)
+        self.assertFalse(queryset.query.select_related)
+
+
+class QueryCountTests(TestCase):
+    """Test query counts stay flat as rows are added"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+        self.streams = [
+            Stream.objects.create(
+                name=f'stream {i}', about='about',
+                website='http://www.netflix.com')
+            for i in range(3)
+        ]
+        self.movies = [
+            Movie.objects.create(
+                title=f'movie {i}', storyLine='storyLine',
+                platform=self.streams[i % 3])
+            for i in range(6)
+        ]
+        self.movie = self.movies[0]
+        for i in range(5):
+            reviewer = create_user(
+                email=f'reviewer{i}@example.com', password='testpass123')
+            Review.objects.create(
+                user=reviewer, movie=self.movie, rating=i + 1)
+        self.review = Review.objects.filter(movie=self.movie).first()
+        Review.objects.create(user=self.user, movie=self.movies[1], rating=3)
+        Review.objects.create(user=self.user, movie=self.movies[2], rating=3)
+
+    def assertQueries(self, url, count):
+        """assert a GET on `url` succeeds with `count` queries"""
+        with self.assertNumQueries(count):
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_movie_list(self):
+        """Test movie list runs a single query"""
+        self.assertQueries(reverse('movie:movie-list'), 1)
+
+    def test_movie_detail(self):
+        """Test movie detail loads reviews and reviewers in one query"""
+        # etag version lookup, movie, reviews joined with their users
+        self.assertQueries(
+            reverse('movie:movie-detail', args=[self.movie.id]), 3)
+
+    def test_stream_list(self):
+        """Test stream list loads every nested movie in one query"""
+        self.assertQueries(reverse('movie:stream-list'), 2)
+
+    def test_stream_detail(self):
+        """Test stream detail loads its movies in one query"""
+        self.assertQueries(
+            reverse('movie:stream-detail', args=[self.streams[0].id]), 2)
+
+    def test_stream_movies(self):
+        """Test a stream's movie listing runs two queries"""
+        self.assertQueries(
+            reverse('movie:stream-movies', args=[self.streams[0].id]), 2)
+
+    def test_review_list(self):
+        """Test review list joins the reviewers"""
+        # etag version lookup, reviews joined with their users
+        self.assertQueries(
+            reverse('movie:review-list', args=[self.movie.id]), 2)
+
+    def test_review_detail(self):
+        """Test review detail joins the reviewer"""
+        self.assertQueries(
+            reverse('movie:review-detail', args=[self.review.id]), 1)
+
+    def test_user_reviews(self):
+        """Test the user's reviews run a single query"""
+        self.assertQueries(reverse('movie:user-review-detail'), 1)
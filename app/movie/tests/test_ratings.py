@@ -0,0 +1,294 @@
+"""Test the rating aggregates of movies"""
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Movie,
+    Review,
+    RATINGS,
+    rating_count_field,
+)
+
+MOVIES_URL = reverse('movie:movie-list')
+
+
+def create_url(movie_id):
+    """create and return a review create url"""
+    return reverse('movie:review-create', args=[movie_id])
+
+
+def detail_url(review_id):
+    """create and return a review detail url"""
+    return reverse('movie:review-detail', args=[review_id])
+
+
+def movie_url(movie_id):
+    """create and return a movie detail url"""
+    return reverse('movie:movie-detail', args=[movie_id])
+
+
+def create_user(index):
+    # no password: hashing hundreds of them would dominate the tests
+    return get_user_model().objects.create_user(
+        email=f'user{index}@example.com')
+
+
+def assertRating(test, movie, ratings):
+    """assert the movie's aggregates match `ratings` exactly"""
+    movie.refresh_from_db()
+    test.assertEqual(movie.number_rating, len(ratings))
+    test.assertEqual(movie.rating_sum, sum(ratings))
+    expected = Decimal(sum(ratings)) / len(ratings) if ratings else 0
+    test.assertEqual(movie.avg_rating, round(Decimal(expected), 2))
+    test.assertEqual(
+        [getattr(movie, rating_count_field(rating)) for rating in RATINGS],
+        [ratings.count(rating) for rating in RATINGS])
+
+
+class RatingTests(TestCase):
+    """Test every review write path keeps the rating exact"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(0)
+        self.client.force_authenticate(self.user)
+        self.movie = Movie.objects.create(
+            title='sample title', storyLine='sample storyLine')
+
+    def review(self, rating, movie=None, user=None):
+        return Review.objects.create(
+            user=user or create_user(Review.objects.count() + 1),
+            movie=movie or self.movie, rating=rating)
+
+    def test_create_is_exact_mean(self):
+        """Test reviews created through the api average exactly"""
+        for index, rating in enumerate([5, 4, 4], start=1):
+            self.client.force_authenticate(create_user(index))
+            res = self.client.post(
+                create_url(self.movie.id), {'rating': rating})
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        assertRating(self, self.movie, [5, 4, 4])
+
+    def test_create_two_queries(self):
+        """Test a review is created with an insert and an update"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(create_url(self.movie.id), {'rating': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        statements = [
+            query['sql'].split()[0] for query in queries
+            if 'SAVEPOINT' not in query['sql']
+        ]
+        self.assertEqual(statements, ['INSERT', 'UPDATE'])
+        assertRating(self, self.movie, [3])
+
+    def test_create_duplicate(self):
+        """Test reviewing a movie twice is rejected"""
+        self.client.post(create_url(self.movie.id), {'rating': 3})
+
+        res = self.client.post(create_url(self.movie.id), {'rating': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, ['You have already reviewed this movie!'])
+        self.assertEqual(Review.objects.count(), 1)
+        assertRating(self, self.movie, [3])
+
+    def test_create_missing_movie(self):
+        """Test reviewing a movie that does not exist is not found"""
+        res = self.client.post(create_url(self.movie.id + 1), {'rating': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Review.objects.exists())
+
+    def test_update_rating(self):
+        """Test changing a review's rating updates the movie"""
+        review = self.review(2, user=self.user)
+        self.review(5)
+
+        res = self.client.patch(detail_url(review.id), {'rating': 4})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        assertRating(self, self.movie, [4, 5])
+
+    def test_update_from_stale_instance(self):
+        """Test saving an outdated instance uses the stored rating"""
+        review = self.review(2)
+        stale = Review.objects.get(pk=review.pk)
+        review.rating = 5
+        review.save()
+
+        stale.rating = 3
+        stale.save()
+
+        assertRating(self, self.movie, [3])
+
+    def test_move_review(self):
+        """Test moving a review to another movie updates both"""
+        other = Movie.objects.create(title='other', storyLine='other')
+        review = self.review(3)
+        self.review(5)
+
+        review.movie = other
+        review.save()
+
+        assertRating(self, self.movie, [5])
+        assertRating(self, other, [3])
+
+    def test_move_to_reviewed_movie(self):
+        """Test moving a review onto the user's other review is rejected"""
+        other = Movie.objects.create(title='other', storyLine='other')
+        review = self.review(3, user=self.user)
+        self.review(5, movie=other, user=self.user)
+
+        res = self.client.patch(detail_url(review.id), {'movie': other.id})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, ['You have already reviewed this movie!'])
+        assertRating(self, self.movie, [3])
+        assertRating(self, other, [5])
+
+    def test_delete_review(self):
+        """Test deleting a review through the api updates the movie"""
+        review = self.review(1, user=self.user)
+        self.review(4)
+
+        res = self.client.delete(detail_url(review.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        assertRating(self, self.movie, [4])
+
+    def test_delete_twice(self):
+        """Test deleting an already deleted review changes nothing"""
+        review = self.review(1)
+        stale = Review.objects.get(pk=review.pk)
+        review.delete()
+
+        stale.delete()
+
+        assertRating(self, self.movie, [])
+
+    def test_cascade_delete(self):
+        """Test reviews deleted with their user are removed"""
+        user = create_user(99)
+        self.review(2, user=user)
+        self.review(5)
+
+        user.delete()
+
+        assertRating(self, self.movie, [5])
+
+
+class RatingDistributionTests(TestCase):
+    """Test the star distribution on the movie endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_user(0))
+        self.movie = Movie.objects.create(
+            title='sample title', storyLine='sample storyLine')
+        for index, rating in enumerate([5, 5, 3], start=1):
+            Review.objects.create(
+                user=create_user(index), movie=self.movie, rating=rating)
+        self.distribution = {'1': 0, '2': 0, '3': 1, '4': 0, '5': 2}
+
+    def test_detail_distribution(self):
+        """Test the movie detail includes the distribution"""
+        res = self.client.get(movie_url(self.movie.id))
+
+        self.assertEqual(res.data['rating_distribution'], self.distribution)
+
+    def test_list_distribution_optional(self):
+        """Test the list only includes the distribution when asked"""
+        res = self.client.get(MOVIES_URL)
+        self.assertNotIn('rating_distribution', res.data['results'][0])
+
+        res = self.client.get(MOVIES_URL, {'include': 'rating_distribution'})
+        self.assertEqual(
+            res.data['results'][0]['rating_distribution'], self.distribution)
+
+
+class ConcurrentRatingTests(TransactionTestCase):
+    """Test parallel review writes lose no updates"""
+    workers = 16
+
+    def setUp(self):
+        self.movie = Movie.objects.create(
+            title='sample title', storyLine='sample storyLine')
+
+    def run_parallel(self, func, items):
+        def run(item):
+            try:
+                return func(item)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            return list(pool.map(run, items))
+
+    def test_parallel_reviews(self):
+        """Test hundreds of parallel reviews are all counted"""
+        users = [create_user(index) for index in range(200)]
+        ratings = [index % 5 + 1 for index in range(len(users))]
+
+        def post(item):
+            user, rating = item
+            client = APIClient()
+            client.force_authenticate(user)
+            return client.post(
+                create_url(self.movie.id), {'rating': rating}).status_code
+
+        codes = self.run_parallel(post, zip(users, ratings))
+
+        self.assertEqual(set(codes), {status.HTTP_201_CREATED})
+        assertRating(self, self.movie, ratings)
+
+    def test_parallel_duplicates(self):
+        """Test racing reviews by one user create a single review"""
+        user = create_user(0)
+
+        def post(rating):
+            client = APIClient()
+            client.force_authenticate(user)
+            return client.post(
+                create_url(self.movie.id), {'rating': rating}).status_code
+
+        codes = self.run_parallel(post, [5] * 20)
+
+        self.assertEqual(sorted(codes), [status.HTTP_201_CREATED] + [
+            status.HTTP_400_BAD_REQUEST] * 19)
+        assertRating(self, self.movie, [5])
+
+    def test_parallel_updates_and_deletes(self):
+        """Test racing edits and deletes keep the aggregate exact"""
+        reviews = [
+            Review.objects.create(
+                user=create_user(index), movie=self.movie, rating=3)
+            for index in range(100)
+        ]
+
+        def write(index):
+            review = Review.objects.filter(pk=reviews[index % 50].pk).first()
+            if review is None:
+                return
+            if index % 50 < 10:
+                review.delete()
+            else:
+                review.rating = index % 5 + 1
+                review.save()
+
+        self.run_parallel(write, range(300))
+
+        ratings = list(Review.objects.filter(
+            movie=self.movie).values_list('rating', flat=True))
+        self.assertEqual(len(ratings), 90)
+        assertRating(self, self.movie, ratings)
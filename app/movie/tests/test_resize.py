@@ -0,0 +1,166 @@
+"""Test movie images resized on request"""
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Movie
+from movie import images
+from movie.resize import ResizeCache
+from movie.tests.test_images import MediaRootMixin
+
+
+def image_url(movie_id):
+    return reverse('movie:movie-image', args=[movie_id])
+
+
+class ResizedImageTests(MediaRootMixin, TestCase):
+    """Test the resized image endpoint"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.movie = Movie.objects.create(title='movie', storyLine='story')
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(buffer, format='JPEG')
+        self.movie.image.save('poster.jpg', ContentFile(buffer.getvalue()))
+
+    def get(self, **params):
+        return self.client.get(image_url(self.movie.pk), params)
+
+    def test_resize_image(self):
+        """Test the image is resized to the width and format asked"""
+        res = self.get(w=200, fmt='webp')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        self.assertIn('public', res['Cache-Control'])
+        self.assertIn('max-age=86400', res['Cache-Control'])
+        with Image.open(io.BytesIO(b''.join(res.streaming_content))) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (200, 150))
+
+    def test_resize_image_never_upscales(self):
+        """Test widths past the image's are capped to it"""
+        res = self.get(w=2000)
+
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        with Image.open(io.BytesIO(b''.join(res.streaming_content))) as image:
+            self.assertEqual(image.size, (800, 600))
+
+    def test_resized_image_cached(self):
+        """Test a resized image is served from disk the next time"""
+        with patch('movie.resize.render_resized',
+                   wraps=images.render_resized) as render:
+            first = self.get(w=300)
+            second = self.get(w=300)
+            self.get(w=301)
+
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(b''.join(first.streaming_content),
+                         b''.join(second.streaming_content))
+
+    def test_resized_image_not_modified(self):
+        """Test a matching If-None-Match is answered with 304"""
+        etag = self.get(w=300)['ETag']
+
+        res = self.client.get(image_url(self.movie.pk), {'w': 300},
+                              HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(MOVIE_IMAGE_RESIZE_ACCEL_REDIRECT='/internal/resized/')
+    def test_resized_image_accel_redirect(self):
+        """Test nginx is told to send the file when configured"""
+        res = self.get(w=300)
+
+        redirect = res['X-Accel-Redirect']
+        self.assertTrue(redirect.startswith('/internal/resized/'))
+        self.assertTrue(os.path.exists(os.path.join(
+            self.media_root, '.resized',
+            redirect[len('/internal/resized/'):])))
+        self.assertEqual(res.content, b'')
+
+    def test_resize_image_invalid_parameters(self):
+        """Test widths out of range and unknown formats are refused"""
+        for params in ({}, {'w': 0}, {'w': 4096}, {'w': 'x'},
+                       {'w': 100, 'fmt': 'gif'}):
+            res = self.client.get(image_url(self.movie.pk), params,
+                                  HTTP_ACCEPT='image/webp')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_resize_missing_image(self):
+        """Test movies without an image, or missing, answer 404"""
+        other = Movie.objects.create(title='other', storyLine='story')
+
+        for url in (image_url(other.pk), image_url(0), image_url('x')):
+            res = self.client.get(url, {'w': 100})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ResizeCacheTests(SimpleTestCase):
+    """Test the on disk LRU cache of resized images"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def render(self, size):
+        def render(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(b'x' * size)
+        return render
+
+    def test_evicts_least_recently_used(self):
+        """Test the files used longest ago go past the byte budget"""
+        cache = ResizeCache(self.directory, max_size=350)
+        paths = [cache.get(f'{i:064x}', 'jpg', self.render(100))
+                 for i in range(3)]
+        now = time.time()
+        for age, path in zip((300, 100, 200), paths):
+            os.utime(path, (now - age, now - age))
+        # a hit marks the oldest used again
+        cache.get(f'{0:064x}', 'jpg', self.render(100))
+
+        cache.get(f'{3:064x}', 'jpg', self.render(100))
+
+        self.assertEqual([os.path.exists(path) for path in paths],
+                         [True, True, False])
+        self.assertEqual(cache.size, 300)
+
+    def test_single_flight(self):
+        """Test concurrent misses of one file render it once"""
+        cache = ResizeCache(self.directory, max_size=10 ** 6)
+        calls = []
+
+        def slow_render(path):
+            calls.append(path)
+            time.sleep(0.2)
+            self.render(100)(path)
+
+        threads = [
+            threading.Thread(target=cache.get,
+                             args=('ab' * 32, 'jpg', slow_render))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,213 @@
+"""Test for the response cache of the read endpoints"""
+
+from decimal import Decimal
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Movie,
+    Review,
+    Stream,
+)
+from movie.cache import get_response_cache
+
+
+LRU_CACHE = {
+    'ENABLED': True,
+    'BACKEND': 'core.cache.LRUCache',
+    'OPTIONS': {'max_entries': 100},
+}
+# as RESPONSE_CACHE_BACKEND=core.cache.SharedCache configures it
+SHARED_CACHE = dict(
+    settings.RESPONSE_CACHE, ENABLED=True, BACKEND='core.cache.SharedCache')
+
+
+MOVIES_URL = reverse('movie:movie-list')
+
+
+def detail_url(movie_id):
+    """create and return a movie detail url"""
+    return reverse('movie:movie-detail', args=[movie_id])
+
+
+def review_list_url(movie_id):
+    """create and return a review list url"""
+    return reverse('movie:review-list', args=[movie_id])
+
+
+def create_movie(**params):
+    """create and return a sample movie"""
+    defaults = {
+        'title': 'sample title',
+        'storyLine': 'sample storyLine',
+    }
+    defaults.update(params)
+    return Movie.objects.create(**defaults)
+
+
+@override_settings(RESPONSE_CACHE=LRU_CACHE)
+class ResponseCacheTests(TestCase):
+    """Test cached responses and their invalidation"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.movie = create_movie()
+        self.other = create_movie(title='other title')
+        get_response_cache().clear()
+
+    def test_repeat_get_served_from_cache(self):
+        """Test a repeated GET only runs the etag version lookup"""
+        first = self.client.get(detail_url(self.movie.id))
+
+        with self.assertNumQueries(1):
+            second = self.client.get(detail_url(self.movie.id))
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+
+    def test_query_params_normalized(self):
+        """Test query param order does not split cache entries"""
+        url = reverse('movie:movie-list')
+        self.client.get(url + '?page_size=5&active=true')
+
+        with self.assertNumQueries(0):
+            self.client.get(url + '?active=true&page_size=5')
+
+    def test_review_evicts_only_its_movie(self):
+        """Test a new review invalidates just that movie's entries"""
+        for movie in (self.movie, self.other):
+            self.client.get(detail_url(movie.id))
+            self.client.get(review_list_url(movie.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(
+                user=self.user, movie=self.movie, rating=5)
+
+        res = self.client.get(review_list_url(self.movie.id))
+        self.assertEqual(len(res.data['results']), 1)
+        res = self.client.get(detail_url(self.movie.id))
+        self.assertEqual(len(res.data['review']), 1)
+        # only the two etag version lookups
+        with self.assertNumQueries(2):
+            self.client.get(detail_url(self.other.id))
+            self.client.get(review_list_url(self.other.id))
+
+    def test_movie_change_invalidates_stream_list(self):
+        """Test streams are refreshed when a nested movie changes"""
+        stream = Stream.objects.create(
+            name='Netflix', about='about', website='http://www.netflix.com')
+        self.client.get(reverse('movie:stream-list'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_movie(title='new title', platform=stream)
+
+        res = self.client.get(reverse('movie:stream-list'))
+        self.assertEqual(res.data[0]['movies'][0]['title'], 'new title')
+
+    def test_review_refreshes_movie_list_ratings(self):
+        """Test the movie list shows the rating of a new review"""
+        self.client.get(MOVIES_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                reverse('movie:review-create', args=[self.movie.id]),
+                {'rating': 4})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.get(MOVIES_URL)
+        movie, = [m for m in res.data['results'] if m['id'] == self.movie.id]
+        self.assertEqual(movie['number_rating'], 1)
+        self.assertEqual(Decimal(movie['avg_rating']), 4)
+
+    def test_rebuild_ratings_refreshes_movie_list(self):
+        """Test recounted ratings are not served from the cache"""
+        Review.objects.create(user=self.user, movie=self.movie, rating=2)
+        Movie.objects.filter(pk=self.movie.pk).update(
+            number_rating=0, rating_sum=0, avg_rating=0)
+        self.client.get(MOVIES_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_ratings', workers=1, stdout=StringIO())
+
+        res = self.client.get(MOVIES_URL)
+        movie, = [m for m in res.data['results'] if m['id'] == self.movie.id]
+        self.assertEqual(movie['number_rating'], 1)
+
+    def test_invalidated_once_committed(self):
+        """Test versions are bumped when the write commits, not before"""
+        cache = get_response_cache()
+        version = cache.version('movies')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            create_movie(title='new title')
+            # a read meanwhile would still see the rows before the write
+            self.assertEqual(cache.version('movies'), version)
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(cache.version('movies'), version)
+
+    def test_stats(self):
+        """Test hit and miss counters are exposed to admins"""
+        self.client.get(detail_url(self.movie.id))
+        self.client.get(detail_url(self.movie.id))
+        admin = get_user_model().objects.create_superuser(
+            'admin@example.com', 'testpass123')
+
+        res = self.client.get(reverse('movie:cache-stats'))
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(admin)
+        res = self.client.get(reverse('movie:cache-stats'))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual((res.data['hits'], res.data['misses']), (1, 1))
+
+
+@override_settings(RESPONSE_CACHE=SHARED_CACHE)
+class SharedResponseCacheTests(TestCase):
+    """Test the shared backend, as the settings configure it"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.movie = create_movie()
+
+    def tearDown(self):
+        get_response_cache().clear()
+
+    def test_shared_cache_invalidated_by_write(self):
+        """Test writes bump the shared version counters"""
+        self.client.get(detail_url(self.movie.id))
+        # the etag version, then the scope version and the response from
+        # the shared cache's table
+        with self.assertNumQueries(3):
+            self.client.get(detail_url(self.movie.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.title = 'renamed'
+            self.movie.save()
+
+        res = self.client.get(detail_url(self.movie.id))
+        self.assertEqual(res.data['title'], 'renamed')
+
+    def test_shared_cache_from_settings(self):
+        """Test the settings' options build a cache every worker shares"""
+        cache = get_response_cache()
+        cache.set('response:key', {'title': 'shared'})
+
+        self.assertEqual(
+            caches['shared'].get('response:key'), {'title': 'shared'})
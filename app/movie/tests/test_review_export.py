@@ -0,0 +1,72 @@
+"""Test streaming a movie's reviews"""
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Movie,
+    Review,
+)
+from movie.serializers import ReviewDetailSerializer
+
+
+def export_url(movie_id):
+    """create and return a review export url"""
+    return reverse('movie:review-export', args=[movie_id])
+
+
+@override_settings(STREAM_CHUNK_SIZE=2)
+class ReviewExportTests(TestCase):
+    """Test the streaming review export"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.movie = Movie.objects.create(
+            title='sample title', storyLine='sample storyLine')
+
+    def create_reviews(self, movie, count):
+        for i in range(count):
+            user = get_user_model().objects.create_user(
+                email=f'{movie.id}-{i}@example.com', password='testpass123')
+            Review.objects.create(
+                user=user, movie=movie, rating=i % 5 + 1,
+                description=f'review {i}')
+
+    def test_streams_all_reviews(self):
+        """Test every review is sent, newest first, in chunks"""
+        self.create_reviews(self.movie, 5)
+        self.create_reviews(
+            Movie.objects.create(title='other', storyLine='other'), 2)
+
+        res = self.client.get(export_url(self.movie.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        chunks = list(res.streaming_content)
+        data = json.loads(b''.join(chunks))
+        reviews = Review.objects.filter(
+            movie=self.movie).order_by('-created', '-id')
+        serializer = ReviewDetailSerializer(reviews, many=True)
+        self.assertEqual(data, json.loads(json.dumps(serializer.data)))
+        # opening bracket, three chunks of at most two rows, closing
+        self.assertEqual(len(chunks), 5)
+
+    def test_no_reviews(self):
+        """Test a movie without reviews streams an empty array"""
+        res = self.client.get(export_url(self.movie.id))
+
+        self.assertEqual(b''.join(res.streaming_content), b'[]')
+
+    def test_auth_required(self):
+        """Test authentication is required to export reviews"""
+        res = APIClient().get(export_url(self.movie.id))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,179 @@
+"""Test movie search"""
+
+from django.test import TestCase, SimpleTestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Movie
+from movie import search
+
+MOVIES_URL = reverse('movie:movie-list')
+
+
+def create_movies():
+    """create a small catalog and return it by title"""
+    return {
+        title: Movie.objects.create(title=title, storyLine=story_line)
+        for title, story_line in [
+            ('The Godfather', 'A crime family and its patriarch.'),
+            ('Heat', 'A detective hunts a crew of bank robbers.'),
+            ('Crime Story', 'A detective in a city of gangsters.'),
+            ('Up', 'An old man flies his house with balloons.'),
+        ]
+    }
+
+
+class SearchApiTests(TestCase):
+    """Test `?q=` on the movie list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.movies = create_movies()
+
+    def search(self, **params):
+        res = self.client.get(MOVIES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [movie['title'] for movie in res.data['results']]
+
+    def test_story_line_match(self):
+        """Test words of the story line are found, stemmed"""
+        self.assertEqual(self.search(q='balloon'), ['Up'])
+
+    def test_title_ranks_above_story_line(self):
+        """Test a title match outranks a story line match"""
+        self.assertEqual(
+            self.search(q='crime'), ['Crime Story', 'The Godfather'])
+
+    def test_typo_in_title(self):
+        """Test titles within trigram distance of the query match"""
+        self.assertEqual(self.search(q='godfater'), ['The Godfather'])
+
+    def test_no_match(self):
+        """Test an unmatched query returns an empty page"""
+        res = self.client.get(MOVIES_URL, {'q': 'zebra'})
+
+        self.assertEqual(res.data['results'], [])
+        self.assertIsNone(res.data['next'])
+
+    def test_page_size_limits_results(self):
+        """Test the search returns a page of page_size movies"""
+        self.assertEqual(
+            self.search(q='detective', page_size=1), ['Crime Story'])
+
+    def test_next_pages(self):
+        """Test next links walk the ranking, trigram matches last"""
+        Movie.objects.create(title='Crim', storyLine='A short film.')
+        titles = []
+        url, params = MOVIES_URL, {'q': 'crime', 'page_size': 1}
+        while url:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            titles += [movie['title'] for movie in res.data['results']]
+            url, params = res.data['next'], None
+
+        self.assertEqual(titles, self.search(q='crime', page_size=10))
+        self.assertEqual(titles, ['Crime Story', 'The Godfather', 'Crim'])
+
+    def test_ranked_before_paged(self):
+        """Test the best matches come first whatever the catalog's size"""
+        for i in range(30):
+            Movie.objects.create(
+                title=f'filler {i}', storyLine='A detective retires.')
+        Movie.objects.create(title='Detective', storyLine='A detective.')
+
+        self.assertEqual(
+            self.search(q='detective', page_size=1), ['Detective'])
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is a 404"""
+        res = self.client.get(MOVIES_URL, {'q': 'crime', 'cursor': 'x'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_vector_follows_edits(self):
+        """Test the search vector is updated with the movie"""
+        movie = self.movies['Up']
+        movie.storyLine = 'A widower travels to South America.'
+        movie.save()
+
+        self.assertEqual(self.search(q='balloon'), [])
+        self.assertEqual(self.search(q='widower'), ['Up'])
+
+    def test_blank_query_lists_movies(self):
+        """Test an empty `q` is the regular paginated list"""
+        self.assertEqual(len(self.search(q=' ')), len(self.movies))
+
+
+class InMemorySearchTests(TestCase):
+    """Test the pure python search matches the postgres one"""
+
+    def setUp(self):
+        create_movies()
+
+    def search(self, text, limit=20):
+        return [
+            movie.title for movie in search._search_in_memory(
+                Movie.objects.all(), text, limit)
+        ]
+
+    def test_matches_postgres(self):
+        """Test both backends agree on the catalog"""
+        for text in ['balloon', 'crime', 'godfater', 'detective', 'zebra']:
+            with self.subTest(text=text):
+                expected = [
+                    movie.title for movie in search._search_postgres(
+                        Movie.objects.all(), text, 20)
+                ]
+                self.assertEqual(self.search(text), expected)
+
+    def test_limit(self):
+        """Test at most `limit` movies are returned"""
+        self.assertEqual(self.search('detective', limit=1), ['Crime Story'])
+
+    def test_after_matches_postgres(self):
+        """Test both backends continue their ranking alike"""
+        pages = []
+        for backend in (search._search_in_memory, search._search_postgres):
+            first, = backend(Movie.objects.all(), 'crime', 1)
+            pages.append([movie.title for movie in backend(
+                Movie.objects.all(), 'crime', 20,
+                (first.match, first.rank, first.pk))])
+
+        self.assertEqual(pages[0], pages[1])
+        self.assertEqual(pages[0], ['The Godfather'])
+
+
+class SearchIndexTests(SimpleTestCase):
+    """Test the in memory index"""
+
+    def test_terms(self):
+        """Test text is lowercased, stemmed and stop words dropped"""
+        self.assertEqual(
+            search.terms('The Robbers are Hunting'), ['robber', 'hunt'])
+
+    def test_trigrams(self):
+        """Test trigrams are built per word with pg_trgm's padding"""
+        self.assertEqual(
+            search.trigrams('Up'), {'  u', ' up', 'up '})
+
+    def test_similarity(self):
+        """Test similarity is the shared share of trigrams"""
+        self.assertEqual(
+            search.similarity(search.trigrams('cat'),
+                              search.trigrams('cat')), 1.0)
+        self.assertEqual(search.similarity(set(), {'abc'}), 0.0)
+
+    def test_search_ranks_title_first(self):
+        """Test title terms weigh more than story line terms"""
+        index = search.SearchIndex()
+        index.add(1, 'Heat', 'a heist in a city')
+        index.add(2, 'City', 'a story')
+
+        self.assertEqual(
+            [pk for pk, _ in index.search('city', 10)], [2, 1])
@@ -8,6 +8,7 @@ from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import (
+    Movie,
     Stream,
 )
 
@@ -35,6 +36,11 @@ def detail_url(stream_id):
     return reverse('movie:stream-detail', args=[stream_id])
 
 
+def stream_movies_url(stream_id):
+    """create and return the url listing a stream's movies"""
+    return reverse('movie:stream-movies', args=[stream_id])
+
+
 def create_user(**params):
     """create and return a new user"""
     return get_user_model().objects.create_user(**params)
@@ -159,3 +165,63 @@ class PrivateStreamApiTests(TestCase):
         res = self.client.delete(url)
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
         self.assertTrue(Stream.objects.filter(id=stream.id).exists())
+
+
+class StreamMoviesApiTests(TestCase):
+    """Test the movies nested in streams are bounded"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.stream = create_stream(name='Netflix')
+        self.movie_ids = [
+            Movie.objects.create(
+                title=f'movie {i}', storyLine='storyLine',
+                platform=self.stream).id
+            for i in range(5)
+        ]
+
+    def test_nested_movies_capped(self):
+        """Test each stream nests only its newest movies"""
+        other = create_stream(name='Prime')
+        Movie.objects.create(
+            title='other movie', storyLine='storyLine', platform=other)
+
+        with self.settings(STREAM_MOVIES_LIMIT=2):
+            res = self.client.get(STREAM_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        netflix, prime = sorted(res.data, key=lambda s: s['name'])
+        self.assertEqual(
+            [m['id'] for m in netflix['movies']],
+            sorted(self.movie_ids, reverse=True)[:2])
+        self.assertIsNotNone(netflix['movies_next'])
+        self.assertEqual(len(prime['movies']), 1)
+        self.assertIsNone(prime['movies_next'])
+
+    def test_movies_next_continues_listing(self):
+        """Test the next link pages through the remaining movies"""
+        with self.settings(STREAM_MOVIES_LIMIT=2):
+            res = self.client.get(detail_url(self.stream.id))
+
+        seen = [m['id'] for m in res.data['movies']]
+        url = res.data['movies_next']
+        while url:
+            page = self.client.get(url).data
+            seen += [m['id'] for m in page['results']]
+            url = page['next']
+
+        self.assertEqual(seen, sorted(self.movie_ids, reverse=True))
+
+    def test_stream_movies_listing(self):
+        """Test listing a stream's movies with cursor pagination"""
+        Movie.objects.create(title='other', storyLine='storyLine')
+
+        res = self.client.get(stream_movies_url(self.stream.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [m['id'] for m in res.data['results']],
+            sorted(self.movie_ids, reverse=True))
@@ -0,0 +1,158 @@
+"""Test validating and storing movie image uploads"""
+import io
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from unittest.mock import patch
+
+from PIL import Image, ImageFile
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Movie
+
+
+def png_header(width, height):
+    """a PNG claiming `width` x `height` pixels, with almost no data"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack(
+            '>I', zlib.crc32(kind + data))
+    return b'\x89PNG\r\n\x1a\n' + chunk(
+        b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0),
+    ) + chunk(b'IDAT', zlib.compress(b'')) + chunk(b'IEND', b'')
+
+
+def image_bytes(size, format='JPEG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'blue').save(buffer, format=format)
+    return buffer.getvalue()
+
+
+class ImageUploadValidationTests(TestCase):
+    """Test the upload image endpoint's streaming and validation"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                email='admin@example.com', password='testpass123'))
+        self.movie = Movie.objects.create(title='movie', storyLine='story')
+        self.url = reverse('movie:movie-upload-image', args=[self.movie.pk])
+
+    def upload(self, content, name='poster.jpg'):
+        return self.client.post(
+            self.url, {'image': SimpleUploadedFile(name, content)},
+            format='multipart')
+
+    def assertNoTemporaryFiles(self):
+        directory = os.path.join(self.media_root, '.uploads')
+        self.assertEqual(
+            os.listdir(directory) if os.path.isdir(directory) else [], [])
+
+    def test_upload_is_renamed_into_place(self):
+        """Test a valid upload is streamed to disk and moved, not copied"""
+        with patch('django.core.files.move.os.rename',
+                   wraps=os.rename) as rename:
+            res = self.upload(image_bytes((40, 30)))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.movie.refresh_from_db()
+        source, target = rename.call_args[0]
+        self.assertEqual(
+            os.path.dirname(source), os.path.join(self.media_root, '.uploads'))
+        self.assertEqual(target, self.movie.image.path)
+        with Image.open(self.movie.image.path) as image:
+            self.assertEqual(image.size, (40, 30))
+        self.assertNoTemporaryFiles()
+
+    @override_settings(MOVIE_IMAGE_MAX_UPLOAD_SIZE=1000)
+    def test_upload_too_large(self):
+        """Test uploads past the size limit are cut off while streaming"""
+        res = self.upload(os.urandom(64 * 1024))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('at most', str(res.data['image'][0]))
+        self.assertNoTemporaryFiles()
+        self.movie.refresh_from_db()
+        self.assertFalse(self.movie.image)
+
+    def test_upload_decompression_bomb(self):
+        """Test a header claiming too many pixels is refused undecoded"""
+        with patch.object(ImageFile.ImageFile, 'load') as load:
+            res = self.upload(png_header(100000, 100000), name='bomb.png')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pixels', str(res.data['image'][0]))
+        load.assert_not_called()
+
+    @override_settings(MOVIE_IMAGE_MAX_PIXELS=100 * 100)
+    def test_upload_too_many_pixels(self):
+        """Test images past MOVIE_IMAGE_MAX_PIXELS are refused"""
+        res = self.upload(image_bytes((101, 100)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('10000 pixels', str(res.data['image'][0]))
+
+        res = self.upload(image_bytes((100, 100)))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_upload_unsupported_format(self):
+        """Test formats outside MOVIE_IMAGE_FORMATS are refused"""
+        for content in (image_bytes((10, 10), 'BMP'), b'not an image'):
+            res = self.upload(content)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('JPEG, PNG, WEBP, GIF', str(res.data['image'][0]))
+
+    def test_same_image_stored_once(self):
+        """Test an image uploaded for two movies is stored once"""
+        other = Movie.objects.create(title='other', storyLine='story')
+        content = image_bytes((40, 30))
+        self.upload(content)
+        self.client.post(
+            reverse('movie:movie-upload-image', args=[other.pk]),
+            {'image': SimpleUploadedFile('copy.JPG', content)},
+            format='multipart')
+
+        self.movie.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.movie.image.name, other.image.name)
+        path = self.movie.image.path
+        self.assertEqual(os.listdir(os.path.dirname(path)),
+                         [os.path.basename(path)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.delete()
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_replaced_image_deleted(self):
+        """Test an image no movie uses anymore is deleted"""
+        self.upload(image_bytes((40, 30)))
+        self.movie.refresh_from_db()
+        old = self.movie.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(image_bytes((30, 40)))
+
+        self.movie.refresh_from_db()
+        self.assertNotEqual(self.movie.image.path, old)
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(self.movie.image.path))
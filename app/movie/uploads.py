@@ -0,0 +1,119 @@
+"""memory bounded movie image uploads
+
+`ImageUploadHandler` streams the request body to a temporary file in
+MEDIA_ROOT, stopping past MOVIE_IMAGE_MAX_UPLOAD_SIZE, so storing the
+upload is a rename on the same file system rather than a copy. The
+content hash naming the file in storage is computed on the way.
+`HeaderImageField` then validates the image from its header alone:
+Pillow reads the format and size without decoding a pixel, and images
+beyond MOVIE_IMAGE_MAX_PIXELS, e.g. decompression bombs, are refused
+before anything decodes them.
+"""
+import hashlib
+import os
+import tempfile
+import warnings
+
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    TemporaryUploadedFile,
+    UploadedFile,
+)
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+
+
+def upload_temp_dir():
+    """where uploads are streamed to, on MEDIA_ROOT's file system"""
+    return os.path.join(settings.MEDIA_ROOT, '.uploads')
+
+
+class MediaTemporaryUploadedFile(TemporaryUploadedFile):
+    """a TemporaryUploadedFile created in `upload_temp_dir()`"""
+
+    def __init__(self, name, content_type, size, charset,
+                 content_type_extra=None):
+        directory = upload_temp_dir()
+        os.makedirs(directory, exist_ok=True)
+        file = tempfile.NamedTemporaryFile(
+            suffix='.upload' + os.path.splitext(name)[1], dir=directory)
+        UploadedFile.__init__(
+            self, file, name, content_type, size, charset, content_type_extra)
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """stream uploads to disk, refusing them past the size limit"""
+
+    def new_file(self, *args, **kwargs):
+        super(TemporaryFileUploadHandler, self).new_file(*args, **kwargs)
+        self.file = MediaTemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset,
+            self.content_type_extra)
+        self.received = 0
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.MOVIE_IMAGE_MAX_UPLOAD_SIZE:
+            self.upload_interrupted()
+            raise serializers.ValidationError({
+                self.field_name: [too_large_message()]})
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        # read by core.storage, sparing it a second pass over the file
+        self.file.content_hash = self.sha256.hexdigest()
+        return super().file_complete(file_size)
+
+
+def too_large_message():
+    limit = settings.MOVIE_IMAGE_MAX_UPLOAD_SIZE / 2 ** 20
+    return f'Upload an image of at most {limit:g} MB.'
+
+
+class HeaderImageField(serializers.ImageField):
+    """an ImageField validating the image from its header only
+
+    Unlike `ImageField`, which has Pillow verify the whole file, only
+    the header is read: the format must be one of MOVIE_IMAGE_FORMATS
+    and the image at most MOVIE_IMAGE_MAX_PIXELS large.
+    """
+    default_error_messages = {
+        'format': 'Upload a {formats} image.',
+        'pixels': 'Upload an image of at most {limit} pixels.',
+    }
+
+    def to_internal_value(self, data):
+        # FileField's checks: a named, non empty file
+        file = serializers.FileField.to_internal_value(self, data)
+        if file.size > settings.MOVIE_IMAGE_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(too_large_message())
+
+        limit = settings.MOVIE_IMAGE_MAX_PIXELS
+        source = file.temporary_file_path() \
+            if hasattr(file, 'temporary_file_path') else file
+        with warnings.catch_warnings():
+            # Pillow warns, then raises, past its own pixel limit
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            try:
+                with Image.open(
+                        source, formats=settings.MOVIE_IMAGE_FORMATS) as image:
+                    width, height = image.size
+                    format = image.format
+            except (Image.DecompressionBombWarning,
+                    Image.DecompressionBombError):
+                self.fail('pixels', limit=limit)
+            except (UnidentifiedImageError, OSError, SyntaxError,
+                    ValueError):
+                self.fail('format',
+                          formats=', '.join(settings.MOVIE_IMAGE_FORMATS))
+            finally:
+                if not isinstance(source, str):
+                    file.seek(0)
+
+        if width * height > limit:
+            self.fail('pixels', limit=limit)
+        file.content_type = Image.MIME.get(format)
+        return file
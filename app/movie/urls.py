@@ -16,7 +16,12 @@ urlpatterns = [
     path('<int:pk>/review-create/',
          views.ReviewCreate.as_view(), name='review-create'),
     path('<int:pk>/reviews/', views.ReviewList.as_view(), name='review-list'),
+    path('<int:pk>/reviews/all/',
+         views.ReviewExport.as_view(), name='review-export'),
     path('review/<int:pk>/', views.ReviewDetail.as_view(), name='review-detail'),
     path('reviews/', views.UserReview.as_view(), name='user-review-detail'),
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('db-pool-stats/', views.DatabasePoolStatsView.as_view(),
+         name='db-pool-stats'),
 
 ]
@@ -1,6 +1,6 @@
 """views for the movie api"""
 from rest_framework import mixins, viewsets, generics
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -16,22 +16,65 @@ from movie.serializers import (
     ReviewSerializer,
     ReviewDetailSerializer,
     MovieImageSerializer,
+    MovieBulkSerializer,
+    ResizedImageSerializer,
 )
 from movie import permissions
+from movie.images import generate_variants
+from movie.resize import resized_image_response
+from movie.uploads import ImageUploadHandler
+from movie.prefetch import PrefetchPlanMixin
+from movie.cache import (
+    CachedResponseMixin,
+    get_response_cache,
+    invalidate,
+)
+from movie.etags import movie_etag, movie_version, review_list_etag
+from movie.fastpath import FastPathListMixin
+from movie.search import SearchListMixin
+from movie.filters import MovieFilter, IndexedOrderingFilter
+from movie.pagination import (
+    MoviePagination,
+    ReviewPagination,
+)
+from core.db.pool import pool_stats
+from core.renderers import streaming_list_response
+from user.authentication import CachedTokenAuthentication
+
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.permissions import (
+    AllowAny,
+    IsAuthenticated,
+    IsAdminUser,
+)
+from rest_framework.views import APIView
 
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
-
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+
+class IgnoreAcceptNegotiation(BaseContentNegotiation):
+    """render with the first renderer whatever the client accepts"""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
 
 
 class StreamViewSet(
+    CachedResponseMixin,
+    PrefetchPlanMixin,
     viewsets.ModelViewSet
 ):
     """manage stream in the database"""
     serializer_class = StreamSerializer
     queryset = Stream.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [
         IsAuthenticated,
         permissions.IsAdminOrReadOnly
@@ -41,16 +84,43 @@ class StreamViewSet(
         """filter queryset to authenticated user"""
         return Stream.objects.all().order_by('-name')
 
+    def cache_scopes(self):
+        """streams nest their movies"""
+        if self.action == 'retrieve':
+            return [f'stream:{self.kwargs["pk"]}', 'movies']
+        return ['streams', 'movies']
+
     def perform_create(self, serializer):
         """create a new stream"""
         serializer.save(user=self.request.user)
 
-
-class MovieViewSet(viewsets.ModelViewSet):
+    @action(methods=['GET'], detail=True, url_path='movies')
+    def movies(self, request, pk=None):
+        """list the movies of a stream, newest first"""
+        stream = self.get_object()
+        paginator = MoviePagination()
+        page = paginator.paginate_queryset(
+            Movie.objects.filter(platform=stream), request, view=self)
+        serializer = MovieSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+
+class MovieViewSet(
+    CachedResponseMixin,
+    PrefetchPlanMixin,
+    SearchListMixin,
+    FastPathListMixin,
+    viewsets.ModelViewSet
+):
     """view for manage movie api"""
     serializer_class = MovieDetailSerializer
     queryset = Movie.objects.all()
-    authentication_classes = [TokenAuthentication]
+    pagination_class = MoviePagination
+    filter_backends = [MovieFilter, IndexedOrderingFilter]
+    ordering_fields = ['id', 'avg_rating', 'number_rating', 'created']
+    ordering = ['-id']
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [
         IsAuthenticated,
         permissions.IsAdminOrReadOnly
@@ -60,35 +130,100 @@ class MovieViewSet(viewsets.ModelViewSet):
         """retrieve movie for authenticated user"""
         return Movie.objects.all().order_by('-id')
 
+    @method_decorator(condition(etag_func=movie_etag))
+    def retrieve(self, request, *args, **kwargs):
+        """answer a matching If-None-Match with 304"""
+        return super().retrieve(request, *args, **kwargs)
+
+    def cache_scopes(self):
+        """a movie's detail includes its reviews"""
+        if self.action == 'retrieve':
+            return [f'movie:{self.kwargs["pk"]}']
+        return ['movies']
+
+    def cache_variant(self):
+        """the version the detail's ETag is made of"""
+        if self.action == 'retrieve':
+            return movie_version(self.request, self.kwargs['pk'])
+        return None
+
     def get_serializer_class(self):
         """return the serializer for request"""
         if self.action == 'list':
             return MovieSerializer
         elif self.action == 'upload_image':
             return MovieImageSerializer
+        elif self.action == 'bulk':
+            return MovieBulkSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         """create a new movie"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """create and update a list of movies in one transaction
+
+        Answers with the errors of each item, or with the id and status
+        of each item in the order sent.
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        movies = serializer.save(user=request.user)
+
+        # bulk writes send no model signals
+        invalidate('movies', *(f'movie:{movie.pk}' for movie in movies))
+        return Response({'results': [
+            {
+                'id': movie.pk,
+                'status': status.HTTP_200_OK if 'id' in item
+                else status.HTTP_201_CREATED,
+            }
+            for item, movie in zip(serializer.validated_data, movies)
+        ]})
+
+    @action(methods=['GET'], detail=True, url_path='image',
+            permission_classes=[AllowAny],
+            content_negotiation_class=IgnoreAcceptNegotiation)
+    def image(self, request, pk=None):
+        """the movie's image resized to `w` pixels wide, in `fmt`
+
+        Public like the files nginx serves. Browsers ask for images
+        only, so errors are rendered as JSON whatever they accept.
+        """
+        query = ResizedImageSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        name = generics.get_object_or_404(
+            Movie.objects.values_list('image', flat=True), pk=pk)
+        if not name:
+            raise NotFound()
+        return resized_image_response(
+            request, name, query.validated_data['w'],
+            query.validated_data['fmt'])
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """upload an image to dessert"""
+        # stream the body to disk before anything reads request.data
+        request.upload_handlers = [ImageUploadHandler(request)]
         movie = self.get_object()
         serializer = self.get_serializer(movie, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            # the old image's variants no longer apply
+            serializer.save(image_variants=[])
+            generate_variants(movie)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserReview(generics.ListAPIView):
+class UserReview(PrefetchPlanMixin, generics.ListAPIView):
     serializer_class = ReviewDetailSerializer
     queryset = Review.objects.all()
-    authentication_classes = [TokenAuthentication]
+    pagination_class = ReviewPagination
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [
         IsAuthenticated,
         permissions.IsReviewUserOrReadOnly
@@ -100,38 +235,58 @@ class UserReview(generics.ListAPIView):
 
 class ReviewCreate(generics.CreateAPIView):
     serializer_class = ReviewSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return Review.objects.all()
 
     def perform_create(self, serializer):
-        pk = self.kwargs.get('pk')
-        movie = Movie.objects.get(pk=pk)
+        """insert the review, then add its rating to the movie
+
+        Two queries: a duplicate review fails the unique constraint and
+        a missing movie updates no row, either one rolling back.
+        """
+        try:
+            with transaction.atomic():
+                serializer.save(
+                    movie_id=self.kwargs.get('pk'), user=self.request.user)
+        except IntegrityError:
+            raise ValidationError("You have already reviewed this movie!")
+        except Movie.DoesNotExist:
+            raise NotFound()
 
-        user = self.request.user
-        review_queryset = Review.objects.filter(
-            movie=movie, user=user)
 
-        if review_queryset.exists():
-            raise ValidationError("You have already reviewed this movie!")
+class ReviewList(CachedResponseMixin, PrefetchPlanMixin,
+                 generics.ListAPIView):
+    serializer_class = ReviewDetailSerializer
+    pagination_class = ReviewPagination
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [
+        IsAuthenticated,
+        permissions.IsReviewUserOrReadOnly
+    ]
+
+    def get_queryset(self):
+        pk = self.kwargs['pk']
+        return Review.objects.filter(movie=pk)
 
-        if movie.number_rating == 0:
-            movie.avg_rating = serializer.validated_data['rating']
-        else:
-            movie.avg_rating = (
-                movie.avg_rating + serializer.validated_data['rating'])/2
+    @method_decorator(condition(etag_func=review_list_etag))
+    def list(self, request, *args, **kwargs):
+        """answer a matching If-None-Match with 304"""
+        return super().list(request, *args, **kwargs)
 
-        movie.number_rating = movie.number_rating + 1
-        movie.save()
+    def cache_scopes(self):
+        return [f'movie:{self.kwargs["pk"]}']
 
-        serializer.save(movie=movie, user=user)
+    def cache_variant(self):
+        return movie_version(self.request, self.kwargs['pk'])
 
 
-class ReviewList(generics.ListAPIView):
+class ReviewExport(PrefetchPlanMixin, generics.ListAPIView):
+    """stream every review of a movie as one JSON array"""
     serializer_class = ReviewDetailSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [
         IsAuthenticated,
         permissions.IsReviewUserOrReadOnly
@@ -139,13 +294,23 @@ class ReviewList(generics.ListAPIView):
 
     def get_queryset(self):
         pk = self.kwargs['pk']
-        return Review.objects.filter(movie=pk)
+        return Review.objects.filter(movie=pk).order_by('-created', '-id')
+
+    def list(self, request, *args, **kwargs):
+        """read, serialize and send the reviews one chunk at a time"""
+        return streaming_list_response(
+            self.filter_queryset(self.get_queryset()),
+            self.get_serializer_class(),
+            context=self.get_serializer_context(),
+            chunk_size=settings.STREAM_CHUNK_SIZE,
+        )
 
 
-class ReviewDetail(generics.RetrieveUpdateDestroyAPIView):
+class ReviewDetail(CachedResponseMixin, PrefetchPlanMixin,
+                   generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ReviewDetailSerializer
     queryset = Review.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [
         IsAuthenticated,
         permissions.IsReviewUserOrReadOnly
@@ -154,3 +319,32 @@ class ReviewDetail(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         """retrieve review for authenticated user"""
         return Review.objects.all()
+
+    def perform_update(self, serializer):
+        """save the review, moved to a movie the user reviewed or not"""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError("You have already reviewed this movie!")
+
+    def cache_scopes(self):
+        return [f'review:{self.kwargs["pk"]}']
+
+
+class CacheStatsView(APIView):
+    """hit, miss and eviction counters of this worker's response cache"""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_response_cache().stats())
+
+
+class DatabasePoolStatsView(APIView):
+    """size, saturation, wait and churn counters of this worker's db pools"""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(pool_stats())
@@ -0,0 +1,98 @@
+"""token authentication without a query per request
+
+`CachedTokenAuthentication` keeps the token's user for
+TOKEN_AUTH_CACHE's timeout after resolving it once. The signals in
+`user.signals` drop the entry when the token is deleted or its user
+saved, e.g. deactivated or edited through `ManageUserView`, from every
+worker when the cache is shared, else from this worker only. Changes
+no worker dropped, like queryset updates, show after the timeout.
+"""
+import copy
+import hashlib
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.authtoken.models import Token
+
+from core.cache import create_cache
+from core.routers import read_alias, use_primary
+
+_cache = None
+
+
+def get_token_cache():
+    """return the process wide token cache"""
+    global _cache
+    if _cache is None:
+        _cache = create_cache(settings.TOKEN_AUTH_CACHE)
+    return _cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    global _cache
+    if setting == 'TOKEN_AUTH_CACHE':
+        _cache = None
+
+
+def _token_key(key):
+    # digests, so a shared cache holds no usable tokens
+    return 'token:' + hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def forget_token(key):
+    """drop the cached user of token `key`"""
+    if settings.TOKEN_AUTH_CACHE['ENABLED']:
+        get_token_cache().delete(_token_key(key))
+
+
+def forget_user(user_id):
+    """drop the cached token of user `user_id`"""
+    if settings.TOKEN_AUTH_CACHE['ENABLED']:
+        cache = get_token_cache()
+        key = cache.get(f'token-user:{user_id}')
+        if key is not None:
+            cache.delete(key)
+            cache.delete(f'token-user:{user_id}')
+
+
+def remember_token(user, token):
+    """cache `user` as the owner of `token`, return the cached pair"""
+    # without the user it caches, so copies never share one
+    cached = (user, Token(
+        key=token.key, user_id=token.user_id, created=token.created))
+    if settings.TOKEN_AUTH_CACHE['ENABLED']:
+        cache = get_token_cache()
+        cache.set(_token_key(token.key), cached)
+        cache.set(f'token-user:{user.pk}', _token_key(token.key))
+    return cached
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication remembering which user a token belongs to"""
+
+    def authenticate_credentials(self, key):
+        if not settings.TOKEN_AUTH_CACHE['ENABLED']:
+            return self._lookup(key)
+
+        cached = get_token_cache().get(_token_key(key))
+        if cached is None:
+            cached = remember_token(*self._lookup(key))
+
+        # views may change request.user; they must not change the cache
+        user, token = (copy.copy(instance) for instance in cached)
+        token.user = user
+        return user, token
+
+    def _lookup(self, key):
+        try:
+            return super().authenticate_credentials(key)
+        except AuthenticationFailed:
+            if read_alias() is None:
+                raise
+        # a token made moments ago may not have reached the replica yet
+        with use_primary():
+            return super().authenticate_credentials(key)
@@ -0,0 +1,71 @@
+"""bounded password checks for the token endpoint
+
+Checking a password costs hundreds of milliseconds of PBKDF2, and a
+uWSGI worker checking one serves nothing else meanwhile. `login_slot()`
+admits LOGIN_WORKERS checks at once across all the workers of a host,
+lets LOGIN_QUEUE more wait up to LOGIN_QUEUE_TIMEOUT seconds for their
+turn and turns the rest away at once with a 503, so a burst of logins
+ties up a bounded number of workers and the others keep serving reads.
+
+The slots are file locks in LOGIN_SLOTS_DIR, shared by every process
+of the host and freed by the kernel if a worker dies holding one.
+"""
+import fcntl
+import os
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class LoginUnavailable(APIException):
+    """503 answered when every login slot is taken"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins at once, try again shortly.'
+    default_code = 'login_unavailable'
+
+    def __init__(self):
+        super().__init__()
+        # sent as Retry-After by the exception handler
+        self.wait = settings.LOGIN_RETRY_AFTER
+
+
+def _lock_any(directory, kind, count):
+    """lock one of `count` free slot files, return it or None"""
+    # start anywhere, so waiting processes do not all try slot 0 first
+    first = random.randrange(count)
+    for i in range(count):
+        file = open(
+            os.path.join(directory, f'{kind}-{(first + i) % count}.lock'), 'a')
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            file.close()
+            continue
+        return file
+    return None
+
+
+@contextmanager
+def login_slot():
+    """run the block in a login slot, or raise LoginUnavailable"""
+    directory = settings.LOGIN_SLOTS_DIR
+    os.makedirs(directory, exist_ok=True)
+    admitted = _lock_any(
+        directory, 'admit', settings.LOGIN_WORKERS + settings.LOGIN_QUEUE)
+    if admitted is None:
+        raise LoginUnavailable()
+    with admitted:
+        deadline = time.monotonic() + settings.LOGIN_QUEUE_TIMEOUT
+        while True:
+            running = _lock_any(directory, 'run', settings.LOGIN_WORKERS)
+            if running is not None:
+                break
+            if time.monotonic() >= deadline:
+                raise LoginUnavailable()
+            time.sleep(0.01)
+        with running:
+            yield
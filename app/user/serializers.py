@@ -7,6 +7,8 @@ from django.contrib.auth import (
 )
 from django.utils.translation import gettext_lazy as _
 
+from user.login import login_slot
+
 
 class UserSerializer(serializers.ModelSerializer):
     """serializer for the user object"""
@@ -47,11 +49,13 @@ class AuthTokenSerializer(serializers.Serializer):
         """validate and authenticate the user"""
         email = attrs.get('email')
         password = attrs.get('password')
-        user = authenticate(
-            request=self.context.get('request'),
-            username=email,
-            password=password
-        )
+        # hashing the password is slow; bound how many run at once
+        with login_slot():
+            user = authenticate(
+                request=self.context.get('request'),
+                username=email,
+                password=password
+            )
 
         if not user:
             msg = _('unable to authenticate with provided credential')
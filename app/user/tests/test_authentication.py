@@ -0,0 +1,112 @@
+"""Test authenticating tokens through the token cache"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.cache import LRUCache, create_cache
+from user.authentication import CachedTokenAuthentication
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token lookups are cached and dropped on changes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+            name='name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test a token is resolved to its user by one query only once"""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.data['email'], 'user@example.com')
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], 'user@example.com')
+
+    @override_settings(TOKEN_AUTH_CACHE={
+        'ENABLED': False, 'BACKEND': 'core.cache.LRUCache'})
+    def test_token_cache_disabled(self):
+        """Test every request looks the token up when caching is off"""
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.client.get(ME_URL)
+
+    def test_deleted_token_refused(self):
+        """Test a deleted token stops authenticating at once"""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_refused(self):
+        """Test the token of a deactivated user stops authenticating"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_updated_user_reloaded(self):
+        """Test changes made through the me endpoint are seen next time"""
+        self.client.get(ME_URL)
+
+        res = self.client.patch(ME_URL, {'name': 'new name'})
+        self.assertEqual(res.data['name'], 'new name')
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'new name')
+
+    def test_cached_user_not_shared(self):
+        """Test a request changing its user leaves the cached one as is"""
+        first, _ = CachedTokenAuthentication().authenticate_credentials(
+            self.token.key)
+        first.name = 'changed'
+        second, token = CachedTokenAuthentication().authenticate_credentials(
+            self.token.key)
+
+        self.assertEqual(second.name, 'name')
+        self.assertIs(token.user, second)
+
+
+class TokenCacheSettingsTests(TestCase):
+    """Test the token caches the settings configure"""
+
+    def test_per_process_cache_short_lived(self):
+        """Test a revocation another worker missed shows within seconds"""
+        cache = create_cache(settings.TOKEN_AUTH_CACHE)
+
+        self.assertIsInstance(cache, LRUCache)
+        self.assertLessEqual(cache.timeout, 5)
+
+    def test_shared_cache(self):
+        """Test an entry one worker drops is dropped for the others"""
+        config = dict(
+            settings.TOKEN_AUTH_CACHE, BACKEND='core.cache.SharedCache')
+        worker, other = create_cache(config), create_cache(config)
+        worker.set('token:key', 'user')
+        self.assertEqual(other.get('token:key'), 'user')
+
+        worker.delete('token:key')
+
+        self.assertIsNone(other.get('token:key'))
+        self.assertIsNone(caches['shared'].get('token:key'))
@@ -0,0 +1,113 @@
+"""Test bounding the password checks of the token endpoint"""
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.login import login_slot
+
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+
+
+class LoginSlotTests(TestCase):
+    """Test the token endpoint's login slots and token reuse"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(
+            LOGIN_SLOTS_DIR=directory, LOGIN_WORKERS=1, LOGIN_QUEUE=1,
+            LOGIN_QUEUE_TIMEOUT=0.05)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client = APIClient()
+        self.credentials = {
+            'email': 'user@example.com', 'password': 'testpass123'}
+
+    def test_login(self):
+        """Test a login with a free slot returns the user's token"""
+        res = self.client.post(TOKEN_URL, self.credentials)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['token'],
+                         Token.objects.get(user=self.user).key)
+
+    def test_login_saturated(self):
+        """Test logins beyond the slots and queue are refused at once"""
+        with login_slot(), patch('user.serializers.authenticate') as check:
+            # the queue slot is free: this one waits, then gives up
+            res = self.client.post(TOKEN_URL, self.credentials)
+            self.assertEqual(res.status_code,
+                             status.HTTP_503_SERVICE_UNAVAILABLE)
+            with override_settings(LOGIN_QUEUE=0):
+                res = self.client.post(TOKEN_URL, self.credentials)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+        check.assert_not_called()
+
+        res = self.client.post(TOKEN_URL, self.credentials)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_login_again_with_token(self):
+        """Test a client sending its valid token gets it back unchecked"""
+        token = self.client.post(TOKEN_URL, self.credentials).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        with patch('user.serializers.authenticate') as check, \
+                self.assertNumQueries(0):
+            res = self.client.post(TOKEN_URL, {'email': 'user@example.com'})
+
+        self.assertEqual(res.data['token'], token)
+        check.assert_not_called()
+
+    def test_login_with_token_checks_password(self):
+        """Test a password sent along a valid token is still checked"""
+        token = self.client.post(TOKEN_URL, self.credentials).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        res = self.client.post(TOKEN_URL, self.credentials)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['token'], token)
+
+        res = self.client.post(
+            TOKEN_URL, {**self.credentials, 'password': 'wrong'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('token', res.data)
+
+    def test_login_with_other_or_invalid_token(self):
+        """Test a token of someone else or invalid means a normal login"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123')
+        for key in (Token.objects.create(user=other).key, 'invalid'):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+
+            res = self.client.post(TOKEN_URL, self.credentials)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.data['token'],
+                             Token.objects.get(user=self.user).key)
+
+    def test_login_caches_token(self):
+        """Test requests right after a login authenticate without a query"""
+        token = self.client.post(TOKEN_URL, self.credentials).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['email'], 'user@example.com')
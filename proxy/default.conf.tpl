@@ -3,9 +3,26 @@ server {
     location /static {
         alias /vol/static;
     }
+    # uploads still being received, see movie.uploads
+    location /static/media/.uploads {
+        deny all;
+    }
+    # named after their content, see core.storage: never change
+    location /static/media/uploads {
+        alias /vol/static/media/uploads;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+    # resized images, sent on the app's X-Accel-Redirect, see movie.resize
+    location /static/media/.resized {
+        deny all;
+    }
+    location /internal/resized/ {
+        internal;
+        alias /vol/static/media/.resized/;
+    }
     location / {
-        uwsgi_pass             ${APP_HOST}:${APP_PORT};
-        include                /etc/nginx/uwsgi_params;
+        # uwsgi or http, per APP_SERVER; see run.sh
+        include                /etc/nginx/app.conf;
         client_max_body_size   10M;
     }
-}
\ No newline at end of file
+}
@@ -3,4 +3,7 @@
 set -e
 
 envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
+# only the app's address: $host and the like are nginx variables
+envsubst '${APP_HOST} ${APP_PORT}' \
+    < "/etc/nginx/app-${APP_SERVER}.conf.tpl" > /etc/nginx/app.conf
 nginx -g 'daemon off;'
\ No newline at end of file
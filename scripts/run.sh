@@ -2,9 +2,16 @@
 
 set -e
 
-python manage.py wait_for_db
-python manage.py collectstatic --noinput
-python manage.py migrate
+# wait_for_db, then sync_static and migrate_pending, which copy only
+# changed static files and migrate only when migrations are pending:
+# most starts change neither
+python manage.py boot
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+# APP_SERVER=asgi serves the read endpoints from a thread pool, see
+# core.asgi; the proxy must be told the same
+if [ "$APP_SERVER" = "asgi" ]; then
+    uvicorn app.asgi:application --host 0.0.0.0 --port 9000 --workers 4
+else
+    uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+fi
 